@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+# benchmarks/run_benchmarks.py - オフライン性能ベンチマーク
+#
+# ローカルのスタブサーバー（記録済みフィクスチャ）に楽天/Open-Meteo/OpenAI を向け、
+# 主要な処理の所要時間を計測してJSONで出力する。
+#
+#   python benchmarks/run_benchmarks.py --output bench_output.json
+#   python benchmarks/run_benchmarks.py --compare before.json --output after.json
+#   python benchmarks/run_benchmarks.py --only combinations,db
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from stub_server import (  # noqa: E402
+    OPEN_METEO_PATH, RAKUTEN_CATEGORY_LIST_PATH, RAKUTEN_RANKING_PATH, StubServer, load_fixture
+)
+
+BENCH_APP_ID = "bench-app-id"
+
+
+def measure(fn: Callable[[], Any], repeat: int, warmup: int = 1) -> Dict[str, float]:
+    """fn を warmup 回空実行したあと repeat 回計測して統計値（ミリ秒）を返す"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    samples.sort()
+    p95_index = min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))
+    return {
+        "repeat": repeat,
+        "min_ms": round(samples[0], 3),
+        "median_ms": round(statistics.median(samples), 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "p95_ms": round(samples[p95_index], 3),
+        "max_ms": round(samples[-1], 3),
+    }
+
+
+def configure_app(base_url: str, db_path: str) -> None:
+    """アプリの接続先をスタブサーバーに向ける（utils の import 前に呼ぶ）"""
+    os.environ["OPENAI_API_KEY"] = "sk-bench"
+    os.environ["OPENAI_BASE_URL"] = f"{base_url}/v1"
+    os.environ["RAKUTEN_APPLICATION_ID"] = BENCH_APP_ID
+    os.environ["SQLITE_PATH"] = db_path
+
+    import constants as ct
+    ct.CATEGORY_SNAPSHOT_PATH = os.path.join(os.path.dirname(db_path), "categories.nbct")
+    ct.RAKUTEN_CATEGORY_LIST_URL = f"{base_url}{RAKUTEN_CATEGORY_LIST_PATH}"
+    ct.RAKUTEN_RANKING_URL = f"{base_url}{RAKUTEN_RANKING_PATH}"
+    ct.OPEN_METEO_BASE = f"{base_url}{OPEN_METEO_PATH}"
+    # 本番のレート制限用の待機はスタブ相手には不要
+    ct.RAKUTEN_API_DELAY = 0.0
+    ct.RAKUTEN_API_RETRY_DELAY = 0.0
+    for settings in ct.RESILIENCE_SETTINGS.values():
+        settings["base_delay"] = 0.0
+
+
+# ---- 各ベンチマーク ----
+def bench_category_search(ut, repeat: int) -> Dict[str, Any]:
+    keywords = [("鶏肉", "和風"), ("パスタ", "洋風"), ("サラダ", "洋風"), ("炒め物", "中華"), ("カレー", None)]
+
+    def run():
+        for keyword, genre in keywords:
+            ut.search_category_by_keyword(BENCH_APP_ID, keyword, genre)
+
+    result = measure(run, repeat)
+    result["searches_per_run"] = len(keywords)
+    return result
+
+
+def bench_ranking_fetch(ut, repeat: int) -> Dict[str, Any]:
+    return measure(lambda: ut.fetch_top_recipes_by_genre("和風", BENCH_APP_ID, "鶏肉"), repeat)
+
+
+def _estimate_all(ut, recipes: List[Any], season: str) -> List[Any]:
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        return list(executor.map(
+            lambda r: ut.estimate_recipe_kcal_pfc_openai(
+                r.name, r.materials, r.indication,
+                "初心者", 500, season, "快適"
+            ),
+            recipes,
+        ))
+
+
+def bench_proposal_e2e(ut, repeat: int) -> Dict[str, Any]:
+    """レシピ提案1回分（取得→推定→組み合わせ→応援メッセージ）"""
+    season = ut.get_season()
+
+    def run():
+        recipes = ut.fetch_top_recipes_by_genre("和風", BENCH_APP_ID, None)
+        sides = ut.fetch_top_recipes_by_genre("サラダ", BENCH_APP_ID, "サラダ")
+        all_recipes = recipes + sides[:2]
+        kcal_infos = _estimate_all(ut, all_recipes, season)
+        combos = ut.find_recipe_combinations(all_recipes, kcal_infos, 600)
+        for combo in combos:
+            ut.generate_cheer(f"{combo.name} / 合計{int(combo.total_kcal)}kcal")
+
+    return measure(run, repeat)
+
+
+def _clear_caches(ut) -> None:
+    for fn in (ut.get_category_tree, ut.cached_fetch_top_recipes_by_genre,
+               ut.cached_fetch_weekly_weather, ut.cached_estimate_recipe_kcal_pfc):
+        fn.clear()
+
+
+def bench_warmup(ut, repeat: int) -> Dict[str, Any]:
+    """デプロイ直後の初回提案（キャッシュが空の場合と warm_caches 後）とキャッシュの事前取得の所要時間"""
+    import constants as ct
+    season = ut.get_season()
+
+    def first_proposal():
+        feel = ut.feel_from_weather(ut.cached_fetch_weekly_weather("Tokyo"))
+        recipes = ut.cached_fetch_top_recipes_by_genre("和風", BENCH_APP_ID, None)
+        sides = ut.cached_fetch_top_recipes_by_genre("サラダ", BENCH_APP_ID, "サラダ")
+        for r in recipes + sides[:2]:
+            ut.cached_estimate_recipe(r, ct.DEFAULT_DIFFICULTY, ct.DEFAULT_MEAL_BUDGET_JPY, season, feel)
+
+    def timed(fn: Callable[[], Any]) -> float:
+        start = time.perf_counter()
+        fn()
+        return (time.perf_counter() - start) * 1000.0
+
+    cold, warmup, warmed = [], [], []
+    for _ in range(repeat):
+        _clear_caches(ut)
+        cold.append(timed(first_proposal))
+        _clear_caches(ut)
+        warmup.append(timed(lambda: ut.warm_caches(BENCH_APP_ID)))
+        warmed.append(timed(first_proposal))
+    return {
+        "cold_first_proposal_median_ms": round(statistics.median(cold), 3),
+        "warm_caches_median_ms": round(statistics.median(warmup), 3),
+        "warmed_first_proposal_median_ms": round(statistics.median(warmed), 3),
+    }
+
+
+def bench_weather_grid(ut, repeat: int, server: StubServer, users: int = 500) -> Dict[str, Any]:
+    """多数のユーザーが別々の地点の天気を同時に取得する場合（キャッシュが空の状態から、上流リクエスト数も記録）"""
+    rng = random.Random(0)
+    places = [ut.resolve_location(key) for key in ut.location_options()]
+    queries = []
+    for _ in range(users):
+        place = rng.choice(places)
+        queries.append(f"{place.lat + rng.uniform(-0.05, 0.05):.4f},{place.lon + rng.uniform(-0.05, 0.05):.4f}")
+    cells = {ut.weather_cell(q) for q in queries}
+
+    samples, requests = [], []
+    for _ in range(repeat):
+        ut.cached_fetch_weekly_weather.clear()
+        before = server.state.counts.get("weather", 0)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            list(pool.map(ut.cached_fetch_weekly_weather, queries))
+        samples.append((time.perf_counter() - start) * 1000.0)
+        requests.append(server.state.counts.get("weather", 0) - before)
+    return {
+        "users": users,
+        "grid_cells": len(cells),
+        "upstream_requests_median": statistics.median(requests),
+        "cold_all_users_median_ms": round(statistics.median(samples), 3),
+    }
+
+
+def bench_local_estimate(ut, repeat: int) -> Dict[str, Any]:
+    """食品成分表による推定（LLMなし）のレシピ1件あたりの処理時間"""
+    pages = load_fixture("ranking_pages.json")["pages"]
+    recipes = [r for page in pages.values() for r in page]
+    rounds = 100
+
+    def run():
+        for _ in range(rounds):
+            for r in recipes:
+                ut.estimate_recipe_kcal_pfc_local(r["recipeTitle"], r["recipeMaterial"])
+
+    result = measure(run, repeat)
+    result["us_per_recipe"] = round(result["median_ms"] * 1000.0 / (rounds * len(recipes)), 2)
+    return result
+
+
+def bench_estimate_router(ut, repeat: int) -> Dict[str, Any]:
+    """NUTRITION_ESTIMATOR=router の振り分け（しきい値ごとのLLM呼び出し削減率と、振り分け1件あたりの処理時間）"""
+    import constants as ct
+    import estimate_router as er
+    pages = load_fixture("ranking_pages.json")["pages"]
+    recipes = [r for page in pages.values() for r in page]
+
+    results: Dict[str, Any] = {}
+    for threshold in (0.5, 0.6, ct.DEFAULT_ROUTER_CONFIDENCE_THRESHOLD, 0.9):
+        local = sum(er.route_local(r["recipeTitle"], r["recipeMaterial"], threshold)[0] is not None for r in recipes)
+        results[f"llm_call_reduction@{threshold:.2f}"] = round(local / len(recipes), 3)
+    rounds = 50
+
+    def run():
+        for _ in range(rounds):
+            for r in recipes:
+                er.route_local(r["recipeTitle"], r["recipeMaterial"], ct.DEFAULT_ROUTER_CONFIDENCE_THRESHOLD)
+
+    results.update(measure(run, repeat))
+    results["us_per_recipe"] = round(results["median_ms"] * 1000.0 / (rounds * len(recipes)), 2)
+    results["recipes"] = len(recipes)
+    return results
+
+
+def _synthetic_recipes(ut, n: int, seed: int = 42):
+    rng = random.Random(seed)
+    names = ["親子丼", "野菜サラダ", "味噌汁", "焼きそば", "きんぴらごぼう", "コンソメスープ", "カレー", "煮物"]
+    recipes, infos = [], []
+    for i in range(n):
+        name = f"{rng.choice(names)}{i}"
+        recipes.append(ut.Recipe.from_rakuten(
+            {"recipeId": i, "recipeTitle": name, "recipeMaterial": ["材料A", "材料B"]}, "bench"
+        ))
+        kcal = rng.uniform(80, 700)
+        infos.append(ut.NutritionEstimate(kcal, kcal * 0.06, kcal * 0.03, kcal * 0.12, "bench", "ok"))
+    return recipes, infos
+
+
+def bench_combinations(ut, repeat: int) -> Dict[str, Any]:
+    """find_recipe_combinations のレシピ数に対するスケーリング"""
+    results = {}
+    for n in (8, 16, 32, 64):
+        recipes, infos = _synthetic_recipes(ut, n)
+        results[f"n={n}"] = measure(lambda: ut.find_recipe_combinations(recipes, infos, 600), repeat)
+    return results
+
+
+def bench_db(ut, repeat: int, db_path: str) -> Dict[str, Any]:
+    """食事記録の追加と当日合計のスループット"""
+    ut.init_db(db_path)
+    inserts = 200
+    sums = 200
+
+    def run_insert():
+        for i in range(inserts):
+            ut.insert_meal_log(db_path, "昼", f"ベンチ料理{i}", 450.0)
+
+    def run_sum():
+        for _ in range(sums):
+            ut.sum_today_kcal(db_path)
+
+    insert_result = measure(run_insert, repeat, warmup=0)
+    sum_result = measure(run_sum, repeat, warmup=0)
+    insert_result["ops_per_sec"] = round(inserts / (insert_result["median_ms"] / 1000.0), 1)
+    sum_result["ops_per_sec"] = round(sums / (sum_result["median_ms"] / 1000.0), 1)
+    return {"insert": insert_result, "sum_today": sum_result}
+
+
+def bench_weekly(ut, repeat: int) -> Dict[str, Any]:
+    """1週間の献立作成（main.py の週間献立と同じ流れ）"""
+    season = ut.get_season()
+
+    def run():
+        recipes = ut.fetch_top_recipes_by_genre("和風", BENCH_APP_ID, None)
+        for d in range(7):
+            r = recipes[d % len(recipes)]
+            kcal_info = ut.estimate_recipe_kcal_pfc_openai(
+                r.name, r.materials, r.indication,
+                "初心者", 500, season, "快適"
+            )
+            ut.generate_cheer(f"{r.name} / 約{int(kcal_info.kcal)}kcal / 日{d + 1}")
+
+    return measure(run, repeat)
+
+
+def _cold_import_ms(code: str) -> float:
+    """新しいPythonプロセスで code を実行し、その所要時間（ミリ秒）を返す"""
+    script = (
+        "import time; _t = time.perf_counter()\n"
+        f"{code}\n"
+        "print((time.perf_counter() - _t) * 1000.0)"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", script], cwd=REPO_ROOT,
+        capture_output=True, text=True, check=True
+    ).stdout.strip().splitlines()
+    return float(out[-1])
+
+
+def bench_import_time(repeat: int) -> Dict[str, Any]:
+    """
+    コールドスタート時の import 時間
+
+    utils: 窓口モジュールのみ / utils+rakuten: ランキング取得関数まで解決 /
+    heavy_deps: 旧 utils が import 時に読み込んでいた依存（比較用の基準値）
+    """
+    cases = {
+        "utils": "import utils",
+        "utils+rakuten": "import utils; utils.fetch_top_recipes_by_genre",
+        "heavy_deps": "import requests, aiohttp, streamlit, langchain_openai, langchain.schema",
+    }
+    results = {}
+    for name, code in cases.items():
+        try:
+            samples = sorted(_cold_import_ms(code) for _ in range(repeat))
+        except subprocess.CalledProcessError as e:
+            # 依存ライブラリが未インストールの環境など
+            results[name] = {"error": (e.stderr or "").strip().splitlines()[-1:]}
+            continue
+        results[name] = {
+            "repeat": repeat,
+            "min_ms": round(samples[0], 3),
+            "median_ms": round(statistics.median(samples), 3),
+            "max_ms": round(samples[-1], 3),
+        }
+    return results
+
+
+BENCHMARKS = ["import_time", "category_search", "ranking_fetch", "proposal_e2e", "warmup", "local_estimate", "estimate_router", "combinations", "db", "weekly", "weather_grid"]
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """median_ms を比較した行を返す（比率 < 1.0 が改善）"""
+    lines = []
+
+    def walk(cur, base, prefix):
+        if isinstance(cur, dict) and "median_ms" in cur:
+            if isinstance(base, dict) and base.get("median_ms"):
+                ratio = cur["median_ms"] / base["median_ms"]
+                lines.append(f"{prefix:<40} {base['median_ms']:>10.2f} -> {cur['median_ms']:>10.2f} ms  x{ratio:.2f}")
+            return
+        if isinstance(cur, dict):
+            for key, value in cur.items():
+                walk(value, base.get(key) if isinstance(base, dict) else None, f"{prefix}.{key}" if prefix else key)
+
+    walk(current.get("results", {}), baseline.get("results", {}), "")
+    return lines
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NutriBuddy オフラインベンチマーク")
+    parser.add_argument("--repeat", type=int, default=5, help="各ベンチマークの計測回数")
+    parser.add_argument("--only", default="", help=f"実行するベンチマーク（カンマ区切り）: {','.join(BENCHMARKS)}")
+    parser.add_argument("--output", default="", help="結果JSONの出力先（省略時は標準出力）")
+    parser.add_argument("--compare", default="", help="比較対象の結果JSON")
+    parser.add_argument("--rakuten-latency-ms", type=float, default=0.0, help="スタブの楽天API擬似レイテンシ")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="スタブのOpenAI擬似レイテンシ")
+    parser.add_argument("--verbose", action="store_true", help="アプリのINFOログも表示する")
+    args = parser.parse_args()
+
+    selected = [b for b in args.only.split(",") if b] or BENCHMARKS
+
+    server = StubServer(
+        rakuten_latency_ms=args.rakuten_latency_ms, llm_latency_ms=args.llm_latency_ms
+    ).start()
+    tmp_dir = tempfile.mkdtemp(prefix="nutribuddy_bench_")
+    db_path = os.path.join(tmp_dir, "bench.db")
+    configure_app(server.base_url, db_path)
+
+    import utils as ut
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+        logging.getLogger("NutriBuddy").setLevel(logging.WARNING)
+
+    results: Dict[str, Any] = {}
+    try:
+        for name in selected:
+            print(f"[bench] {name} ...", file=sys.stderr)
+            if name == "import_time":
+                results[name] = bench_import_time(args.repeat)
+            elif name == "category_search":
+                results[name] = bench_category_search(ut, args.repeat)
+            elif name == "ranking_fetch":
+                results[name] = bench_ranking_fetch(ut, args.repeat)
+            elif name == "proposal_e2e":
+                results[name] = bench_proposal_e2e(ut, args.repeat)
+            elif name == "warmup":
+                results[name] = bench_warmup(ut, args.repeat)
+            elif name == "local_estimate":
+                results[name] = bench_local_estimate(ut, args.repeat)
+            elif name == "estimate_router":
+                results[name] = bench_estimate_router(ut, args.repeat)
+            elif name == "combinations":
+                results[name] = bench_combinations(ut, args.repeat)
+            elif name == "db":
+                results[name] = bench_db(ut, args.repeat, db_path)
+            elif name == "weekly":
+                results[name] = bench_weekly(ut, args.repeat)
+            elif name == "weather_grid":
+                results[name] = bench_weather_grid(ut, args.repeat, server)
+            else:
+                print(f"[bench] 不明なベンチマーク: {name}", file=sys.stderr)
+    finally:
+        server.stop()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "rakuten_latency_ms": args.rakuten_latency_ms,
+            "llm_latency_ms": args.llm_latency_ms,
+            "stub_requests": dict(server.state.counts),
+        },
+        "results": results,
+    }
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"[bench] 結果を書き出しました: {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\n[bench] 比較: {args.compare} ({baseline.get('meta', {}).get('git_revision', '?')})", file=sys.stderr)
+        for line in compare(report, baseline):
+            print(line, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
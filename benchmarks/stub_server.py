@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# benchmarks/stub_server.py - 楽天レシピ/Open-Meteo/OpenAI のローカルスタブサーバー
+#
+# 記録済みのフィクスチャ（benchmarks/fixtures/）を返すだけのHTTPサーバー。
+# ベンチマークをネットワークやAPI制限に左右されずオフラインで再現するために使う。
+#
+#   python benchmarks/stub_server.py --port 8765 --rakuten-latency-ms 80 --llm-latency-ms 600
+
+import argparse
+import json
+import os
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+RAKUTEN_CATEGORY_LIST_PATH = "/services/api/Recipe/CategoryList/20170426"
+RAKUTEN_RANKING_PATH = "/services/api/Recipe/CategoryRanking/20170426"
+OPEN_METEO_PATH = "/v1/forecast"
+OPENAI_CHAT_PATH = "/v1/chat/completions"
+
+
+def load_fixture(name: str) -> Any:
+    with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+class StubState:
+    """フィクスチャと擬似レイテンシ設定、リクエスト数"""
+
+    def __init__(self, rakuten_latency_ms: float = 0.0, llm_latency_ms: float = 0.0,
+                 weather_latency_ms: float = 0.0):
+        self.categories = load_fixture("category_list.json")
+        self.ranking = load_fixture("ranking_pages.json")
+        self.llm = load_fixture("llm_responses.json")
+        self.weather = load_fixture("open_meteo_forecast.json")
+        self.rakuten_latency = rakuten_latency_ms / 1000.0
+        self.llm_latency = llm_latency_ms / 1000.0
+        self.weather_latency = weather_latency_ms / 1000.0
+        self.counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def count(self, route: str) -> None:
+        with self._lock:
+            self.counts[route] = self.counts.get(route, 0) + 1
+
+    def ranking_page(self, category_id: str) -> Dict[str, Any]:
+        # 階層ID（例: "10-277"）は末尾のIDで引く
+        leaf = category_id.split("-")[-1] if category_id else ""
+        page = self.ranking["routes"].get(leaf, "default")
+        return {"result": self.ranking["pages"][page]}
+
+    def forecast(self, latitude: str, longitude: str) -> Any:
+        # 複数地点（カンマ区切り）は Open-Meteo と同じく地点ごとのリスト、1地点ならオブジェクト
+        points = list(zip(latitude.split(","), longitude.split(",")))
+        results = [dict(self.weather, latitude=float(lat), longitude=float(lon)) for lat, lon in points if lat and lon]
+        if len(results) <= 1:
+            return results[0] if results else self.weather
+        return results
+
+    def chat_completion(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+        seed = zlib.crc32(prompt.encode("utf-8"))
+        if "kcal" in prompt and "JSON" in prompt:
+            estimates = self.llm["estimates"]
+            payload = json.dumps(estimates[seed % len(estimates)], ensure_ascii=False)
+            if body.get("response_format"):
+                content = payload
+            else:
+                content = self.llm["estimate_template"].replace("{json}", payload)
+        else:
+            cheers = self.llm["cheers"]
+            content = cheers[seed % len(cheers)]
+        prompt_tokens = max(1, len(prompt) // 2)
+        completion_tokens = max(1, len(content) // 2)
+        return {
+            "id": f"chatcmpl-stub-{seed:08x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "logprobs": None,
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send_json(self, obj: Any, status: int = 200) -> None:
+            body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            if url.path == RAKUTEN_CATEGORY_LIST_PATH:
+                state.count("category_list")
+                time.sleep(state.rakuten_latency)
+                self._send_json(state.categories)
+            elif url.path == RAKUTEN_RANKING_PATH:
+                state.count("ranking")
+                time.sleep(state.rakuten_latency)
+                self._send_json(state.ranking_page(query.get("categoryId", "")))
+            elif url.path == OPEN_METEO_PATH:
+                state.count("weather")
+                time.sleep(state.weather_latency)
+                self._send_json(state.forecast(query.get("latitude", ""), query.get("longitude", "")))
+            else:
+                self._send_json({"error": "not_found", "path": url.path}, status=404)
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if url.path == OPENAI_CHAT_PATH:
+                state.count("chat_completions")
+                time.sleep(state.llm_latency)
+                self._send_json(state.chat_completion(body))
+            else:
+                self._send_json({"error": "not_found", "path": url.path}, status=404)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class StubServer:
+    """スレッドで動くスタブサーバー（ベンチマークから起動/停止する）"""
+
+    def __init__(self, port: int = 0, host: str = "127.0.0.1", **latency):
+        self.state = StubState(**latency)
+        self.httpd = ThreadingHTTPServer((host, port), make_handler(self.state))
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="stub-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NutriBuddy ベンチマーク用スタブサーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rakuten-latency-ms", type=float, default=0.0)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--weather-latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = StubServer(
+        port=args.port, host=args.host,
+        rakuten_latency_ms=args.rakuten_latency_ms,
+        llm_latency_ms=args.llm_latency_ms,
+        weather_latency_ms=args.weather_latency_ms,
+    )
+    print(f"スタブサーバー起動: {server.base_url}")
+    print(f"  楽天: {server.base_url}{RAKUTEN_RANKING_PATH}")
+    print(f"  OpenAI: OPENAI_BASE_URL={server.base_url}/v1")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# bulk_plan.py
+#
+# ユーザープロファイルの一括入力から週間献立を作成してJSONLで出力するCLI（Streamlit不要）
+#
+# 上流呼び出し（ランキング・天気・カロリー推定・応援メッセージ）は asyncio から共有スレッドプールで
+# 並行実行し、同じ引数の呼び出しは実行全体で1回にまとめる。献立の組み立てとJSON化は
+# ProcessPoolExecutor で並列に行う。結果は完了した順に1行ずつ書き出す。
+#
+#   python bulk_plan.py profiles.csv --output plans.jsonl
+#   python bulk_plan.py profiles.jsonl --cheers --upstream-concurrency 8 --processes 4
+#
+# 入力の列（CSVのヘッダー / JSONLのキー）: user_id, target_kcal, meal_budget, genre, difficulty, city[, keyword]
+import argparse
+import asyncio
+import concurrent.futures
+import csv
+import functools
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, TextIO
+
+import constants as ct
+import planner
+
+logger = logging.getLogger('NutriBuddy')
+
+
+def read_profiles(path: str) -> Iterator[Dict[str, Any]]:
+    """CSV / JSONL のプロファイルを1行ずつ読む（拡張子 .csv 以外は JSONL とみなす）"""
+    with open(path, encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            yield from csv.DictReader(line for line in f if not line.startswith("#"))
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class UpstreamPool:
+    """
+    上流呼び出し用の共有プール（asyncio から使う）
+
+    同じキーの呼び出しは実行中・完了済みを問わず1回の結果を共有する（一括作成の間だけ保持）。
+    """
+
+    def __init__(self, concurrency: int):
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="upstream"
+        )
+        self._memo: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def call(self, key: Hashable, fn: Callable[..., Any], *args) -> Any:
+        future = self._memo.get(key)
+        if future is None:
+            self.calls += 1
+            future = asyncio.get_running_loop().run_in_executor(self._executor, functools.partial(fn, *args))
+            self._memo[key] = future
+        else:
+            self.shared += 1
+        return await future
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+
+async def fetch_inputs(profile: Dict[str, Any], pool: UpstreamPool, app_id: str, season: str,
+                       with_cheers: bool) -> Optional[Dict[str, Any]]:
+    """1人分の献立に必要な上流の結果を集める（レシピが取得できなければ None）"""
+    from ingredients import ingredients_cache_key
+    from nutrition import estimate_recipe_kcal_pfc, generate_shared_cheer
+    from rakuten_api import fetch_top_recipes_by_genre
+    from weather import fetch_weekly_weather, feel_from_weather, weather_cell
+
+    genre, keyword = profile["genre"], profile["keyword"]
+    # 天気は格子点ごとに1回（同じ格子点の地域のプロファイルは結果を共有する）
+    recipes, weather = await asyncio.gather(
+        pool.call(("ranking", genre, keyword), fetch_top_recipes_by_genre, genre, app_id, keyword),
+        pool.call(("weather", weather_cell(profile["city"])), fetch_weekly_weather, profile["city"]),
+    )
+    if not recipes:
+        return None
+    feel = feel_from_weather(weather)
+    daily_recipes = planner.pick_weekly_recipes(recipes)
+
+    kcal_infos = await asyncio.gather(*[
+        pool.call(
+            ("estimate", r.name, ingredients_cache_key(r.materials),
+             r.indication, profile["difficulty"], profile["meal_budget"], season, feel),
+            estimate_recipe_kcal_pfc,
+            r.name, r.materials, r.indication,
+            profile["difficulty"], profile["meal_budget"], season, feel
+        )
+        for r in daily_recipes
+    ])
+
+    cheers = None
+    if with_cheers:
+        summaries = [
+            planner.weekly_day_summary(day_num, r.name, k.kcal)
+            for day_num, (r, k) in enumerate(zip(daily_recipes, kcal_infos), start=1)
+        ]
+        cheers = await asyncio.gather(*[
+            pool.call(("cheer", summary), generate_shared_cheer, summary) for summary in summaries
+        ])
+    return {"feel": feel, "recipes": daily_recipes, "kcal_infos": list(kcal_infos), "cheers": cheers}
+
+
+def render_plan(profile: Dict[str, Any], season: str, inputs: Dict[str, Any]) -> str:
+    """週間献立を組み立ててJSONLの1行にする（ProcessPoolExecutor で実行）"""
+    plan = planner.build_weekly_plan(inputs["recipes"], inputs["kcal_infos"], inputs["cheers"])
+    record = {
+        "user_id": profile["user_id"],
+        "profile": profile,
+        "season": season,
+        "feel": inputs["feel"],
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        **plan,
+    }
+    return json.dumps(record, ensure_ascii=False)
+
+
+async def run(profiles: Iterator[Dict[str, Any]], out: TextIO, app_id: str, processes: int,
+              upstream_concurrency: int, max_inflight: int, with_cheers: bool) -> Dict[str, int]:
+    from weather import get_season
+
+    loop = asyncio.get_running_loop()
+    season = get_season()
+    pool = UpstreamPool(upstream_concurrency)
+    inflight = asyncio.Semaphore(max_inflight)
+    counts = {"ok": 0, "error": 0}
+    started = time.monotonic()
+
+    def write(line: str, ok: bool) -> None:
+        out.write(line + "\n")
+        counts["ok" if ok else "error"] += 1
+        done = counts["ok"] + counts["error"]
+        if done % ct.BULK_PLAN_PROGRESS_EVERY == 0:
+            out.flush()
+            print(f"[bulk_plan] {done}件 (失敗 {counts['error']}) {time.monotonic() - started:.1f}s "
+                  f"上流呼び出し {pool.calls}回 / 共有 {pool.shared}回", file=sys.stderr, flush=True)
+
+    async def handle(raw: Dict[str, Any], cpu: concurrent.futures.ProcessPoolExecutor) -> None:
+        user_id = raw.get("user_id", "")
+        try:
+            profile = planner.normalize_profile(raw)
+            inputs = await fetch_inputs(profile, pool, app_id, season, with_cheers)
+            if inputs is None:
+                raise ValueError("レシピを取得できませんでした")
+            line = await loop.run_in_executor(cpu, render_plan, profile, season, inputs)
+            write(line, True)
+        except Exception as e:
+            logger.warning(f"献立作成失敗 - user_id: {user_id}: {str(e)}")
+            write(json.dumps({"user_id": user_id, "error": str(e)}, ensure_ascii=False), False)
+        finally:
+            inflight.release()
+
+    tasks = set()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as cpu:
+        for raw in profiles:
+            # 入力は読みながら処理し、同時に扱うプロファイル数を max_inflight までに抑える
+            await inflight.acquire()
+            task = asyncio.create_task(handle(raw, cpu))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+    pool.shutdown()
+    out.flush()
+    counts["upstream_calls"] = pool.calls
+    counts["upstream_shared"] = pool.shared
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NutriBuddy 週間献立の一括作成")
+    parser.add_argument("profiles", help="ユーザープロファイル（.csv または .jsonl）")
+    parser.add_argument("--output", default="", help="出力先のJSONL（省略時は標準出力）")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="献立組み立てのプロセス数")
+    parser.add_argument("--upstream-concurrency", type=int, default=ct.BULK_PLAN_UPSTREAM_CONCURRENCY,
+                        help="上流呼び出しの同時実行数")
+    parser.add_argument("--max-inflight", type=int, default=ct.BULK_PLAN_MAX_INFLIGHT,
+                        help="同時に処理するプロファイル数")
+    parser.add_argument("--cheers", action="store_true", help="日ごとの応援メッセージも生成する（OpenAI呼び出しが増える）")
+    args = parser.parse_args()
+
+    from log_config import setup_logging
+    from settings import load_env
+
+    setup_logging()
+    env = load_env()
+    if not env["RAKUTEN_APPLICATION_ID"]:
+        parser.error("RAKUTEN_APPLICATION_ID が未設定です")
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    started = time.monotonic()
+    try:
+        counts = asyncio.run(run(
+            read_profiles(args.profiles), out, env["RAKUTEN_APPLICATION_ID"], args.processes,
+            args.upstream_concurrency, args.max_inflight, args.cheers
+        ))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"[bulk_plan] 完了 - 成功 {counts['ok']}件 / 失敗 {counts['error']}件, "
+          f"上流呼び出し {counts['upstream_calls']}回（共有 {counts['upstream_shared']}回）, "
+          f"{time.monotonic() - started:.1f}s", file=sys.stderr)
+    raise SystemExit(0 if counts["error"] == 0 else 1)
+
+
+if __name__ == "__main__":
+    main()
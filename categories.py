@@ -0,0 +1,105 @@
+# categories.py
+import sys
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+# 楽天レシピのカテゴリの階層（新形式の result のキー、上位から順に）
+LEVELS = ("large", "medium", "small")
+
+
+@dataclass(frozen=True, slots=True)
+class Category:
+    """楽天レシピのカテゴリ1件"""
+    category_id: str
+    name: str
+    level: str                 # "large" / "medium" / "small"（旧形式のフラットなリストは "unknown"）
+    parent_id: str
+    hierarchical_id: str       # ランキングAPIに渡す階層形式のID（"30-300-1132" など）
+    url: str
+
+
+@dataclass(frozen=True, slots=True)
+class CategoryTree:
+    """
+    カテゴリ一覧（CategoryList API の応答）から作る不変のカテゴリツリー
+
+    階層形式のIDと ID → カテゴリの索引は作成時に1回だけ計算する。
+    プロセスで1つを共有し、更新時は新しいツリーを作って参照ごと差し替える（中身は書き換えない）。
+    """
+    categories: Tuple[Category, ...]                 # LEVELS の順（旧形式は応答の順）
+    by_level: Mapping[str, Tuple[Category, ...]]
+    by_id: Mapping[str, Category]
+    loaded_at: float                                 # 作成時刻（time.time()）
+
+    @classmethod
+    def from_api(cls, result: Any, loaded_at: Optional[float] = None) -> "CategoryTree":
+        """CategoryList API の result（新形式の large/medium/small の辞書、または旧形式のリスト）から作る"""
+        if isinstance(result, dict):
+            raw_levels = [(level, result.get(level) or []) for level in LEVELS]
+        elif isinstance(result, list):
+            raw_levels = [("unknown", result)]
+        else:
+            raw_levels = []
+
+        # 同じIDが複数の階層にある場合は上位の階層を使う（build_hierarchical_category_id と同じ）
+        parents: Dict[str, Tuple[str, str]] = {}
+        for level, rows in raw_levels:
+            for row in rows:
+                cat_id = str(row.get("categoryId", ""))
+                if cat_id:
+                    parents.setdefault(cat_id, (level, str(row.get("parentCategoryId") or "")))
+
+        hierarchical: Dict[str, str] = {}
+
+        def hierarchical_id(cat_id: str) -> str:
+            if cat_id not in hierarchical:
+                level, parent_id = parents.get(cat_id, ("large", ""))
+                if level == "medium" and parent_id:
+                    hierarchical[cat_id] = f"{parent_id}-{cat_id}"
+                elif level == "small" and parent_id:
+                    hierarchical[cat_id] = f"{hierarchical_id(parent_id)}-{cat_id}"
+                else:
+                    hierarchical[cat_id] = cat_id
+            return hierarchical[cat_id]
+
+        categories: List[Category] = []
+        for level, rows in raw_levels:
+            for row in rows:
+                cat_id = str(row.get("categoryId", ""))
+                if not cat_id:
+                    continue
+                parent_id = str(row.get("parentCategoryId") or "")
+                categories.append(Category(
+                    category_id=sys.intern(cat_id),
+                    name=row.get("categoryName") or "",
+                    level=level,
+                    parent_id=sys.intern(parent_id) if parent_id else "",
+                    hierarchical_id=cat_id if level == "unknown" else hierarchical_id(cat_id),
+                    url=row.get("categoryUrl") or "",
+                ))
+        return cls.from_categories(categories, time.time() if loaded_at is None else loaded_at)
+
+    @classmethod
+    def from_categories(cls, categories: Iterable[Category], loaded_at: float) -> "CategoryTree":
+        """階層の順に並んだカテゴリから作る（スナップショットの読み込み用）"""
+        by_level: Dict[str, List[Category]] = {}
+        by_id: Dict[str, Category] = {}
+        for category in categories:
+            by_level.setdefault(category.level, []).append(category)
+            by_id.setdefault(category.category_id, category)
+        levels = {level: tuple(rows) for level, rows in by_level.items()}
+        return cls(
+            categories=tuple(c for rows in levels.values() for c in rows),
+            by_level=MappingProxyType(levels),
+            by_id=MappingProxyType(by_id),
+            loaded_at=loaded_at,
+        )
+
+    def __len__(self) -> int:
+        return len(self.categories)
+
+    def find(self, category_id: str) -> Optional[Category]:
+        """カテゴリIDから引く（階層形式のIDは末尾のIDで引く、見つからなければ None）"""
+        return self.by_id.get(str(category_id).rsplit("-", 1)[-1])
@@ -0,0 +1,212 @@
+# category_snapshot.py
+#
+# カテゴリツリー（categories.CategoryTree）のバイナリスナップショット
+#
+# 取得・更新したプロセスが書き出し、ほかのプロセス（Streamlit の別プロセス・CLIスクリプト）は
+# mmap で開いて JSON の解析もネットワークもなしに使う。ファイルは一時ファイルに書いてから
+# 置き換えるため、読み取り中のプロセスは開いた時点の内容をそのまま読み続けられる。
+#
+# 形式（ネイティブのバイト順、配列はすべて4バイト境界）:
+#   ヘッダ          magic "NBCT", 版, バイト順, カテゴリ数 n, 文字列数 m, 取得時刻, 文字列領域のサイズ
+#   階層の範囲      u32[len(LEVEL_CODES) + 1]  階層ごとの先頭位置（カテゴリは階層の順に並ぶ）
+#   カテゴリの列    u32[n] × 5（ID・名前・親ID・階層形式のID・URL の文字列番号）
+#   親の位置        i32[n]（親カテゴリの位置、なければ -1）
+#   IDの索引        u32[n]（IDの昇順に並べたカテゴリの位置、同じIDは階層の順）
+#   文字列表        u32[m + 1]（UTF-8 の開始位置）+ UTF-8 の本体
+import array
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+from typing import Dict, Iterator, List, Optional
+
+from categories import LEVELS, Category, CategoryTree
+
+logger = logging.getLogger('NutriBuddy')
+
+MAGIC = b"NBCT"
+VERSION = 1
+LEVEL_CODES = LEVELS + ("unknown",)
+
+_HEADER = struct.Struct("<4sHHIIdI4x")  # 末尾は4バイトの詰め物（配列を4バイト境界から始める）
+_BYTE_ORDER = {"little": 1, "big": 2}[sys.byteorder]
+_COLUMNS = ("category_id", "name", "parent_id", "hierarchical_id", "url")
+
+
+def write_snapshot(tree: CategoryTree, path: str) -> int:
+    """ツリーをスナップショットに書き出し、ファイルサイズを返す"""
+    strings: Dict[str, int] = {"": 0}
+
+    def string_no(value: str) -> int:
+        return strings.setdefault(value, len(strings))
+
+    # 階層の順に並べ、階層ごとの先頭位置を記録する
+    categories = sorted(tree.categories, key=lambda c: LEVEL_CODES.index(c.level))
+    level_starts = array.array("I", [0])
+    for level in LEVEL_CODES:
+        level_starts.append(level_starts[-1] + sum(1 for c in categories if c.level == level))
+    positions: Dict[str, int] = {}
+    for i, category in enumerate(categories):
+        positions.setdefault(category.category_id, i)
+
+    columns = [array.array("I", (string_no(getattr(c, name)) for c in categories)) for name in _COLUMNS]
+    parents = array.array("i", (positions.get(c.parent_id, -1) if c.parent_id else -1 for c in categories))
+    id_order = array.array("I", sorted(range(len(categories)),
+                                       key=lambda i: (categories[i].category_id.encode("utf-8"), i)))
+
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = array.array("I", [0])
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+    blob = b"".join(encoded)
+
+    header = _HEADER.pack(MAGIC, VERSION, _BYTE_ORDER, len(categories), len(encoded), tree.loaded_at, len(blob))
+    parts = [header, level_starts.tobytes(), *(c.tobytes() for c in columns), parents.tobytes(),
+             id_order.tobytes(), offsets.tobytes(), blob]
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # 一時ファイルに書いてから置き換え、読み取り中のプロセスに書きかけのファイルを見せない
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        for part in parts:
+            f.write(part)
+    os.replace(tmp, path)
+    return sum(len(part) for part in parts)
+
+
+class CategorySnapshot:
+    """
+    mmap で開いたスナップショット（読み取り専用）
+
+    配列は mmap をそのまま参照し（コピーしない）、カテゴリは参照されたときに1件ずつ作る。
+    find() はIDの索引の二分探索で引く。検索のように全件を何度も走査する場合は to_tree() で
+    CategoryTree にしてから使う。
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._open()
+        except Exception:
+            self.close()
+            raise
+
+    def _open(self) -> None:
+        view = memoryview(self._mmap)
+        self._views = [view]
+        magic, version, byte_order, n, m, loaded_at, blob_size = _HEADER.unpack_from(view)
+        if magic != MAGIC or version != VERSION or byte_order != _BYTE_ORDER:
+            raise ValueError(f"スナップショットの形式が異なります（{magic!r} 版{version}）")
+        self.loaded_at = loaded_at
+        self._n = n
+        offset = _HEADER.size
+
+        def take(count: int, fmt: str) -> memoryview:
+            nonlocal offset
+            size = count * 4
+            if offset + size > len(view):
+                raise ValueError("スナップショットが途中で切れています")
+            part = view[offset:offset + size].cast(fmt)
+            self._views.append(part)
+            offset += size
+            return part
+
+        self._level_starts = take(len(LEVEL_CODES) + 1, "I")
+        self._columns = {name: take(n, "I") for name in _COLUMNS}
+        self._parents = take(n, "i")
+        self._id_order = take(n, "I")
+        self._offsets = take(m + 1, "I")
+        if offset + blob_size > len(view):
+            raise ValueError("スナップショットが途中で切れています")
+        self._blob = view[offset:offset + blob_size]
+        self._views.append(self._blob)
+
+    def close(self) -> None:
+        # mmap を参照している memoryview を先に解放しないと閉じられない
+        for view in reversed(getattr(self, "_views", [])):
+            view.release()
+        self._views = []
+        self._mmap.close()
+
+    def __enter__(self) -> "CategorySnapshot":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._n
+
+    def _string(self, no: int) -> str:
+        return str(self._blob[self._offsets[no]:self._offsets[no + 1]], "utf-8")
+
+    def category(self, i: int) -> Category:
+        """i 番目のカテゴリ"""
+        level_no = next(j for j in range(len(LEVEL_CODES)) if i < self._level_starts[j + 1])
+        values = {name: self._string(self._columns[name][i]) for name in _COLUMNS}
+        return Category(level=LEVEL_CODES[level_no], **values)
+
+    def __iter__(self) -> Iterator[Category]:
+        return (self.category(i) for i in range(self._n))
+
+    def level(self, level: str) -> List[Category]:
+        """その階層のカテゴリ"""
+        j = LEVEL_CODES.index(level)
+        return [self.category(i) for i in range(self._level_starts[j], self._level_starts[j + 1])]
+
+    def level_counts(self) -> Dict[str, int]:
+        return {level: self._level_starts[j + 1] - self._level_starts[j]
+                for j, level in enumerate(LEVEL_CODES) if self._level_starts[j + 1] > self._level_starts[j]}
+
+    def parent(self, i: int) -> Optional[int]:
+        """i 番目のカテゴリの親の位置（なければ None）"""
+        p = self._parents[i]
+        return p if p >= 0 else None
+
+    def find(self, category_id: str) -> Optional[Category]:
+        """カテゴリIDから引く（階層形式のIDは末尾のIDで引く、見つからなければ None）"""
+        target = str(category_id).rsplit("-", 1)[-1].encode("utf-8")
+        ids = self._columns["category_id"]
+        lo, hi = 0, self._n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            no = ids[self._id_order[mid]]
+            if self._blob[self._offsets[no]:self._offsets[no + 1]].tobytes() < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._n:
+            i = self._id_order[lo]
+            no = ids[i]
+            if self._blob[self._offsets[no]:self._offsets[no + 1]].tobytes() == target:
+                return self.category(i)
+        return None
+
+    def to_tree(self) -> CategoryTree:
+        """全件を CategoryTree にする（文字列表は1回だけデコードし、同じ文字列は1つを共有する）"""
+        blob = self._blob.tobytes()
+        offsets = self._offsets.tolist()
+        strings = [sys.intern(blob[a:b].decode("utf-8")) for a, b in zip(offsets, offsets[1:])]
+        ids, names, parent_ids, hierarchical_ids, urls = (self._columns[name].tolist() for name in _COLUMNS)
+        categories = []
+        for j, level in enumerate(LEVEL_CODES):
+            for i in range(self._level_starts[j], self._level_starts[j + 1]):
+                categories.append(Category(strings[ids[i]], strings[names[i]], level, strings[parent_ids[i]],
+                                           strings[hierarchical_ids[i]], strings[urls[i]]))
+        return CategoryTree.from_categories(categories, self.loaded_at)
+
+
+def open_snapshot(path: str) -> Optional[CategorySnapshot]:
+    """スナップショットを開く（ない・読めない場合は None）"""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return CategorySnapshot(path)
+    except (OSError, ValueError, struct.error) as e:
+        logger.warning(f"カテゴリのスナップショットを読めません: {type(e).__name__}: {str(e)} ({path})")
+        return None
@@ -1,15 +1,20 @@
 # components.py
 import streamlit as st
 import pandas as pd
-from typing import List, Dict, Any
+from typing import List
 import time
 import logging
 
 import constants as ct
+import tracing as tr
+from gazetteer import location_options as location_options_list, resolve_location
+from images import fetch_thumbnail
+from models import NutritionEstimate, Recipe, RecipeCombination
 
 # ログ設定（utils.pyで初期化済みのロガーを取得）
 logger = logging.getLogger(__name__)
 
+@tr.traced("render")
 def sidebar_inputs(defaults: dict, consumed_kcal: float = 0) -> dict:
     logger.debug("サイドバー入力処理開始")
     
@@ -100,7 +105,13 @@ def sidebar_inputs(defaults: dict, consumed_kcal: float = 0) -> dict:
     )
     
     meal_type = st.sidebar.selectbox("食事の区分", ct.MEAL_TYPES, index=1)
-    location = st.sidebar.selectbox("地域", ["Tokyo", "Osaka", "Sapporo", "Fukuoka"], index=0)
+    # 市区町村から選ぶ（入力して絞り込める）。天気は近くの格子点の予報を使う
+    location_options = location_options_list()
+    default_location = resolve_location(defaults["location"]).key
+    location = st.sidebar.selectbox(
+        "地域", location_options,
+        index=location_options.index(default_location) if default_location in location_options else 0
+    )
 
     st.sidebar.markdown("---")
     propose = st.sidebar.button(f"{ct.RECIPE_ICONS} レシピ提案")
@@ -128,6 +139,7 @@ def sidebar_inputs(defaults: dict, consumed_kcal: float = 0) -> dict:
     
     return inputs
 
+@tr.traced("render")
 def show_weather_calendar(weather: dict):
     logger.debug("天気カレンダー表示処理開始")
     st.subheader(f"{ct.SCHEDULE_ICONS} 今週の天気（最高/最低）")
@@ -145,42 +157,44 @@ def show_weather_calendar(weather: dict):
     })
     st.dataframe(df, use_container_width=True, hide_index=True)
 
-def recipe_card(idx: int, r: dict, kcal_info: dict, cheer: str):
-    recipe_name = r.get('recipeName', '(名称不明)')
+@tr.traced("render")
+def recipe_card(idx: int, r: Recipe, kcal_info: NutritionEstimate, cheer: str):
+    recipe_name = r.name or '(名称不明)'
     logger.debug(f"レシピカード{idx}表示: {recipe_name}")
     
     with st.container(border=True):
         cols = st.columns([1,2,2])
         with cols[0]:
-            if r.get("foodImageUrl"):
-                st.image(r["foodImageUrl"], width=160)
+            # 楽天の画像URLではなく、ローカルにキャッシュしたサムネイルを表示する
+            image = fetch_thumbnail(r.image_url)
+            if image:
+                st.image(image, width=160)
                 logger.debug(f"レシピ{idx}画像表示")
         with cols[1]:
             st.markdown(f"**{idx}. {recipe_name}**")
-            st.write(f"推定カロリー: **{int(kcal_info['kcal'])} kcal**")
-            st.write(f"P: {kcal_info['protein_g']:.1f} g / F: {kcal_info['fat_g']:.1f} g / C: {kcal_info['carb_g']:.1f} g")
-            if r.get("recipeUrl"):
-                st.link_button("レシピを見る（楽天）", r["recipeUrl"])
+            st.write(f"推定カロリー: **{int(kcal_info.kcal)} kcal**")
+            st.write(f"P: {kcal_info.protein_g:.1f} g / F: {kcal_info.fat_g:.1f} g / C: {kcal_info.carb_g:.1f} g")
+            if r.url:
+                st.link_button("レシピを見る（楽天）", r.url)
         with cols[2]:
             st.caption("管理栄養士AIからのひとこと")
             st.info(cheer)
 
-def recipe_combination_card(idx: int, combination: dict, cheer: str):
+@tr.traced("render")
+def recipe_combination_card(idx: int, combination: RecipeCombination, cheer: str):
     """複数レシピ組み合わせ表示用のカード"""
-    logger.debug(f"組み合わせカード{idx}表示: {combination['combination_name']}")
+    logger.debug(f"組み合わせカード{idx}表示: {combination.name}")
     
     with st.container(border=True):
         # ヘッダー情報
-        st.markdown(f"### 🍽️ 組み合わせ {idx}: {combination['combination_name']}")
-        st.markdown(f"**合計カロリー: {int(combination['total_kcal'])} kcal** (組み合わせタイプ: {combination['type']})")
+        st.markdown(f"### 🍽️ 組み合わせ {idx}: {combination.name}")
+        st.markdown(f"**合計カロリー: {int(combination.total_kcal)} kcal** (組み合わせタイプ: {combination.kind})")
         
         # 各レシピの詳細を横並び表示
-        cols = st.columns(len(combination['recipes']))
+        cols = st.columns(len(combination.recipes))
         
-        for i, recipe_info in enumerate(combination['recipes']):
-            recipe = recipe_info['recipe']
-            kcal_info = recipe_info['kcal_info']
-            recipe_type = recipe_info['type']
+        for i, (recipe, kcal_info) in enumerate(combination.items()):
+            recipe_type = recipe.dish_type
             
             with cols[i]:
                 # レシピタイプの表示
@@ -188,25 +202,27 @@ def recipe_combination_card(idx: int, combination: dict, cheer: str):
                 st.markdown(f"{type_emoji.get(recipe_type, '🍽️')} **{recipe_type.upper()}**")
                 
                 # 画像表示
-                if recipe.get("foodImageUrl"):
-                    st.image(recipe["foodImageUrl"], width=150)
+                image = fetch_thumbnail(recipe.image_url)
+                if image:
+                    st.image(image, width=150)
                 
                 # レシピ情報
-                st.markdown(f"**{recipe.get('recipeName', '(名称不明)')}**")
-                st.write(f"カロリー: **{int(kcal_info['kcal'])} kcal**")
-                st.write(f"P: {kcal_info['protein_g']:.1f}g")
-                st.write(f"F: {kcal_info['fat_g']:.1f}g") 
-                st.write(f"C: {kcal_info['carb_g']:.1f}g")
+                st.markdown(f"**{recipe.name or '(名称不明)'}**")
+                st.write(f"カロリー: **{int(kcal_info.kcal)} kcal**")
+                st.write(f"P: {kcal_info.protein_g:.1f}g")
+                st.write(f"F: {kcal_info.fat_g:.1f}g") 
+                st.write(f"C: {kcal_info.carb_g:.1f}g")
                 
                 # レシピリンク
-                if recipe.get("recipeUrl"):
-                    st.link_button("🔗 レシピ", recipe["recipeUrl"])
+                if recipe.url:
+                    st.link_button("🔗 レシピ", recipe.url)
         
         # 応援メッセージ
         st.markdown("---")
         st.caption("💬 管理栄養士AIからのひとこと")
         st.info(cheer)
 
+@tr.traced("render")
 def weekly_table(rows: List[dict]):
     logger.info(f"週間献立テーブル表示 - {len(rows)}日分")
     st.subheader(f"{ct.SCHEDULE_ICONS} 1週間の献立（1日1品）")
@@ -236,6 +252,42 @@ def weekly_table(rows: List[dict]):
                     st.link_button("🔗 レシピを見る", row["レシピリンク"])
                     st.write("")  # 間隔調整
 
+def deadline_notice(deadline):
+    """締め切りのため省略した処理があれば知らせる（deadline は deadline.Deadline または None）"""
+    if deadline is None or not deadline.skipped:
+        return
+    logger.info(f"締め切りにより省略: {', '.join(deadline.skipped)}")
+    st.caption(f"⏱️ 表示を優先するため一部の処理を省略・簡略化しました（{'、'.join(deadline.skipped)}）")
+
+@tr.traced("render")
+def history_charts(daily: pd.DataFrame, weekly: pd.DataFrame, summary: dict, target_kcal: int):
+    """摂取履歴（目標との比較・区分ごとの内訳・週別の合計）"""
+    logger.debug(f"摂取履歴表示 - {summary['days']}日分, 記録 {summary['logged_days']}日")
+    if summary["logged_days"] == 0:
+        st.info("この期間の食事記録はまだありません。提案されたレシピの「この料理を…に記録」を押すと記録されます。")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("記録した日", f"{summary['logged_days']} / {summary['days']}日")
+    col2.metric("1日平均", f"{int(summary['avg_kcal'])}kcal", delta=f"{int(summary['avg_kcal'] - target_kcal):+d}kcal（目標比）",
+                delta_color="inverse")
+    col3.metric("目標超過", f"{summary['over_target_days']}日", help=f"目標 {target_kcal}kcal を超えた日数")
+
+    st.subheader("摂取カロリーと目標")
+    chart = daily[["合計", "移動平均"]].copy()
+    chart["目標"] = float(target_kcal)
+    st.line_chart(chart, y_label="kcal")
+
+    st.subheader("食事の区分ごとの内訳")
+    st.bar_chart(daily[ct.MEAL_TYPES], y_label="kcal")
+    st.caption(" / ".join(f"{m}: 平均 {int(v)}kcal" for m, v in summary["avg_by_meal_type"].items()))
+
+    st.subheader("週別の合計")
+    table = weekly.copy()
+    table["目標（7日分）"] = target_kcal * 7
+    table.index = table.index.strftime("%Y-%m-%d 〜")
+    st.dataframe(table.astype(int), use_container_width=True)
+
 def show_loading_progress(message: str, progress: float = None):
     """ローディング表示とプログレスバー"""
     logger.debug(f"ローディング表示: {message}")
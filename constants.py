@@ -36,9 +36,13 @@ RAKUTEN_RANKING_URL = "https://app.rakuten.co.jp/services/api/Recipe/CategoryRan
 
 # 楽天API設定
 RAKUTEN_API_DELAY = 1.2  # 楽天APIリクエスト間の基本遅延（秒）
-RAKUTEN_API_RETRY_DELAY = 3.0  # リトライ時の遅延（秒）
-RAKUTEN_API_MAX_RETRIES = 3  # 最大リトライ回数
-RAKUTEN_API_TIMEOUT = 25  # タイムアウト時間（秒）
+RAKUTEN_API_RETRY_DELAY = 1.5  # リトライ時の遅延の基準値（秒、指数バックオフ+ジッター）
+RAKUTEN_API_MAX_RETRY_DELAY = 6.0  # リトライ時の遅延の上限（秒）
+RAKUTEN_API_MAX_RETRIES = 2  # 最大リトライ回数
+RAKUTEN_API_TIMEOUT = 10  # タイムアウト時間（秒）
+CATEGORY_TREE_TTL_SEC = 24 * 3600  # カテゴリツリー（プロセスで共有）の更新間隔（秒）
+# カテゴリツリーのスナップショット（全プロセスが mmap で共有、"" なら使わない）
+CATEGORY_SNAPSHOT_PATH = "./category_cache/categories.nbct"
 
 # カテゴリIDマッピング（楽天レシピAPIの構造に基づく）
 RAKUTEN_GENRE_TO_CATEGORY = {
@@ -48,16 +52,21 @@ RAKUTEN_GENRE_TO_CATEGORY = {
 }
 
 RAKUTEN_TOP_N = 4  # 上位4件
+# 主食+副菜提案で副菜を追加取得するときの検索キーワード
+SIDE_DISH_SEARCH_KEYWORDS = ["サラダ", "野菜", "副菜", "おかず"]
 
 # --------- 天気（Open-Meteo） ----------
-# 都市→緯度経度
-CITY_COORDS = {
-    "Tokyo": (35.6895, 139.6917),
-    "Osaka": (34.6937, 135.5023),
-    "Sapporo": (43.0618, 141.3545),
-    "Fukuoka": (33.5902, 130.4017),
-}
+# 市区町村 → 緯度経度（地域の指定は「都道府県 市区町村」・市区町村名・英語表記・"緯度,経度"）
+MUNICIPALITIES_PATH = "data/municipalities.csv"  # アプリのディレクトリからの相対パス
+GAZETTEER_MAX_DISTANCE_KM = 100.0  # "緯度,経度" の指定で、最寄りの市区町村がこれより遠ければ対象外（国外・海上）
 OPEN_METEO_BASE = "https://api.open-meteo.com/v1/forecast"
+OPEN_METEO_TIMEOUT = 8  # タイムアウト時間（秒）
+# 天気は格子点単位で取得・キャッシュする（近くのユーザーは同じ予報を共有）
+WEATHER_GRID_DEG = 0.25           # 格子の間隔（度、約25km）
+WEATHER_CACHE_TTL_SEC = 3600      # 格子点ごとの予報のキャッシュ時間（秒）
+WEATHER_BATCH_WINDOW_SEC = 0.05   # 同時期の要求を1回のリクエストにまとめるための待ち時間（秒）
+WEATHER_BATCH_MAX_CELLS = 50      # 1回のリクエストに含める格子点数の上限
+WEATHER_BATCH_TIMEOUT_SEC = 16    # 1回の一括取得（リトライを含む）にかける時間の上限（秒、要求したユーザーの締め切りとは別）
 
 # 温度感の閾値
 TEMP_FEEL_THRESHOLDS = {
@@ -71,8 +80,159 @@ TEMP_FEEL_THRESHOLDS = {
 # 簡易係数（例）：総カロリーからP/F/Cをざっくり配分（LangChain出力の補助）
 DEFAULT_PFC_RATIO = {"P": 0.25, "F": 0.25, "C": 0.50}
 
+# カロリー/PFC推定方式（環境変数 NUTRITION_ESTIMATOR で切替）
+#   "llm":   OpenAIで推定し、失敗時は食品成分表で推定
+#   "local": 食品成分表で推定し、材料を照合できない場合のみOpenAIを使う
+#   "router": 食品成分表の推定の信頼度がしきい値以上ならそれを使い、未満のレシピだけOpenAIで推定
+NUTRITION_ESTIMATORS = ["llm", "local", "router"]
+DEFAULT_NUTRITION_ESTIMATOR = "llm"
+FOOD_COMPOSITION_PATH = "data/food_composition.csv"  # 食品成分表（アプリのディレクトリからの相対パス）
+INGREDIENTS_PATH = "data/ingredients.csv"  # 材料名の正規化辞書（同上）
+INGREDIENT_CONTAINS_MIN_CHARS = 3  # 材料名の途中に含まれる表記で照合する最短の長さ（「米」「パン」などの短い表記は末尾でだけ照合）
+FALLBACK_KCAL = 500.0  # どの推定方式も使えないときの安全値
+# NUTRITION_ESTIMATOR=router の振り分け（estimate_router.py）
+DEFAULT_ROUTER_CONFIDENCE_THRESHOLD = 0.75  # 環境変数 ROUTER_CONFIDENCE_THRESHOLD（0〜1、上げるほどLLMに送る）
+ROUTER_COVERAGE_WEIGHT = 0.7                # 信頼度のうち材料の照合率の重み（残りは料理の種類に対するカロリーの妥当性）
+# 料理の種類（classify_recipe_type）ごとの1人前として妥当なカロリーの範囲
+ROUTER_DISH_KCAL_RANGE = {"main": (250.0, 1200.0), "side": (20.0, 450.0), "soup": (10.0, 350.0)}
+# LLM推定値の検証
+ESTIMATE_KCAL_RANGE = (20.0, 3000.0)   # 1人前として妥当なカロリーの範囲
+ESTIMATE_PFC_KCAL_TOLERANCE = 0.2      # kcal と 4P+9F+4C のずれの許容率
+ESTIMATE_MAX_RETRIES = 1               # 検証に通らなかったレシピの再リクエスト回数
+
+# --------- 上流APIの障害対策（resilience.py） ----------
+OPENAI_TIMEOUT = 30  # OpenAI APIのタイムアウト時間（秒）
+# 上流ごとのリトライ（指数バックオフ+ジッター）と回路遮断の設定
+RESILIENCE_SETTINGS = {
+    "rakuten": {
+        "max_retries": RAKUTEN_API_MAX_RETRIES,
+        "base_delay": RAKUTEN_API_RETRY_DELAY,
+        "max_delay": RAKUTEN_API_MAX_RETRY_DELAY,
+        "failure_threshold": 5,   # 連続失敗で遮断
+        "reset_timeout": 30.0,    # 遮断してから試行を再開するまで（秒）
+    },
+    "open_meteo": {
+        "max_retries": 1,
+        "base_delay": 0.5,
+        "max_delay": 2.0,
+        "failure_threshold": 3,
+        "reset_timeout": 60.0,
+    },
+    "openai": {
+        "max_retries": 2,
+        "base_delay": 1.0,
+        "max_delay": 8.0,
+        "failure_threshold": 5,
+        "reset_timeout": 30.0,
+    },
+    "rakuten_image": {
+        "max_retries": 1,
+        "base_delay": 0.5,
+        "max_delay": 2.0,
+        "failure_threshold": 5,
+        "reset_timeout": 60.0,
+    },
+}
+# リトライ予算: 直近の時間窓のリトライ数を「最小値 + 比率 × リクエスト数」までに抑える
+RETRY_BUDGET_RATIO = 0.2
+RETRY_BUDGET_MIN_RETRIES = 3
+RETRY_BUDGET_WINDOW_SEC = 10.0
+
+# --------- 処理全体の締め切り（deadline.py） ----------
+PROPOSAL_DEADLINE_SEC = 25.0         # レシピ提案1回にかける時間の上限（秒）
+WEEKLY_DEADLINE_SEC = 30.0           # 1週間の献立作成にかける時間の上限（秒）
+DEADLINE_MIN_CALL_SEC = 0.5          # 残りがこれ未満なら上流呼び出しを始めない（秒）
+DEADLINE_OPTIONAL_RESERVE_SEC = 3.0  # 応援メッセージ・副菜の追加取得など省略可能な処理に必要な残り時間（秒）
+
+# --------- キャッシュの事前取得（warmup.py） ----------
+WARMUP_ESTIMATE_WORKERS = 3  # カロリー推定の並列数（楽天APIは1件ずつ順に取得する）
+
+# --------- 週間献立の一括作成（bulk_plan.py） ----------
+BULK_PLAN_UPSTREAM_CONCURRENCY = 4  # 上流呼び出しの同時実行数（楽天APIの待機・リトライ予算は通常どおり）
+BULK_PLAN_MAX_INFLIGHT = 64         # 同時に処理するプロファイル数
+BULK_PLAN_PROGRESS_EVERY = 100      # 進捗を表示する間隔（件）
+
+# --------- LLM呼び出しのヘッジ（hedge.py） ----------
+# 環境変数 HEDGE_MODE で有効化（既定は無効）
+#   off: ヘッジしない / duplicate: 同じリクエストをもう1本送る / local: カロリー推定は食品成分表で代替
+#   （応援メッセージは local でも同じリクエストをもう1本送る）
+HEDGE_MODES = ["off", "duplicate", "local"]
+DEFAULT_HEDGE_MODE = "off"
+HEDGE_PERCENTILE = 90            # 直近の所要時間のこのパーセンタイルを超えたら2本目を出す
+HEDGE_LATENCY_WINDOW = 200       # パーセンタイル計算に使う直近の件数
+HEDGE_MIN_SAMPLES = 20           # これ未満の件数では HEDGE_INITIAL_DELAY_SEC を使う
+HEDGE_INITIAL_DELAY_SEC = 5.0    # 計測が揃うまでの待ち時間（秒）
+HEDGE_MIN_DELAY_SEC = 0.2        # 待ち時間の下限（秒）
+# ヘッジ予算: 直近 window 秒で「min + ratio × 呼び出し数」本まで
+HEDGE_BUDGET_RATIO = 0.1
+HEDGE_BUDGET_MIN = 2
+HEDGE_BUDGET_WINDOW_SEC = 60.0
+HEDGE_MAX_WORKERS = 16
+
+# --------- ジョブキュー（jobs.py / worker.py） ----------
+# 環境変数 JOB_QUEUE=true で有効化（稼働中のワーカーがいなければ従来どおりその場で実行）
+DEFAULT_JOB_QUEUE_PATH = "./nutribuddy_jobs.db"
+JOB_DB_TIMEOUT = 10.0              # SQLiteのロック待ち（秒）
+JOB_MAX_ATTEMPTS = 3               # ジョブの最大実行回数
+JOB_RETRY_BASE_DELAY = 2.0         # 再試行の待機の基準値（秒、指数バックオフ+ジッター）
+JOB_RETRY_MAX_DELAY = 30.0         # 再試行の待機の上限（秒）
+JOB_LEASE_SEC = 120.0              # 実行中ジョブのリース（ワーカーが落ちた場合はこの後に取り直す）
+JOB_POLL_INTERVAL_SEC = 0.2        # 画面・ワーカーのポーリング間隔（秒）
+JOB_WAIT_TIMEOUT_SEC = 30.0        # 画面がジョブの結果を待つ上限（秒、締め切りがあればそちらを優先）
+JOB_WORKER_CONCURRENCY = 4         # ワーカーの既定の同時実行数
+JOB_HEARTBEAT_INTERVAL_SEC = 5.0   # ワーカーの生存通知の間隔（秒）
+JOB_WORKER_TIMEOUT_SEC = 20.0      # これ以上生存通知がなければワーカー停止中とみなす（秒）
+JOB_PURGE_INTERVAL_SEC = 600.0     # 古いジョブの削除間隔（秒）
+JOB_RETENTION_SEC = 24 * 3600      # 完了・失敗ジョブの保持期間（秒）
+# 完了済みジョブの結果を同じ条件の投入で再利用する期間（秒、st.cache_data の ttl に合わせる）
+JOB_RESULT_TTL_SEC = {
+    "estimate": 6 * 3600,
+    "cheer": 3600,
+    "ranking": 3600,
+}
+
+# --------- ログ ----------
+LOG_DIR = "logs"
+LOG_MAX_BYTES = 10 * 1024 * 1024  # 1ファイルの上限（超えたら同日内でローテーション）
+LOG_BACKUP_COUNT = 5               # 同日内のローテーション世代数
+LOG_RETENTION_DAYS = 14            # 日付ごとのログファイルの保持日数
+# DEBUGログの間引き率（ロガー名 → N件に1件を出力）
+LOG_SAMPLING_RATES = {
+    "NutriBuddy.category_search": 20,
+}
+
 # --------- SQLite ----------
 DEFAULT_SQLITE_PATH = "./nutribuddy.db"
+# user_id 列の既定値（ユーザー分割前の既存の記録や、ユーザーIDを指定しない呼び出しはこのユーザーのもの）
+DEFAULT_USER_ID = "default"
+# 他の接続が書き込み中のときにロック解放を待つ秒数（超えると "database is locked"）
+DB_BUSY_TIMEOUT = 10.0
+# URLの ?user= で受け付けるユーザーIDの形式
+USER_ID_PATTERN = r"^[A-Za-z0-9_-]{1,64}$"
+
+# --------- レシピ画像のサムネイル（images.py） ----------
+IMAGE_CACHE_DIR = "./image_cache"
+IMAGE_CACHE_MAX_BYTES = 200 * 1024 * 1024  # ディスク上のサムネイルの合計サイズの上限（超えたら古いものから削除）
+IMAGE_THUMBNAIL_SIZE = 320                 # 長辺（px）。カードの表示幅 150〜160px の高DPI画面向けに2倍
+IMAGE_THUMBNAIL_QUALITY = 80
+IMAGE_FETCH_TIMEOUT = 5                    # 元画像の取得のタイムアウト（秒）
+IMAGE_MAX_SOURCE_BYTES = 10 * 1024 * 1024  # これより大きい元画像は取得しない
+IMAGE_FAILURE_TTL_SEC = 300                # 取得できなかった画像を再取得しない時間（秒）
+IMAGE_PREFETCH_WORKERS = 4                 # カード表示前の一括取得の並列数
+
+# --------- レシピ提案の共有ストア（proposals.py） ----------
+PROPOSAL_STORE_MAX_RECIPES = 2_000     # 全セッションで共有するレシピの件数上限（超えたら古いものから削除）
+PROPOSAL_STORE_MAX_ESTIMATES = 10_000  # 全セッションで共有する推定結果の件数上限（レシピ×条件）
+PROPOSAL_SESSION_MAX_BUNDLES = 5       # 1セッションが覚えておく提案の件数（キーだけを持つ）
+
+# --------- 食事記録の書き出し・取り込み（meal_io.py） ----------
+MEAL_IO_CHUNK_ROWS = 50_000  # 1回に読み書きする行数（取り込みはこの件数ごとに1トランザクション）
+MEAL_IO_LOGGED_BAD_ROWS = 20  # 取り込みで内容をログに出す不正な行の件数（以降は件数だけ数える）
+
+# --------- 摂取履歴（history.py / pages/1_履歴.py） ----------
+HISTORY_WINDOWS_DAYS = [7, 30, 90]  # 表示期間の選択肢（日）
+HISTORY_ROLLING_DAYS = 7            # 移動平均の日数
+HISTORY_CACHE_MAX_ENTRIES = 512     # グラフデータのキャッシュ件数（ユーザー×期間×版）
 
 # --------- プロンプト（応援メッセージ） ----------
 SYSTEM_PROMPT = """あなたは思いやりのある管理栄養士AIです。
@@ -90,6 +250,24 @@ RECIPE_KCAL_PROMPT = """以下の料理について、1人前の推定カロリ
 考慮: 季節({season}), 天気の体感({feel})
 注意: 数値は妥当な範囲で整数または少数。日本の一般的な分量を想定。"""
 
+# カロリー推定の構造化出力（JSON Schema）
+RECIPE_KCAL_FIELDS = ["kcal", "protein_g", "fat_g", "carb_g"]
+RECIPE_KCAL_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "nutrition_estimate",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {field: {"type": "number"} for field in RECIPE_KCAL_FIELDS},
+            "required": RECIPE_KCAL_FIELDS,
+            "additionalProperties": False,
+        },
+    },
+}
+# 検証に通らなかったときの再リクエストに付ける注意書き
+RECIPE_KCAL_RETRY_NOTE = "重要: kcal は 4×protein_g + 9×fat_g + 4×carb_g とおおむね一致させてください。"
+
 # 応援メッセージ
 CHEER_PROMPT = """以下の条件に合う、短い1文の応援メッセージを出してください（30〜50文字目安）。
 条件:
@@ -99,4 +277,5 @@ CHEER_PROMPT = """以下の条件に合う、短い1文の応援メッセージ
 - ポジティブ、やさしい口調
 - 絵文字は1個まで
 - 「〜で」「〜から」などでダイエット効果と応援を自然に繋げる
-提案の要約: {summary}"""
\ No newline at end of file
+提案の要約: {summary}"""
+CHEER_FALLBACK_MESSAGE = "今日もお疲れ様です！健康的な食生活を続けていきましょう！"
\ No newline at end of file
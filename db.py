@@ -0,0 +1,366 @@
+# db.py
+import os
+import hashlib
+import sqlite3
+import logging
+import threading
+from datetime import datetime, date, timedelta
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import constants as ct
+import tracing as tr
+import metrics as mt
+
+logger = logging.getLogger('NutriBuddy')
+
+# init_db 済みのDBファイル（ユーザーごとのファイルに分ける場合、再実行のたびにDDLを流さないため）
+_initialized_paths = set()
+_initialized_lock = threading.Lock()
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    # 他のユーザーの書き込み中でもすぐに失敗せず、ロック解放を待つ
+    return sqlite3.connect(db_path, timeout=ct.DB_BUSY_TIMEOUT)
+
+# ---- ユーザーごとのDBファイル ----
+def user_db_path(db_path: str, user_id: str, sharded: bool = False) -> str:
+    """
+    ユーザーの食事記録を保存するDBファイルのパス
+
+    sharded=False なら全ユーザーで db_path を共有する（user_id 列で区別）。
+    sharded=True ならユーザーごとに別ファイル（<db_path の拡張子なし>_users/ab/abcdef....db）にし、
+    書き込みロックがユーザー間で競合しないようにする。ファイル名はユーザーIDのハッシュで、
+    1ディレクトリのファイル数が増えすぎないよう先頭2文字で振り分ける。
+    """
+    if not sharded:
+        return db_path
+    digest = hashlib.sha1(user_id.encode("utf-8")).hexdigest()
+    shard_dir = os.path.join(os.path.splitext(db_path)[0] + "_users", digest[:2])
+    os.makedirs(shard_dir, exist_ok=True)
+    return os.path.join(shard_dir, f"{digest}.db")
+
+# ---- DB 初期化 ----
+@tr.traced("db")
+def init_db(db_path: str):
+    with _initialized_lock:
+        if db_path in _initialized_paths:
+            return
+    conn = _connect(db_path)
+    cur = conn.cursor()
+    with mt.DB_QUERY_SECONDS.time(op="init_db"):
+        # WAL: 読み取りが書き込みを待たない（設定はDBファイルに保存される）
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS meal_logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL DEFAULT '{ct.DEFAULT_USER_ID}',
+                ts TEXT NOT NULL,
+                date TEXT NOT NULL,
+                meal_type TEXT NOT NULL,     -- 朝/昼/晩
+                name TEXT NOT NULL,          -- 料理名
+                kcal REAL NOT NULL           -- 推定カロリー
+            )
+        """)
+        # user_id 列がない既存のDBは列を追加する（既存の記録は DEFAULT_USER_ID のものになる）
+        columns = {row[1] for row in cur.execute("PRAGMA table_info(meal_logs)")}
+        if "user_id" not in columns:
+            logger.info(f"meal_logs に user_id 列を追加（既存の記録は '{ct.DEFAULT_USER_ID}' に割り当て）")
+            cur.execute(f"ALTER TABLE meal_logs ADD COLUMN user_id TEXT NOT NULL DEFAULT '{ct.DEFAULT_USER_ID}'")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_meal_logs_user_date ON meal_logs (user_id, date)")
+        # 一括取り込み時の重複判定用
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_meal_logs_user_ts ON meal_logs (user_id, ts)")
+        # 履歴表示用の集計（食事記録の追加と同じトランザクションで更新する）
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS meal_daily_rollup (
+                user_id TEXT NOT NULL,
+                date TEXT NOT NULL,
+                meal_type TEXT NOT NULL,
+                kcal REAL NOT NULL,
+                meals INTEGER NOT NULL,
+                PRIMARY KEY (user_id, date, meal_type)
+            ) WITHOUT ROWID
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS meal_weekly_rollup (
+                user_id TEXT NOT NULL,
+                week_start TEXT NOT NULL,    -- 週の月曜日
+                kcal REAL NOT NULL,
+                meals INTEGER NOT NULL,
+                PRIMARY KEY (user_id, week_start)
+            ) WITHOUT ROWID
+        """)
+        # ユーザーごとの記録の版（追加のたびに増やし、履歴グラフのキャッシュキーに使う）
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS meal_log_versions (
+                user_id TEXT PRIMARY KEY,
+                version INTEGER NOT NULL
+            ) WITHOUT ROWID
+        """)
+        # 集計テーブル導入前の記録があれば一度だけ集計し直す
+        if (cur.execute("SELECT 1 FROM meal_logs LIMIT 1").fetchone()
+                and not cur.execute("SELECT 1 FROM meal_daily_rollup LIMIT 1").fetchone()):
+            logger.info("既存の食事記録から日別・週別の集計を作成")
+            _rebuild_rollups(cur)
+    conn.commit()
+    conn.close()
+    with _initialized_lock:
+        _initialized_paths.add(db_path)
+
+# ---- 日別・週別の集計 ----
+def _week_start(d: date) -> str:
+    return (d - timedelta(days=d.weekday())).isoformat()
+
+def _add_to_rollups(cur: sqlite3.Cursor, user_id: str, d: date, meal_type: str, kcal: float):
+    cur.execute("""
+        INSERT INTO meal_daily_rollup (user_id, date, meal_type, kcal, meals) VALUES (?, ?, ?, ?, 1)
+        ON CONFLICT (user_id, date, meal_type) DO UPDATE SET kcal = kcal + excluded.kcal, meals = meals + 1
+    """, (user_id, d.isoformat(), meal_type, kcal))
+    cur.execute("""
+        INSERT INTO meal_weekly_rollup (user_id, week_start, kcal, meals) VALUES (?, ?, ?, 1)
+        ON CONFLICT (user_id, week_start) DO UPDATE SET kcal = kcal + excluded.kcal, meals = meals + 1
+    """, (user_id, _week_start(d), kcal))
+    _bump_version(cur, user_id)
+
+def _bump_version(cur: sqlite3.Cursor, user_id: str):
+    cur.execute("""
+        INSERT INTO meal_log_versions (user_id, version) VALUES (?, 1)
+        ON CONFLICT (user_id) DO UPDATE SET version = version + 1
+    """, (user_id,))
+
+def _rebuild_rollups(cur: sqlite3.Cursor):
+    cur.execute("DELETE FROM meal_daily_rollup")
+    cur.execute("DELETE FROM meal_weekly_rollup")
+    cur.execute("""
+        INSERT INTO meal_daily_rollup (user_id, date, meal_type, kcal, meals)
+        SELECT user_id, date, meal_type, SUM(kcal), COUNT(*) FROM meal_logs GROUP BY user_id, date, meal_type
+    """)
+    # date(d, '-6 days', 'weekday 1'): d 以前で最も近い月曜日
+    cur.execute("""
+        INSERT INTO meal_weekly_rollup (user_id, week_start, kcal, meals)
+        SELECT user_id, date(date, '-6 days', 'weekday 1') AS week_start, SUM(kcal), COUNT(*)
+        FROM meal_logs GROUP BY user_id, week_start
+    """)
+    for (user_id,) in cur.execute("SELECT DISTINCT user_id FROM meal_logs").fetchall():
+        _bump_version(cur, user_id)
+
+@tr.traced("db")
+def rebuild_rollups(db_path: str):
+    """meal_logs から集計テーブルを作り直す（記録を直接編集・一括投入した後に使う）"""
+    conn = _connect(db_path)
+    try:
+        with mt.DB_QUERY_SECONDS.time(op="rebuild_rollups"):
+            _rebuild_rollups(conn.cursor())
+            conn.commit()
+    finally:
+        conn.close()
+
+@tr.traced("db")
+def meal_log_version(db_path: str, user_id: str = ct.DEFAULT_USER_ID) -> int:
+    """ユーザーの食事記録の版（記録を追加するたびに増える。記録がなければ 0）"""
+    conn = _connect(db_path)
+    try:
+        row = conn.execute("SELECT version FROM meal_log_versions WHERE user_id = ?", (user_id,)).fetchone()
+    finally:
+        conn.close()
+    return int(row[0]) if row else 0
+
+@tr.traced("db")
+def fetch_daily_rollup(db_path: str, user_id: str, since: str) -> List[Tuple[str, str, float, int]]:
+    """since（ISO日付）以降の日別・区分別の集計 [(date, meal_type, kcal, meals), ...]"""
+    conn = _connect(db_path)
+    try:
+        with mt.DB_QUERY_SECONDS.time(op="fetch_daily_rollup"):
+            return conn.execute(
+                "SELECT date, meal_type, kcal, meals FROM meal_daily_rollup WHERE user_id = ? AND date >= ? ORDER BY date",
+                (user_id, since)
+            ).fetchall()
+    finally:
+        conn.close()
+
+@tr.traced("db")
+def fetch_weekly_rollup(db_path: str, user_id: str, since: str) -> List[Tuple[str, float, int]]:
+    """since（ISO日付）以降に始まる週の集計 [(week_start, kcal, meals), ...]"""
+    conn = _connect(db_path)
+    try:
+        with mt.DB_QUERY_SECONDS.time(op="fetch_weekly_rollup"):
+            return conn.execute(
+                "SELECT week_start, kcal, meals FROM meal_weekly_rollup WHERE user_id = ? AND week_start >= ? ORDER BY week_start",
+                (user_id, since)
+            ).fetchall()
+    finally:
+        conn.close()
+
+# ---- 一括の書き出し・取り込み ----
+# 書き出せるテーブルと列（meal_logs の id はDBごとの連番のため含めない）
+EXPORT_COLUMNS = {
+    "meal_logs": ("user_id", "ts", "date", "meal_type", "name", "kcal", "seq"),
+    "meal_daily_rollup": ("user_id", "date", "meal_type", "kcal", "meals"),
+    "meal_weekly_rollup": ("user_id", "week_start", "kcal", "meals"),
+}
+# 列ではなく式で書き出す値
+# seq: 同じユーザー・日時・区分・料理名・カロリーの記録のうち何件目か（0始まり、取り込み時の同一性の判定に使う）
+_EXPORT_EXPRESSIONS = {
+    "seq": "ROW_NUMBER() OVER (PARTITION BY user_id, ts, meal_type, name, kcal ORDER BY id) - 1",
+}
+
+def iter_table_chunks(db_path: str, table: str, user_id: Optional[str] = None,
+                      chunk_rows: int = ct.MEAL_IO_CHUNK_ROWS) -> Iterator[List[tuple]]:
+    """テーブルの行を chunk_rows 件ずつ返す（列は EXPORT_COLUMNS[table] の順、user_id 指定時はそのユーザーだけ）"""
+    columns = EXPORT_COLUMNS[table]
+    sql = f"SELECT {', '.join(_EXPORT_EXPRESSIONS.get(c, c) for c in columns)} FROM {table}"
+    params: Tuple = ()
+    if user_id is not None:
+        sql += " WHERE user_id = ?"
+        params = (user_id,)
+    conn = _connect(db_path)
+    try:
+        cur = conn.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(chunk_rows)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+def import_meal_logs_bulk(db_path: str, chunks: Iterable[Sequence[Sequence]],
+                          chunk_rows: int = ct.MEAL_IO_CHUNK_ROWS) -> Iterator[int]:
+    """
+    食事記録をまとめて追加し、chunk_rows 件ごとのトランザクションで追加した件数を順に返す
+
+    chunks は (user_id, ts, date, meal_type, name, kcal, seq) のリストの列。seq は同じユーザー・日時・区分・
+    料理名・カロリーの記録のうち何件目か（0始まり）で、None の行は chunks の並び順で番号を付ける。
+    同じ内容の記録が既に seq 件より多くあるものは取り込み済みとして追加しない（同じ内容の記録が何件あっても
+    そのまま残り、同じファイルを何度取り込んでも同じ結果になる）。
+    全行をいったんファイル上の一時テーブルに置いて番号付け・取り込み済みの判定を行うため、行数が多くても
+    メモリ使用量は増えない。集計テーブルと記録の版は記録の追加と同じトランザクションで更新する。
+    """
+    conn = _connect(db_path)
+    try:
+        cur = conn.cursor()
+        cur.execute("PRAGMA temp_store = FILE")
+        cur.execute("""
+            CREATE TEMP TABLE meal_logs_import (
+                id INTEGER PRIMARY KEY,
+                user_id TEXT NOT NULL, ts TEXT NOT NULL, date TEXT NOT NULL,
+                meal_type TEXT NOT NULL, name TEXT NOT NULL, kcal REAL NOT NULL, seq INTEGER
+            )
+        """)
+        for rows in chunks:
+            cur.executemany(
+                "INSERT INTO meal_logs_import (user_id, ts, date, meal_type, name, kcal, seq) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.commit()
+
+        with mt.DB_QUERY_SECONDS.time(op="import_meal_logs_bulk_prepare"):
+            cur.execute("""
+                UPDATE meal_logs_import SET seq = numbered.n FROM (
+                    SELECT id, ROW_NUMBER() OVER (PARTITION BY user_id, ts, meal_type, name, kcal ORDER BY id) - 1 AS n
+                    FROM meal_logs_import WHERE seq IS NULL
+                ) AS numbered
+                WHERE meal_logs_import.id = numbered.id
+            """)
+            # 取り込み済みの記録（同じ内容の記録が seq 件より多くあるもの）は追加前にまとめて除く
+            # （チャンクごとに判定すると、先に追加したチャンクの記録で件数が変わるため）
+            cur.execute("""
+                DELETE FROM meal_logs_import WHERE seq < (
+                    SELECT COUNT(*) FROM meal_logs m
+                    WHERE m.user_id = meal_logs_import.user_id AND m.ts = meal_logs_import.ts
+                      AND m.meal_type = meal_logs_import.meal_type AND m.name = meal_logs_import.name
+                      AND m.kcal = meal_logs_import.kcal
+                )
+            """)
+            conn.commit()
+
+        last_id = 0
+        while True:
+            (upper,) = cur.execute(
+                "SELECT MAX(id) FROM (SELECT id FROM meal_logs_import WHERE id > ? ORDER BY id LIMIT ?)",
+                (last_id, chunk_rows)
+            ).fetchone()
+            if upper is None:
+                break
+            with tr.span("db"), mt.DB_QUERY_SECONDS.time(op="import_meal_logs_bulk"):
+                cur.execute("BEGIN IMMEDIATE")
+                cur.execute("""
+                    INSERT INTO meal_logs (user_id, ts, date, meal_type, name, kcal)
+                    SELECT user_id, ts, date, meal_type, name, kcal FROM meal_logs_import WHERE id > ? AND id <= ?
+                """, (last_id, upper))
+                inserted = cur.rowcount
+                _add_imported_to_rollups(cur, last_id, upper)
+                conn.commit()
+            last_id = upper
+            yield inserted
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def _add_imported_to_rollups(cur: sqlite3.Cursor, after_id: int, upper_id: int):
+    # ON CONFLICT を INSERT ... SELECT に付けるときは SELECT に WHERE が必要（SQLiteの構文上の制約）
+    cur.execute("""
+        INSERT INTO meal_daily_rollup (user_id, date, meal_type, kcal, meals)
+        SELECT user_id, date, meal_type, SUM(kcal), COUNT(*)
+        FROM meal_logs_import WHERE id > ? AND id <= ? GROUP BY user_id, date, meal_type
+        ON CONFLICT (user_id, date, meal_type) DO UPDATE SET kcal = kcal + excluded.kcal, meals = meals + excluded.meals
+    """, (after_id, upper_id))
+    cur.execute("""
+        INSERT INTO meal_weekly_rollup (user_id, week_start, kcal, meals)
+        SELECT user_id, date(date, '-6 days', 'weekday 1') AS week_start, SUM(kcal), COUNT(*)
+        FROM meal_logs_import WHERE id > ? AND id <= ? GROUP BY user_id, week_start
+        ON CONFLICT (user_id, week_start) DO UPDATE SET kcal = kcal + excluded.kcal, meals = meals + excluded.meals
+    """, (after_id, upper_id))
+    for (user_id,) in cur.execute(
+        "SELECT DISTINCT user_id FROM meal_logs_import WHERE id > ? AND id <= ?", (after_id, upper_id)
+    ).fetchall():
+        _bump_version(cur, user_id)
+
+# ---- 残りカロリー計算 ----
+def calc_remaining_kcal(target_kcal: int, consumed_today: float) -> float:
+    return max(0.0, target_kcal - consumed_today)
+
+@tr.traced("db")
+def sum_today_kcal(db_path: str, user_id: str = ct.DEFAULT_USER_ID) -> float:
+    logger.debug(f"今日の摂取カロリー合計計算開始 - ユーザー: {user_id}")
+    d = date.today().isoformat()
+    
+    try:
+        with mt.DB_QUERY_SECONDS.time(op="sum_today_kcal"):
+            conn = _connect(db_path)
+            cur = conn.cursor()
+            cur.execute("SELECT SUM(kcal) FROM meal_logs WHERE user_id = ? AND date = ?", (user_id, d))
+            row = cur.fetchone()
+            conn.close()
+        
+        total_kcal = float(row[0]) if row and row[0] else 0.0
+        logger.info(f"今日の摂取カロリー合計: {total_kcal:.1f}kcal")
+        return total_kcal
+        
+    except Exception as e:
+        logger.error(f"カロリー合計計算エラー: {str(e)}")
+        return 0.0
+
+# ---- 食事記録 ----
+@tr.traced("db")
+def insert_meal_log(db_path: str, meal_type: str, name: str, kcal: float, user_id: str = ct.DEFAULT_USER_ID):
+    logger.info(f"食事記録追加 - ユーザー: {user_id}, 種類: {meal_type}, 名前: {name}, カロリー: {kcal:.1f}kcal")
+    
+    try:
+        now = datetime.now().isoformat(timespec="seconds")
+        today = date.today()
+        with mt.DB_QUERY_SECONDS.time(op="insert_meal_log"):
+            conn = _connect(db_path)
+            cur = conn.cursor()
+            cur.execute(
+                "INSERT INTO meal_logs (user_id, ts, date, meal_type, name, kcal) VALUES (?, ?, ?, ?, ?, ?)",
+                (user_id, now, today.isoformat(), meal_type, name, kcal)
+            )
+            _add_to_rollups(cur, user_id, today, meal_type, kcal)
+            conn.commit()
+            conn.close()
+        logger.info("食事記録追加完了")
+        
+    except Exception as e:
+        logger.error(f"食事記録追加エラー: {str(e)}")
+        raise
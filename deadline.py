@@ -0,0 +1,92 @@
+# deadline.py
+import contextvars
+import logging
+import threading
+import time
+from typing import List, Optional
+
+import constants as ct
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineExceeded(Exception):
+    """処理全体の締め切りまでに上流呼び出しを始める時間が残っていないことを示す例外"""
+
+
+class Deadline:
+    """1回のレシピ提案・献立作成にかけられる残り時間"""
+
+    def __init__(self, seconds: float, label: str):
+        self.label = label
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.skipped: List[str] = []  # 時間切れで省略した処理（画面表示用）
+        self._lock = threading.Lock()
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def note_skipped(self, what: str) -> None:
+        with self._lock:
+            if what not in self.skipped:
+                self.skipped.append(what)
+
+
+_current: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar("deadline", default=None)
+
+
+def start(seconds: float, label: str) -> Deadline:
+    """
+    締め切りを設定する（既存の締め切りは置き換える）
+
+    ワーカースレッドへは contextvars.copy_context() で引き継がれる。
+    st.rerun() でスクリプトが途中終了しても残らないよう、スクリプトの先頭で clear() を呼ぶ。
+    """
+    deadline = Deadline(seconds, label)
+    _current.set(deadline)
+    logger.debug(f"締め切り設定 - {label}: {seconds:.1f}秒")
+    return deadline
+
+
+def clear() -> None:
+    _current.set(None)
+
+
+def current() -> Optional[Deadline]:
+    return _current.get()
+
+
+def remaining() -> Optional[float]:
+    """残り時間（秒）。締め切りが設定されていなければ None"""
+    deadline = _current.get()
+    return deadline.remaining() if deadline is not None else None
+
+
+def has_time_for(seconds: float) -> bool:
+    """残り時間が seconds 以上あるか（締め切りなしなら常に True）。省略可能な処理の判定に使う"""
+    left = remaining()
+    return left is None or left >= seconds
+
+
+def note_skipped(what: str) -> None:
+    """時間切れで処理を省略したことを記録する"""
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.note_skipped(what)
+
+
+def check(what: str = "") -> None:
+    """上流呼び出しを始める前の確認（残り時間が DEADLINE_MIN_CALL_SEC 未満なら DeadlineExceeded）"""
+    if not has_time_for(ct.DEADLINE_MIN_CALL_SEC):
+        deadline = _current.get()
+        what = what or "上流呼び出し"
+        deadline.note_skipped(what)
+        raise DeadlineExceeded(f"締め切り超過のため {what} を省略 ({deadline.label})")
+
+
+def timeout_for(default: float, what: str = "") -> float:
+    """既定のタイムアウトを残り時間に収まるように縮める（時間がなければ DeadlineExceeded）"""
+    check(what)
+    left = remaining()
+    return default if left is None else min(default, left)
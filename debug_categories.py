@@ -10,6 +10,29 @@ load_dotenv()
 
 import utils as ut
 import json
+from datetime import datetime
+
+import constants as ct
+from category_snapshot import open_snapshot
+
+# utils の import ではログ設定は行われないため明示的に初期化
+ut.setup_logging()
+
+def inspect_snapshot(snapshot):
+    """カテゴリツリーのスナップショットを確認（mmap で開くだけで、APIへの問い合わせも JSON の解析もしない）"""
+    print("📋 カテゴリツリーのスナップショット確認")
+    print("=" * 60)
+    print(f"📁 ファイル: {ct.CATEGORY_SNAPSHOT_PATH}")
+    print(f"🕒 取得時刻: {datetime.fromtimestamp(snapshot.loaded_at):%Y-%m-%d %H:%M:%S}")
+    print(f"📊 カテゴリ数: {len(snapshot)}件 {snapshot.level_counts()}")
+    
+    print("\n📝 カテゴリ一覧（最初の20件）:")
+    for i in range(min(20, len(snapshot))):
+        category = snapshot.category(i)
+        print(f"   {i+1:3d}. ID: {category.category_id:>6} | 親ID: {category.parent_id or '-':>6} | "
+              f"階層ID: {category.hierarchical_id:>14} | 名前: {category.name}")
+    if len(snapshot) > 20:
+        print(f"   ... 他 {len(snapshot)-20} 件")
 
 def inspect_categories():
     """カテゴリAPIの実際のレスポンス構造を確認"""
@@ -79,4 +102,10 @@ def inspect_categories():
         traceback.print_exc()
 
 if __name__ == "__main__":
-    inspect_categories()
\ No newline at end of file
+    # --api を付けるとスナップショットがあってもAPIのレスポンスを確認する
+    snapshot = None if "--api" in sys.argv[1:] else open_snapshot(ct.CATEGORY_SNAPSHOT_PATH)
+    if snapshot is not None:
+        with snapshot:
+            inspect_snapshot(snapshot)
+    else:
+        inspect_categories()
\ No newline at end of file
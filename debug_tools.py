@@ -0,0 +1,284 @@
+# debug_tools.py
+import logging
+from typing import List, Dict, Any
+
+from log_config import set_debug_mode
+from rakuten_api import (
+    fetch_rakuten_categories, get_category_tree,
+    search_category_by_keyword, fetch_top_recipes_by_genre
+)
+
+logger = logging.getLogger('NutriBuddy')
+
+def run_debug_tests(app_id: str):
+    """
+    開発用：楽天レシピAPIのテスト実行
+    カテゴリ一覧とサンプルレシピの取得を行ってJSONデータを表示
+    """
+    logger.info("=== 開発用テスト実行開始 ===")
+    
+    # デバッグモード有効化
+    set_debug_mode(True)
+    
+    try:
+        # 1. カテゴリ一覧の取得と表示
+        logger.info("--- 1. カテゴリ一覧テスト ---")
+        debug_fetch_and_display_categories(app_id)
+        
+        # 2. 動的カテゴリ検索テスト（楽天APIの実際のカテゴリ名を使用）
+        logger.info("--- 2. 動的カテゴリ検索テスト（実際のカテゴリ名） ---")
+        
+        # 楽天APIの実際のカテゴリ名でテスト
+        api_based_keywords = [
+            ("鶏肉", "和風"),      # 楽天APIには「鶏肉」カテゴリが存在
+            ("パスタ", "洋風"),    # 楽天APIには「パスタ」カテゴリが存在
+            ("牛肉", None),       # 楽天APIには「牛肉」カテゴリが存在
+            ("豚肉", "和風"),     # 楽天APIには「豚肉」カテゴリが存在
+            ("サラダ", "洋風"),   # 楽天APIには「サラダ」カテゴリが存在
+            ("カレー", None),     # 楽天APIには「カレー」カテゴリが存在
+            ("ラーメン", "中華"), # 楽天APIには「ラーメン」カテゴリが存在
+            ("炒め物", "中華"),   # 楽天APIには「炒め物」関連カテゴリが存在
+            ("スープ", None),     # 楽天APIには「スープ」カテゴリが存在
+            ("デザート", None)    # 楽天APIには「デザート」カテゴリが存在
+        ]
+        
+        for keyword, genre_hint in api_based_keywords:
+            logger.info(f"=== キーワード検索: '{keyword}' (ジャンル: {genre_hint}) ===")
+            category_ids = search_category_by_keyword(app_id, keyword, genre_hint)
+            logger.info(f"検索結果: {category_ids}")
+            
+            # 検索結果が空でない場合、最初のカテゴリの詳細を表示
+            if category_ids:
+                # カテゴリ詳細を共有ツリーから引いて表示（キーワードごとに取得し直さない）
+                tree = get_category_tree(app_id)
+                found_category = tree.find(category_ids[0]) if tree is not None else None
+                if found_category:
+                    logger.info(f"  -> マッチしたカテゴリ: {found_category.name} (ID: {found_category.category_id})")
+            else:
+                logger.warning(f"  -> マッチするカテゴリが見つかりませんでした")
+            
+            logger.info("")  # 空行
+        
+        # 3. 楽天APIカテゴリ一覧の確認
+        logger.info("--- 3. 楽天APIカテゴリ一覧の構造確認 ---")
+        tree = get_category_tree(app_id)
+        if tree is not None:
+            logger.info("カテゴリデータ取得成功")
+            
+            for level_name, categories in tree.by_level.items():
+                if level_name == "unknown":
+                    logger.info(f"旧形式（リスト）: {len(categories)}件のカテゴリ")
+                    continue
+                logger.info(f"{level_name.upper()}カテゴリ: {len(categories)}件")
+                
+                # サンプルとして最初の5件を表示
+                for i, category in enumerate(categories[:5]):
+                    logger.info(f"  例{i+1}: {category.name} (ID: {category.category_id}, 階層ID: {category.hierarchical_id})")
+                logger.info("")
+        else:
+            logger.error("カテゴリデータの取得に失敗しました")
+        
+        # 4. サンプルレシピの取得と表示（改良版）
+        logger.info("--- 4. 改良版レシピ取得テスト ---")
+        test_cases = [
+            ("和風", "鶏肉"),
+            ("洋風", "パスタ"),
+            ("中華", None)
+        ]
+        
+        for genre, keyword in test_cases:
+            logger.info(f"=== {genre} レシピテスト (キーワード: {keyword}) ===")
+            recipes = fetch_top_recipes_by_genre(genre, app_id, keyword)
+            
+            if recipes:
+                logger.info(f"{genre} レシピ取得成功: {len(recipes)}件")
+                # 最初のレシピの詳細表示
+                if recipes:
+                    first_recipe = recipes[0]
+                    logger.info(f"サンプルレシピ: {first_recipe.name}")
+                    logger.info(f"使用カテゴリID: {first_recipe.category_id}")
+                    debug_display_json_data([first_recipe.to_dict()], f"{genre} サンプルレシピ")
+            else:
+                logger.warning(f"{genre} レシピの取得に失敗")
+            
+            logger.info(f"=== {genre} レシピテスト終了 ===")
+            
+    except Exception as e:
+        logger.error(f"開発テストエラー: {str(e)}")
+    finally:
+        # デバッグモード無効化（通常動作に戻す）
+        set_debug_mode(False)
+        logger.info("=== 開発用テスト実行終了 ===")
+
+# ---- 開発用：JSONデータ表示機能 ----
+def debug_display_json_data(data: Dict[str, Any], title: str = "JSON Data", max_depth: int = 3) -> None:
+    """
+    開発用：JSONデータの構造と内容を見やすく表示
+    
+    Args:
+        data: 表示するJSONデータ
+        title: 表示タイトル
+        max_depth: 表示する最大深度
+    """
+    import json
+    
+    logger.info(f"=== {title} デバッグ表示開始 ===")
+    
+    try:
+        # データサイズ情報
+        json_str = json.dumps(data, ensure_ascii=False, indent=2)
+        data_size = len(json_str)
+        logger.info(f"データサイズ: {data_size:,} bytes")
+        
+        # 基本構造情報
+        if isinstance(data, dict):
+            logger.info(f"トップレベルキー数: {len(data)}")
+            logger.info(f"トップレベルキー: {list(data.keys())}")
+        elif isinstance(data, list):
+            logger.info(f"配列要素数: {len(data)}")
+            if data:
+                logger.info(f"最初の要素タイプ: {type(data[0])}")
+        
+        # JSON整形表示（サイズ制限あり）
+        if data_size < 50000:  # 50KB未満の場合のみ全体表示
+            # 1行ごとではなく1レコードにまとめて出力（ログキューへの投入回数を抑える）
+            lines = json_str.split('\n')
+            body = '\n'.join(lines[:200])  # 最大200行まで
+            if len(lines) > 200:
+                body += f"\n... 他 {len(lines)-200} 行"
+            logger.info(f"=== JSON全体構造 ===\n{body}")
+        else:
+            logger.info("データが大きいため、構造サマリーのみ表示")
+            
+        # カテゴリデータの場合の特別処理
+        if isinstance(data, dict) and 'result' in data:
+            _debug_display_category_data(data)
+        elif isinstance(data, list) and data and ('recipe_id' in str(data[0]) or 'recipeId' in str(data[0])):
+            _debug_display_recipe_data(data)
+            
+    except Exception as e:
+        logger.error(f"JSONデバッグ表示エラー: {str(e)}")
+    
+    logger.info(f"=== {title} デバッグ表示終了 ===")
+
+def _debug_display_category_data(data: Dict[str, Any]) -> None:
+    """カテゴリデータの詳細表示"""
+    logger.info("=== カテゴリデータ詳細 ===")
+    
+    if 'result' in data:
+        result = data['result']
+        
+        # カテゴリ構造の確認
+        if isinstance(result, dict):
+            logger.info(f"カテゴリ構造: {list(result.keys())}")
+            
+            # 各カテゴリレベルの表示
+            for level_name in ['large', 'medium', 'small']:
+                if level_name in result:
+                    categories = result[level_name]
+                    logger.info(f"--- {level_name.upper()}カテゴリ ---")
+                    logger.info(f"カテゴリ数: {len(categories)}")
+                    
+                    # 最初の10件を表示
+                    display_count = min(10, len(categories))
+                    for i in range(display_count):
+                        category = categories[i]
+                        cat_id = category.get('categoryId', 'N/A')
+                        cat_name = category.get('categoryName', 'N/A')
+                        logger.info(f"  {i+1:2d}. ID:{cat_id:>6} | 名前:{cat_name}")
+                    
+                    if len(categories) > 10:
+                        logger.info(f"  ... 他 {len(categories)-10} 件")
+                    logger.info("")
+        elif isinstance(result, list):
+            # 旧形式（リスト）の場合
+            logger.info(f"カテゴリ総数: {len(result)}")
+            display_count = min(20, len(result))
+            for i in range(display_count):
+                category = result[i]
+                cat_id = category.get('categoryId', 'N/A')
+                cat_name = category.get('categoryName', 'N/A')
+                parent_id = category.get('parentCategoryId', 'N/A')
+                logger.info(f"  {i+1:2d}. ID:{cat_id:>3} | 親ID:{parent_id:>3} | 名前:{cat_name}")
+            
+            if len(result) > 20:
+                logger.info(f"  ... 他 {len(result)-20} 件")
+
+def _debug_display_recipe_data(data: List[Dict[str, Any]]) -> None:
+    """レシピデータの詳細表示"""
+    logger.info("=== レシピデータ詳細 ===")
+    logger.info(f"レシピ総数: {len(data)}")
+    
+    display_count = min(10, len(data))  # 最初の10件のみ
+    for i in range(display_count):
+        recipe = data[i]
+        # Recipe.to_dict() の辞書と楽天APIの result の1件のどちらも表示できるようにする
+        recipe_id = recipe.get('recipe_id', recipe.get('recipeId', 'N/A'))
+        recipe_name = recipe.get('name', recipe.get('recipeTitle', 'N/A'))
+        cost = recipe.get('cost', recipe.get('recipeCost', 'N/A'))
+        time = recipe.get('indication', recipe.get('recipeIndication', 'N/A'))
+        materials_count = len(recipe.get('materials', recipe.get('recipeMaterial', [])))
+        
+        logger.info(f"  {i+1:2d}. ID:{recipe_id} | {recipe_name[:30]}{'...' if len(recipe_name) > 30 else ''}")
+        logger.info(f"      コスト:{cost} | 時間:{time} | 材料数:{materials_count}")
+    
+    if len(data) > 10:
+        logger.info(f"  ... 他 {len(data)-10} 件")
+
+def debug_fetch_and_display_categories(app_id: str) -> None:
+    """
+    開発用：楽天レシピカテゴリを取得して詳細表示
+    """
+    logger.info("=== 開発用カテゴリ取得＆表示開始 ===")
+    
+    try:
+        # カテゴリデータ取得
+        categories_data = fetch_rakuten_categories(app_id)
+        
+        if not categories_data:
+            logger.warning("カテゴリデータの取得に失敗しました")
+            return
+        
+        # 詳細表示
+        debug_display_json_data(categories_data, "楽天レシピカテゴリ一覧")
+        
+        # 使用可能なカテゴリIDのリスト表示
+        if 'result' in categories_data:
+            result = categories_data['result']
+            logger.info("=== 使用可能カテゴリID参考リスト ===")
+            
+            if isinstance(result, dict):
+                # 新形式：large/medium/small構造
+                for level_name in ['large', 'medium', 'small']:
+                    if level_name in result:
+                        categories = result[level_name]
+                        logger.info(f"--- {level_name.upper()}カテゴリ ---")
+                        
+                        display_count = min(10, len(categories))
+                        for i in range(display_count):
+                            category = categories[i]
+                            cat_id = category.get('categoryId')
+                            cat_name = category.get('categoryName')
+                            if cat_id and cat_name:
+                                logger.info(f"  '{cat_name}': '{cat_id}',")
+                        
+                        if len(categories) > 10:
+                            logger.info(f"  ... 他 {len(categories)-10} 件")
+                        logger.info("")
+            elif isinstance(result, list):
+                # 旧形式：フラットなリスト
+                display_count = min(30, len(result))
+                for i in range(display_count):
+                    category = result[i]
+                    cat_id = category.get('categoryId')
+                    cat_name = category.get('categoryName')
+                    if cat_id and cat_name:
+                        logger.info(f"  '{cat_name}': '{cat_id}',")
+                
+                if len(result) > 30:
+                    logger.info(f"  ... 他 {len(result)-30} 件")
+                    
+    except Exception as e:
+        logger.error(f"開発用カテゴリ表示エラー: {str(e)}")
+    
+    logger.info("=== 開発用カテゴリ取得＆表示終了 ===")
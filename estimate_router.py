@@ -0,0 +1,80 @@
+# estimate_router.py
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import constants as ct
+import metrics as mt
+from food_table import estimate_recipe_kcal_pfc_local
+from models import NutritionEstimate
+from recipes import match_recipe_type
+
+logger = logging.getLogger('NutriBuddy')
+
+
+def score_confidence(recipe_name: str, ingredients: List[str],
+                     local: Optional[NutritionEstimate]) -> float:
+    """
+    食品成分表による推定をそのまま使えるかの信頼度（0〜1）
+
+    照合できた材料の割合（coverage）と、料理の種類（主食・副菜・汁物）に対して
+    カロリーが妥当な範囲にあるかを ROUTER_COVERAGE_WEIGHT で重み付けして合わせる。
+    料理の種類が分からない場合は 1人前として妥当な範囲（ESTIMATE_KCAL_RANGE）で半分だけ加点する。
+    """
+    if local is None:
+        return 0.0
+    dish_type = match_recipe_type(recipe_name, ingredients)
+    if dish_type is not None:
+        low, high = ct.ROUTER_DISH_KCAL_RANGE[dish_type]
+        plausibility = 1.0 if low <= local.kcal <= high else 0.0
+    else:
+        low, high = ct.ESTIMATE_KCAL_RANGE
+        plausibility = 0.5 if low <= local.kcal <= high else 0.0
+    weight = ct.ROUTER_COVERAGE_WEIGHT
+    return round(weight * (local.coverage or 0.0) + (1.0 - weight) * plausibility, 4)
+
+
+def route_local(recipe_name: str, ingredients: List[str],
+                threshold: float) -> Tuple[Optional[NutritionEstimate], float]:
+    """
+    食品成分表で推定し、信頼度が threshold 以上ならその結果を返す（未満なら None、LLMで推定する）
+
+    Returns:
+        (食品成分表の推定（route "local"）または None, 信頼度)
+    """
+    local = estimate_recipe_kcal_pfc_local(recipe_name, ingredients)
+    confidence = score_confidence(recipe_name, ingredients, local)
+    if local is not None and confidence >= threshold:
+        _record("local")
+        logger.debug(f"推定の振り分け: 食品成分表 - レシピ: {recipe_name}, 信頼度: {confidence:.2f}")
+        return local.with_route("local", confidence), confidence
+    _record("llm")
+    logger.debug(f"推定の振り分け: LLM - レシピ: {recipe_name}, 信頼度: {confidence:.2f} (しきい値 {threshold:.2f})")
+    return None, confidence
+
+
+_counts: Dict[str, int] = {"local": 0, "llm": 0}
+_counts_lock = threading.Lock()
+
+
+def _record(route: str) -> None:
+    mt.ESTIMATE_ROUTES.inc(route=route)
+    with _counts_lock:
+        _counts[route] += 1
+
+
+def get_router_stats() -> Dict[str, float]:
+    """
+    振り分けの件数とLLM呼び出しの削減率（開発者モード表示用）
+
+    llm_call_reduction は、振り分けがなければLLMに送っていた件数のうち食品成分表で済ませた割合。
+    """
+    with _counts_lock:
+        local, llm = _counts["local"], _counts["llm"]
+    routed = local + llm
+    return {
+        "routed": routed,
+        "local": local,
+        "llm": llm,
+        "llm_call_reduction": local / routed if routed else 0.0,
+    }
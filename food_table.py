@@ -0,0 +1,118 @@
+# food_table.py
+import csv
+import logging
+import os
+import threading
+from typing import List, Optional
+
+import constants as ct
+import tracing as tr
+from ingredients import canonicalize_ingredients
+from lazy import lazy_import
+from models import NutritionEstimate
+
+np = lazy_import("numpy")
+
+logger = logging.getLogger('NutriBuddy')
+
+# 成分配列の列順
+NUTRIENT_COLUMNS = ("kcal", "protein_g", "fat_g", "carb_g")
+
+
+class FoodTable:
+    """
+    食品成分表（data/food_composition.csv）を NumPy 配列で保持するクラス
+
+    - comp: 1gあたりの [kcal, P, F, C]（shape: 食品数 x 4, float32）
+    - serving_g: 1人前の想定使用量(g)（shape: 食品数）
+    行は材料辞書（ingredients.py）の canonical ID で引き、推定は行番号の配列に対する
+    ベクトル演算で行う。
+    """
+
+    def __init__(self, ids: List[str], names: List[str], comp, serving_g):
+        self.ids = ids
+        self.names = names
+        self.comp = comp
+        self.serving_g = serving_g
+        self._index = {food_id: i for i, food_id in enumerate(ids)}
+
+    @classmethod
+    def load(cls, path: str) -> "FoodTable":
+        ids, names, rows, servings = [], [], [], []
+        with open(path, encoding="utf-8") as f:
+            reader = csv.DictReader(line for line in f if not line.startswith("#"))
+            for row in reader:
+                ids.append(row["id"])
+                names.append(row["name"])
+                rows.append([float(row[c]) for c in NUTRIENT_COLUMNS])
+                servings.append(float(row["serving_g"]))
+        comp = np.asarray(rows, dtype=np.float32) / 100.0
+        serving_g = np.asarray(servings, dtype=np.float32)
+        logger.info(f"食品成分表読み込み完了 - {len(ids)}品目")
+        return cls(ids, names, comp, serving_g)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def index_of(self, food_id: str) -> Optional[int]:
+        """canonical ID に対応する行番号（成分表になければ None）"""
+        return self._index.get(food_id)
+
+    def totals(self, rows: List[int], servings: float = 1.0):
+        """行番号の配列から [kcal, P, F, C] の合計を計算"""
+        idx = np.asarray(rows, dtype=np.intp)
+        grams = self.serving_g[idx] * servings
+        return grams @ self.comp[idx]
+
+
+_table: Optional[FoodTable] = None
+_table_lock = threading.Lock()
+
+
+def get_food_table() -> FoodTable:
+    """食品成分表を取得（初回のみ読み込み、プロセス内で共有）"""
+    global _table
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                path = os.path.join(os.path.dirname(os.path.abspath(__file__)), ct.FOOD_COMPOSITION_PATH)
+                _table = FoodTable.load(path)
+    return _table
+
+
+@tr.traced("estimation_local")
+def estimate_recipe_kcal_pfc_local(recipe_name: str, ingredients: List[str]) -> Optional[NutritionEstimate]:
+    """
+    食品成分表からレシピ1人前のカロリー/PFCを推定（LLMを使わない決定的な推定）
+
+    Args:
+        recipe_name: レシピ名（ログ用）
+        ingredients: 材料名のリスト（楽天レシピの recipeMaterial、または canonical ID）
+
+    Returns:
+        NutritionEstimate（source "local"、coverage は照合できた材料の割合）
+        材料が1つも照合できなかった場合は None
+    """
+    table = get_food_table()
+    food_ids = canonicalize_ingredients(ingredients)
+    rows = [i for i in map(table.index_of, food_ids) if i is not None]
+
+    if not rows:
+        logger.debug(f"ローカル推定不可（照合できる材料なし） - レシピ: {recipe_name}")
+        return None
+
+    kcal, p, f, c = (float(v) for v in table.totals(rows))
+    coverage = len(rows) / len(food_ids)
+    logger.debug(
+        f"ローカル推定 - レシピ: {recipe_name}, カロリー: {kcal:.1f}kcal, "
+        f"P: {p:.1f}g, F: {f:.1f}g, C: {c:.1f}g, 照合率: {coverage:.0%}"
+    )
+    return NutritionEstimate(
+        kcal=kcal,
+        protein_g=p,
+        fat_g=f,
+        carb_g=c,
+        source="local",
+        status="ok",
+        coverage=coverage,
+    )
@@ -0,0 +1,137 @@
+# gazetteer.py
+import csv
+import logging
+import math
+import os
+import re
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import constants as ct
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+
+logger = logging.getLogger('NutriBuddy')
+
+EARTH_RADIUS_KM = 6371.0
+
+_LATLON_PATTERN = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$")
+
+
+class Location(NamedTuple):
+    key: str          # "都道府県 市区町村"（画面の選択肢・プロファイルの city）
+    prefecture: str
+    name: str
+    lat: float
+    lon: float
+
+
+def _unit_vectors(lat, lon):
+    # 緯度経度を単位球面上の3次元座標にする（ユークリッド距離が大円距離と単調に対応する）
+    lat_r, lon_r = np.radians(lat), np.radians(lon)
+    return np.column_stack([np.cos(lat_r) * np.cos(lon_r), np.cos(lat_r) * np.sin(lon_r), np.sin(lat_r)])
+
+
+class Gazetteer:
+    """
+    市区町村の代表地点（data/municipalities.csv）
+
+    名前（「都道府県 市区町村」・市区町村名・英語表記）からの検索は辞書で、
+    緯度経度から最寄りの市区町村の検索は KD-tree（scipy.spatial.cKDTree）で行う。
+    """
+
+    def __init__(self, locations: List[Location], aliases: Dict[str, Location]):
+        self.locations = locations
+        self._aliases = aliases
+        self._tree = None
+        self._tree_lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str) -> "Gazetteer":
+        locations: List[Location] = []
+        aliases: Dict[str, Location] = {}
+        with open(path, encoding="utf-8") as f:
+            reader = csv.DictReader(line for line in f if not line.startswith("#"))
+            for row in reader:
+                loc = Location(f"{row['prefecture']} {row['name']}", row["prefecture"], row["name"],
+                               float(row["lat"]), float(row["lon"]))
+                locations.append(loc)
+                # 同じ名前の市区町村が複数ある場合は先に出てきたものを使う（「都道府県 市区町村」なら一意）
+                for alias in (loc.key, row["prefecture"] + row["name"], row["name"], row.get("name_en") or ""):
+                    if alias:
+                        aliases.setdefault(alias.casefold(), loc)
+        logger.info(f"市区町村データ読み込み完了 - {len(locations)}件")
+        return cls(locations, aliases)
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+    def keys(self) -> List[str]:
+        return [loc.key for loc in self.locations]
+
+    def lookup(self, name: str) -> Optional[Location]:
+        """名前から市区町村を引く（見つからなければ None）"""
+        return self._aliases.get(name.strip().casefold())
+
+    def _get_tree(self):
+        if self._tree is None:
+            with self._tree_lock:
+                if self._tree is None:
+                    from scipy.spatial import cKDTree
+                    lat = np.array([loc.lat for loc in self.locations])
+                    lon = np.array([loc.lon for loc in self.locations])
+                    self._tree = cKDTree(_unit_vectors(lat, lon))
+        return self._tree
+
+    def nearest(self, lat: float, lon: float) -> Tuple[Location, float]:
+        """緯度経度に最も近い市区町村と距離（km）"""
+        chord, i = self._get_tree().query(_unit_vectors(np.array([lat]), np.array([lon]))[0])
+        distance_km = 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+        return self.locations[int(i)], distance_km
+
+
+_gazetteer: Optional[Gazetteer] = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer() -> Gazetteer:
+    """市区町村データを取得（初回のみ読み込み、プロセス内で共有）"""
+    global _gazetteer
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                path = os.path.join(os.path.dirname(os.path.abspath(__file__)), ct.MUNICIPALITIES_PATH)
+                _gazetteer = Gazetteer.load(path)
+    return _gazetteer
+
+
+def resolve_location(query: str) -> Location:
+    """
+    地域の指定を緯度経度に解決する（解決できなければ ValueError）
+
+    「都道府県 市区町村」・市区町村名・英語表記（"Tokyo" など）のほか "緯度,経度" も受け付ける。
+    緯度経度の場合は最寄りの市区町村を名前に使い、座標は指定どおりとする。
+    """
+    gazetteer = get_gazetteer()
+    loc = gazetteer.lookup(query or "")
+    if loc is not None:
+        return loc
+    match = _LATLON_PATTERN.match(query or "")
+    if match:
+        lat, lon = float(match.group(1)), float(match.group(2))
+        nearest, distance_km = gazetteer.nearest(lat, lon)
+        if distance_km > ct.GAZETTEER_MAX_DISTANCE_KM:
+            raise ValueError(f"対象地域外の座標です: {query}（最寄りの {nearest.key} まで {distance_km:.0f}km）")
+        return Location(nearest.key, nearest.prefecture, nearest.name, lat, lon)
+    raise ValueError(f"地域が見つかりません: {query}")
+
+
+def location_options() -> List[str]:
+    """画面で選べる地域（「都道府県 市区町村」、データの順）"""
+    return get_gazetteer().keys()
+
+
+def grid_cell(lat: float, lon: float, deg: float = ct.WEATHER_GRID_DEG) -> Tuple[float, float]:
+    """緯度経度を最寄りの格子点に丸める（同じ格子点のユーザーは同じ予報を共有する）"""
+    return (round(round(lat / deg) * deg, 4), round(round(lon / deg) * deg, 4))
@@ -0,0 +1,173 @@
+# hedge.py
+import concurrent.futures
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+import constants as ct
+import deadline as dl
+import metrics as mt
+import resilience as rs
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyTracker:
+    """直近の所要時間からパーセンタイルを求める（ヘッジを出すタイミングの判定用）"""
+
+    def __init__(self, size: int):
+        self._samples: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """q パーセンタイル（サンプル数が HEDGE_MIN_SAMPLES 未満なら None）"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < ct.HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * q / 100.0))]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._samples)
+
+
+class Hedger:
+    """
+    用途（estimate / cheer）ごとのヘッジ実行
+
+    主リクエストが直近の p90 を超えても終わらなければ、2本目（同一リクエストまたは
+    ローカル推定）を開始し、先に成功した方の結果を使う。2本目を出せる回数は
+    リトライ予算と同じ仕組み（直近のリクエスト数に対する比率）で制限する。
+    """
+
+    def __init__(self, purpose: str):
+        self.purpose = purpose
+        self.latency = LatencyTracker(ct.HEDGE_LATENCY_WINDOW)
+        self.budget = rs.RetryBudget(ct.HEDGE_BUDGET_RATIO, ct.HEDGE_BUDGET_MIN, ct.HEDGE_BUDGET_WINDOW_SEC)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.fired = 0
+        self.hedge_wins = 0
+
+    def trigger_delay(self) -> float:
+        """2本目を出すまでの待ち時間（直近の p90、サンプル不足時は既定値）"""
+        p90 = self.latency.percentile(ct.HEDGE_PERCENTILE)
+        if p90 is None:
+            return ct.HEDGE_INITIAL_DELAY_SEC
+        return max(ct.HEDGE_MIN_DELAY_SEC, p90)
+
+    def _timed(self, fn: Callable[[], Any]) -> Callable[[], Any]:
+        def run():
+            start = time.perf_counter()
+            result = fn()
+            # 負けた側も含めて主リクエストの所要時間を記録する（速い結果だけに偏らないように）
+            self.latency.record(time.perf_counter() - start)
+            return result
+        return run
+
+    def run(self, primary: Callable[[], Any], hedge: Callable[[], Any],
+            accept: Callable[[Any], bool]) -> Any:
+        """
+        primary を実行し、遅ければ hedge を並行して開始して先に受理できた結果を返す
+
+        例外や accept が False の結果（フォールバック値、ローカル推定で材料を照合できない場合の
+        None など）は採用せず、もう一方の完了を待つ。どちらも採用できなければ primary の
+        結果（または例外）を返す。負けた側の呼び出しは中断できないため、裏で完了させて捨てる。
+        """
+        self.budget.record_request()
+        with self._lock:
+            self.calls += 1
+        first = _submit(self._timed(primary))
+        done, _ = concurrent.futures.wait([first], timeout=self.trigger_delay())
+        if done:
+            return first.result()
+
+        if not dl.has_time_for(ct.DEADLINE_MIN_CALL_SEC):
+            return first.result()
+        if not self.budget.try_spend():
+            mt.HEDGE_REQUESTS.inc(purpose=self.purpose, result="budget_exhausted")
+            return first.result()
+
+        logger.debug(f"[{self.purpose}] 応答が遅いため2本目のリクエストを開始")
+        mt.HEDGE_REQUESTS.inc(purpose=self.purpose, result="fired")
+        with self._lock:
+            self.fired += 1
+        second = _submit(hedge)
+
+        pending = {first, second}
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None or not accept(future.result()):
+                    continue
+                if future is second:
+                    mt.HEDGE_REQUESTS.inc(purpose=self.purpose, result="hedge_won")
+                    with self._lock:
+                        self.hedge_wins += 1
+                else:
+                    mt.HEDGE_REQUESTS.inc(purpose=self.purpose, result="primary_won")
+                return future.result()
+        # どちらも成功しなかった
+        return first.result()
+
+    def stats(self) -> Dict[str, Any]:
+        p90 = self.latency.percentile(ct.HEDGE_PERCENTILE)
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "fired": self.fired,
+                "hedge_wins": self.hedge_wins,
+                "p90_ms": round(p90 * 1000.0, 1) if p90 is not None else None,
+                "samples": len(self.latency),
+            }
+
+
+_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+_hedgers: Dict[str, Hedger] = {}
+_lock = threading.Lock()
+
+
+def _submit(fn: Callable[[], Any]) -> concurrent.futures.Future:
+    """共有スレッドプールで実行（計測・締め切りのコンテキストを引き継ぐ）"""
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=ct.HEDGE_MAX_WORKERS, thread_name_prefix="hedge"
+            )
+    return _executor.submit(contextvars.copy_context().run, fn)
+
+
+def get_hedger(purpose: str) -> Hedger:
+    with _lock:
+        hedger = _hedgers.get(purpose)
+        if hedger is None:
+            hedger = Hedger(purpose)
+            _hedgers[purpose] = hedger
+        return hedger
+
+
+def run(purpose: str, primary: Callable[[], Any], hedge: Optional[Callable[[], Any]] = None,
+        accept: Callable[[Any], bool] = lambda result: result is not None) -> Any:
+    """
+    ヘッジ付きで primary を実行する（hedge 省略時は primary と同じ処理を2本目にする）
+
+    ヘッジの有効・無効（HEDGE_MODE）は呼び出し側で判断し、無効なら primary を直接呼ぶ。
+    single-flight の内側（リーダーの処理）で使い、集約された呼び出しごとにヘッジしないようにする。
+    """
+    return get_hedger(purpose).run(primary, hedge or primary, accept)
+
+
+def get_stats() -> Dict[str, Dict[str, Any]]:
+    """用途ごとのヘッジ統計（開発者モード表示用）"""
+    with _lock:
+        hedgers = list(_hedgers.values())
+    return {h.purpose: h.stats() for h in hedgers}
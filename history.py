@@ -0,0 +1,109 @@
+# history.py
+import logging
+from datetime import date, timedelta
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+import constants as ct
+import metrics as mt
+from db import fetch_daily_rollup, fetch_weekly_rollup, meal_log_version
+from lazy import cache_data as lazy_cache_data
+
+logger = logging.getLogger('NutriBuddy')
+
+TOTAL_COLUMN = "合計"
+ROLLING_COLUMN = "移動平均"
+
+
+# ---- 日別の摂取カロリー ----
+def load_daily_history(db_path: str, user_id: str, days: int, today: Optional[date] = None) -> pd.DataFrame:
+    """
+    直近 days 日分の日別摂取カロリー（日付 × 朝/昼/晩/合計/移動平均）
+
+    集計テーブル（meal_daily_rollup）だけを読み、結果は記録の版が変わる（食事を記録する）まで
+    キャッシュする。移動平均は記録のある日だけの平均。
+    """
+    today = today or date.today()
+    version = meal_log_version(db_path, user_id)
+    return _cached_daily_history(db_path, user_id, days, version, today.isoformat())
+
+@mt.count_cache("history")
+@lazy_cache_data(max_entries=ct.HISTORY_CACHE_MAX_ENTRIES)
+def _cached_daily_history(db_path: str, user_id: str, days: int, version: int, today: str) -> pd.DataFrame:
+    mt.CACHE_MISSES.inc(cache="history")
+    logger.debug(f"日別履歴の集計 - ユーザー: {user_id}, {days}日, 版: {version}")
+    # 期間の先頭でも移動平均の窓が埋まるよう、その分だけ前から読む
+    lookback = ct.HISTORY_ROLLING_DAYS - 1
+    n = days + lookback
+    start = date.fromisoformat(today) - timedelta(days=n - 1)
+    rows = fetch_daily_rollup(db_path, user_id, start.isoformat())
+
+    kcal = np.zeros((n, len(ct.MEAL_TYPES)), dtype=np.float32)
+    if rows:
+        dates, meal_types, values, _ = zip(*rows)
+        offsets = (np.array(dates, dtype="datetime64[D]") - np.datetime64(start, "D")).astype(np.int64)
+        meal_index = {m: i for i, m in enumerate(ct.MEAL_TYPES)}
+        columns = np.array([meal_index.get(m, -1) for m in meal_types])
+        valid = (columns >= 0) & (offsets < n)
+        np.add.at(kcal, (offsets[valid], columns[valid]), np.array(values, dtype=np.float32)[valid])
+
+    total = kcal.sum(axis=1)
+    index = pd.date_range(start, periods=n, freq="D", name="日付")
+    df = pd.DataFrame(kcal, index=index, columns=ct.MEAL_TYPES)
+    df[TOTAL_COLUMN] = total
+    df[ROLLING_COLUMN] = (
+        pd.Series(np.where(total > 0, total, np.nan), index=index)
+        .rolling(ct.HISTORY_ROLLING_DAYS, min_periods=1).mean()
+    )
+    return df.iloc[lookback:]
+
+load_daily_history.clear = _cached_daily_history.clear
+
+
+# ---- 週別の摂取カロリー ----
+def load_weekly_history(db_path: str, user_id: str, weeks: int, today: Optional[date] = None) -> pd.DataFrame:
+    """直近 weeks 週分（今週を含む、月曜始まり）の週別摂取カロリー（週 × 合計/食事数）"""
+    today = today or date.today()
+    version = meal_log_version(db_path, user_id)
+    return _cached_weekly_history(db_path, user_id, weeks, version, today.isoformat())
+
+@mt.count_cache("history")
+@lazy_cache_data(max_entries=ct.HISTORY_CACHE_MAX_ENTRIES)
+def _cached_weekly_history(db_path: str, user_id: str, weeks: int, version: int, today: str) -> pd.DataFrame:
+    mt.CACHE_MISSES.inc(cache="history")
+    this_week = date.fromisoformat(today)
+    this_week -= timedelta(days=this_week.weekday())
+    start = this_week - timedelta(weeks=weeks - 1)
+    rows = fetch_weekly_rollup(db_path, user_id, start.isoformat())
+
+    kcal = np.zeros(weeks, dtype=np.float32)
+    meal_counts = np.zeros(weeks, dtype=np.int32)
+    if rows:
+        week_starts, values, meals = zip(*rows)
+        offsets = (np.array(week_starts, dtype="datetime64[D]") - np.datetime64(start, "D")).astype(np.int64) // 7
+        valid = offsets < weeks
+        kcal[offsets[valid]] = np.array(values, dtype=np.float32)[valid]
+        meal_counts[offsets[valid]] = np.array(meals, dtype=np.int32)[valid]
+    index = pd.date_range(start, periods=weeks, freq="7D", name="週")
+    return pd.DataFrame({TOTAL_COLUMN: kcal, "食事数": meal_counts}, index=index)
+
+load_weekly_history.clear = _cached_weekly_history.clear
+
+
+# ---- 要約 ----
+def summarize_history(daily: pd.DataFrame, target_kcal: int) -> Dict[str, Any]:
+    """期間内の記録日数・1日平均・目標超過日数・区分ごとの1日平均（記録のある日だけで計算）"""
+    total = daily[TOTAL_COLUMN].to_numpy()
+    logged = total > 0
+    logged_days = int(logged.sum())
+    return {
+        "days": len(daily),
+        "logged_days": logged_days,
+        "avg_kcal": float(total[logged].mean()) if logged_days else 0.0,
+        "over_target_days": int((total > target_kcal).sum()),
+        "avg_by_meal_type": {
+            m: (float(daily[m].to_numpy()[logged].mean()) if logged_days else 0.0) for m in ct.MEAL_TYPES
+        },
+    }
@@ -0,0 +1,218 @@
+# images.py
+import collections
+import concurrent.futures
+import contextvars
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+import constants as ct
+import deadline as dl
+import metrics as mt
+import resilience as rs
+import singleflight as sf
+import tracing as tr
+from lazy import lazy_import
+
+requests = lazy_import("requests")
+
+logger = logging.getLogger('NutriBuddy')
+
+
+# ---- ディスク上のサムネイルキャッシュ ----
+class ThumbnailCache:
+    """
+    サムネイルをファイルで保持するキャッシュ（合計サイズが max_bytes を超えたら最後に使ったのが古い順に削除）
+
+    最後に使った時刻はファイルの mtime に残すため、プロセスを再起動しても順序が引き継がれる。
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # ファイル名 → サイズ（先頭ほど最後に使ったのが古い）
+        self._entries: "collections.OrderedDict[str, int]" = collections.OrderedDict()
+        self._total = 0
+        os.makedirs(directory, exist_ok=True)
+        files = [e for e in os.scandir(directory) if e.is_file() and not e.name.endswith(".tmp")]
+        for entry in sorted(files, key=lambda e: e.stat().st_mtime):
+            size = entry.stat().st_size
+            self._entries[entry.name] = size
+            self._total += size
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def get(self, name: str) -> Optional[bytes]:
+        with self._lock:
+            if name not in self._entries:
+                return None
+            self._entries.move_to_end(name)
+        try:
+            with open(self._path(name), "rb") as f:
+                data = f.read()
+            os.utime(self._path(name))
+            return data
+        except FileNotFoundError:
+            with self._lock:
+                self._total -= self._entries.pop(name, 0)
+            return None
+
+    def put(self, name: str, data: bytes) -> None:
+        # 一時ファイルに書いてから置き換え、読み取り中のプロセスに書きかけのファイルを見せない
+        tmp = self._path(f"{name}.{threading.get_ident()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self._path(name))
+        with self._lock:
+            self._total += len(data) - self._entries.pop(name, 0)
+            self._entries[name] = len(data)
+            evicted = []
+            while self._total > self.max_bytes and len(self._entries) > 1:
+                old_name, size = self._entries.popitem(last=False)
+                self._total -= size
+                evicted.append(old_name)
+        for old_name in evicted:
+            try:
+                os.remove(self._path(old_name))
+            except FileNotFoundError:
+                pass
+        if evicted:
+            logger.debug(f"サムネイルキャッシュから削除: {len(evicted)}件")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"files": len(self._entries), "bytes": self._total, "max_bytes": self.max_bytes}
+
+
+_cache: Optional[ThumbnailCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> ThumbnailCache:
+    """プロセスで共有するサムネイルキャッシュ（IMAGE_CACHE_DIR）"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ThumbnailCache(ct.IMAGE_CACHE_DIR, ct.IMAGE_CACHE_MAX_BYTES)
+        return _cache
+
+
+# ---- サムネイルの作成 ----
+_thumbnail_format: Optional[str] = None
+
+
+def _get_thumbnail_format() -> str:
+    """WebP で保存できれば WebP、できなければ JPEG"""
+    global _thumbnail_format
+    if _thumbnail_format is None:
+        from PIL import features
+        _thumbnail_format = "WEBP" if features.check("webp") else "JPEG"
+    return _thumbnail_format
+
+
+def make_thumbnail(raw: bytes, size: int = ct.IMAGE_THUMBNAIL_SIZE) -> bytes:
+    """元画像を長辺 size px に縮小して WebP（または JPEG）にする"""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(raw)) as img:
+        # JPEG は縮小した解像度で直接デコードする（フルサイズを展開しない）
+        img.draft("RGB", (size, size))
+        if img.mode in ("RGBA", "LA", "P"):
+            # 透過部分は白で埋める（JPEG は透過を持てず、カードの背景も白のため）
+            rgba = img.convert("RGBA")
+            thumb = Image.new("RGB", rgba.size, (255, 255, 255))
+            thumb.paste(rgba, mask=rgba.getchannel("A"))
+        else:
+            thumb = img.convert("RGB")
+    thumb.thumbnail((size, size))
+    out = io.BytesIO()
+    thumb.save(out, format=_get_thumbnail_format(), quality=ct.IMAGE_THUMBNAIL_QUALITY)
+    return out.getvalue()
+
+
+def _cache_name(url: str) -> str:
+    digest = hashlib.sha1(f"{url}|{ct.IMAGE_THUMBNAIL_SIZE}".encode("utf-8")).hexdigest()
+    return f"{digest}.{'webp' if _get_thumbnail_format() == 'WEBP' else 'jpg'}"
+
+
+# ---- 元画像の取得 ----
+def _image_get(url: str) -> bytes:
+    with requests.get(url, timeout=dl.timeout_for(ct.IMAGE_FETCH_TIMEOUT, "画像取得"), stream=True) as r:
+        r.raise_for_status()
+        raw = r.raw.read(ct.IMAGE_MAX_SOURCE_BYTES + 1, decode_content=True)
+    if len(raw) > ct.IMAGE_MAX_SOURCE_BYTES:
+        raise ValueError(f"画像が大きすぎます（{ct.IMAGE_MAX_SOURCE_BYTES} bytes 超）")
+    return raw
+
+
+def _download_thumbnail(url: str, name: str) -> bytes:
+    # リトライ・回路遮断は resilience の共通ポリシー
+    raw = rs.call("rakuten_image", _image_get, url)
+    thumb = make_thumbnail(raw)
+    get_cache().put(name, thumb)
+    logger.debug(f"サムネイル作成: {len(raw)} → {len(thumb)} bytes ({url})")
+    return thumb
+
+
+# 取得できなかった画像（キャッシュ名 → 再取得を試すまでの時刻）
+_failed: Dict[str, float] = {}
+_failed_lock = threading.Lock()
+
+
+@tr.traced("image")
+def fetch_thumbnail(url: str) -> Optional[bytes]:
+    """
+    レシピ画像のサムネイル（WebP/JPEG のバイト列）
+
+    初回だけ元画像を取得して縮小し、以降はディスクのキャッシュから返す。
+    取得できなければ None（しばらくは同じ画像の取得を試さない）。
+    """
+    if not url:
+        return None
+    cache = get_cache()
+    name = _cache_name(url)
+    mt.CACHE_LOOKUPS.inc(cache="image")
+    data = cache.get(name)
+    if data is not None:
+        return data
+    mt.CACHE_MISSES.inc(cache="image")
+    with _failed_lock:
+        if _failed.get(name, 0.0) > time.monotonic():
+            return None
+    try:
+        # 同じ画像の同時取得は1回にまとめる
+        return sf.get_group("rakuten_image").do(name, _download_thumbnail, url, name)
+    except (rs.CircuitOpenError, dl.DeadlineExceeded) as e:
+        logger.info(f"画像取得をスキップ: {str(e)}")
+        return None
+    except Exception as e:
+        logger.warning(f"画像取得エラー: {type(e).__name__}: {str(e)} ({url})")
+        with _failed_lock:
+            _failed[name] = time.monotonic() + ct.IMAGE_FAILURE_TTL_SEC
+        return None
+
+
+_prefetch_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=ct.IMAGE_PREFETCH_WORKERS, thread_name_prefix="image"
+)
+
+
+def prefetch_thumbnails(urls: Iterable[str]) -> None:
+    """カードを表示する前に、まだキャッシュにないサムネイルを並列で用意する"""
+    futures = [
+        # 締め切り（deadline.py）を引き継ぐためコンテキストごと渡す
+        _prefetch_executor.submit(contextvars.copy_context().run, fetch_thumbnail, url)
+        for url in dict.fromkeys(u for u in urls if u)
+    ]
+    concurrent.futures.wait(futures)
+
+
+def get_image_cache_stats() -> Dict[str, int]:
+    """サムネイルキャッシュのファイル数・合計サイズ（開発者モード表示用）"""
+    return get_cache().stats()
@@ -0,0 +1,159 @@
+# ingredients.py
+import csv
+import logging
+import os
+import re
+import sys
+import threading
+import unicodedata
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import constants as ct
+
+logger = logging.getLogger('NutriBuddy')
+
+# カタカナ → ひらがな（ァ〜ヶ）
+_KATA_TO_HIRA = {code: code - 0x60 for code in range(0x30A1, 0x30F7)}
+# 先頭の記号（「★醤油」「・卵」など）
+_LEADING_MARKS = "★☆●○◎◆◇■□▲△▼▽・*※-"
+# 括弧書きの注記（「豚肉（こま切れ）」「卵(M)」など）
+_BRACKETS_RE = re.compile(r"[(\[【〔《<][^)\]】〕》>]*[)\]】〕》>]?")
+# 材料名の後ろに続く分量（「鶏むね肉 1枚」「醤油 大さじ2」など）
+_QUANTITY_RE = re.compile(r"[\s:…]+(?:大さじ|小さじ|少々|適量|適宜|お好みで|ひとつまみ|\d).*$")
+# 区切りなしで続く分量（「玉ねぎ1/2個」「ツナ1缶」など）
+_TRAILING_AMOUNT_RE = re.compile(
+    r"[\d/.~]+(?:g|kg|ml|cc|個|本|枚|切れ|片|かけ|パック|袋|缶|cm|株|束|玉|合|カップ|杯|尾|匹|丁|房|粒|人分)$"
+)
+
+
+def normalize_material(text: str) -> str:
+    """
+    材料文字列の表記ゆれを揃える
+
+    NFKC（全角英数・半角カナの統一）→ 記号・括弧書き・分量の除去 → カタカナのひらがな化
+    例: "★ﾀﾏﾈｷﾞ（中）1/2個" → "たまねぎ"
+    """
+    text = unicodedata.normalize("NFKC", text or "").strip()
+    text = text.lstrip(_LEADING_MARKS).strip()
+    text = _BRACKETS_RE.sub("", text)
+    text = _QUANTITY_RE.sub("", text)
+    text = _TRAILING_AMOUNT_RE.sub("", text)
+    return text.strip().translate(_KATA_TO_HIRA)
+
+
+class IngredientDictionary:
+    """
+    材料名 → canonical ID の辞書（data/ingredients.csv）
+
+    canonical ID は小さな整数コードに intern して保持し、材料文字列ごとの照合結果
+    （正規化を含む）をメモ化する。照合は完全一致を優先し、なければ末尾に一致する最長の表記
+    （材料名は末尾が本体のため「米油」は「油」、「太白ごま油」は「ごま油」）、それもなければ
+    途中に含まれる INGREDIENT_CONTAINS_MIN_CHARS 文字以上の最長の表記を採用する
+    （短い表記は別の食品の一部になりやすいため、「パンプキン」を「パン」とはしない）。
+    """
+
+    def __init__(self, ids: List[str], names: List[str], aliases: Dict[str, int]):
+        self.ids = [sys.intern(i) for i in ids]
+        self.names = names
+        self._aliases = aliases
+        self._by_length = sorted(aliases.items(), key=lambda kv: len(kv[0]), reverse=True)
+        self._codes = {food_id: code for code, food_id in enumerate(self.ids)}
+        self.code_of = lru_cache(maxsize=8192)(self._code_of_uncached)
+
+    @classmethod
+    def load(cls, path: str) -> "IngredientDictionary":
+        ids, names = [], []
+        aliases: Dict[str, int] = {}
+        with open(path, encoding="utf-8") as f:
+            reader = csv.DictReader(line for line in f if not line.startswith("#"))
+            for code, row in enumerate(reader):
+                ids.append(row["id"])
+                names.append(row["name"])
+                for word in [row["name"], *filter(None, row["aliases"].split("|"))]:
+                    aliases.setdefault(normalize_material(word), code)
+        logger.info(f"材料辞書読み込み完了 - {len(ids)}品目, 表記{len(aliases)}件")
+        return cls(ids, names, aliases)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _code_of_uncached(self, material: str) -> Optional[int]:
+        """材料文字列の intern 済みコード（照合できなければ None）"""
+        text = normalize_material(material)
+        if not text:
+            return None
+        # canonical ID はそのまま引く（キャッシュキーから材料リストへ戻すとき）
+        code = self._codes.get(text)
+        if code is not None:
+            return code
+        code = self._aliases.get(text)
+        if code is not None:
+            return code
+        for word, code in self._by_length:
+            if text.endswith(word):
+                return code
+        for word, code in self._by_length:
+            if len(word) < ct.INGREDIENT_CONTAINS_MIN_CHARS:
+                break
+            if word in text:
+                return code
+        return None
+
+    def canonical_id(self, material: str) -> Optional[str]:
+        code = self.code_of(material)
+        return self.ids[code] if code is not None else None
+
+    def display_name(self, material: str) -> str:
+        """プロンプト表示用の代表名（照合できなければ正規化前の文字列）"""
+        code = self.code_of(material)
+        return self.names[code] if code is not None else material.strip()
+
+    def id_to_code(self, food_id: str) -> Optional[int]:
+        return self._codes.get(food_id)
+
+
+_dictionary: Optional[IngredientDictionary] = None
+_dictionary_lock = threading.Lock()
+
+
+def get_ingredient_dictionary() -> IngredientDictionary:
+    """材料辞書を取得（初回のみ読み込み、プロセス内で共有）"""
+    global _dictionary
+    if _dictionary is None:
+        with _dictionary_lock:
+            if _dictionary is None:
+                path = os.path.join(os.path.dirname(os.path.abspath(__file__)), ct.INGREDIENTS_PATH)
+                _dictionary = IngredientDictionary.load(path)
+    return _dictionary
+
+
+def canonicalize_ingredients(materials: List[str]) -> Tuple[str, ...]:
+    """
+    材料リストを canonical ID のタプルに変換（重複除去・ソート済み）
+
+    照合できない材料は正規化後の文字列のまま残す。表記ゆれや並び順の違いに
+    左右されないため、推定結果のキャッシュキーや材料単位の集計に使う。
+    """
+    dictionary = get_ingredient_dictionary()
+    keys = set()
+    for material in materials:
+        food_id = dictionary.canonical_id(material)
+        if food_id is None:
+            # キャッシュキーの区切り文字と衝突しないようにする
+            food_id = normalize_material(material).replace(",", " ")
+        if food_id:
+            keys.add(food_id)
+    return tuple(sorted(keys))
+
+
+def ingredient_display_names(materials: List[str]) -> List[str]:
+    """プロンプト用の材料名リスト（代表名に揃えて重複を除き、元の並び順を保つ）"""
+    dictionary = get_ingredient_dictionary()
+    names = [dictionary.display_name(m) for m in materials]
+    return [n for n in dict.fromkeys(names) if n]
+
+
+def ingredients_cache_key(materials: List[str]) -> str:
+    """cached_estimate_recipe_kcal_pfc 用の材料キー（canonical ID のカンマ区切り）"""
+    return ",".join(canonicalize_ingredients(materials))
@@ -1,8 +1,11 @@
 # initialize.py
+import re
+import uuid
 import streamlit as st
 import logging
-from utils import load_env, init_db, setup_logging
-from constants import DEFAULT_SQLITE_PATH
+from utils import load_env, init_db, setup_logging, start_warmup
+from constants import DEFAULT_SQLITE_PATH, USER_ID_PATTERN
+import metrics
 
 def initialize_once():
     if st.session_state.get("_initialized"):
@@ -16,5 +19,29 @@ def initialize_once():
     env = load_env()
     db_path = env.get("SQLITE_PATH", DEFAULT_SQLITE_PATH)
     init_db(db_path)
+
+    # メトリクスのエクスポート（プロセス内で1回だけ起動される）
+    if env.get("METRICS_PORT"):
+        metrics.start_http_server(int(env["METRICS_PORT"]))
+    if env.get("METRICS_TEXTFILE"):
+        metrics.start_textfile_writer(env["METRICS_TEXTFILE"])
+    # デプロイ直後の初回表示が遅くならないようキャッシュを事前取得（プロセス内で1回だけ起動される）
+    if env.get("WARMUP_ON_START"):
+        start_warmup(env.get("RAKUTEN_APPLICATION_ID", ""))
     st.session_state["_initialized"] = True
-    logger.info("アプリケーション初期化完了")
\ No newline at end of file
+    logger.info("アプリケーション初期化完了")
+
+def resolve_user_id() -> str:
+    """
+    このブラウザのユーザーID
+
+    URLの ?user= を優先し、なければセッションに保存済みのID、それもなければ新しく発行する。
+    発行・確定したIDは ?user= に書き戻し、再読み込みやブックマークでも同じ記録を表示する。
+    """
+    user_id = st.query_params.get("user", "")
+    if not re.match(USER_ID_PATTERN, user_id):
+        user_id = st.session_state.get("user_id") or uuid.uuid4().hex
+    st.session_state["user_id"] = user_id
+    if st.query_params.get("user") != user_id:
+        st.query_params["user"] = user_id
+    return user_id
@@ -0,0 +1,330 @@
+# jobs.py
+import hashlib
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import constants as ct
+import deadline as dl
+import metrics as mt
+import resilience as rs
+from settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class RetryJob(Exception):
+    """
+    ジョブを再実行させるための例外（ハンドラーから送出する）
+
+    result にはその時点の暫定結果（フォールバック値など）を渡す。再試行回数を使い切った場合は
+    この結果を残して FAILED にし、待っている画面にはその値を返す。
+    """
+
+    def __init__(self, reason: str, result: Any = None):
+        super().__init__(reason)
+        self.result = result
+
+
+class JobQueue:
+    """
+    SQLiteに永続化するジョブキュー（画面からの投入と worker.py による実行）
+
+    - 重複排除: 同じ種類・引数のジョブが実行待ち・実行中、または結果の有効期限内なら既存のジョブを返す
+    - 再試行: 失敗したジョブは指数バックオフ+ジッターで最大 JOB_MAX_ATTEMPTS 回まで実行する
+    - リース: 実行中のワーカーが落ちた場合、JOB_LEASE_SEC 経過後に別のワーカーが取り直す
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        # 接続はスレッドごとに使い回す
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=ct.JOB_DB_TIMEOUT, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self) -> None:
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,            -- estimate / cheer / ranking
+                dedup_key TEXT NOT NULL,       -- 種類+引数のハッシュ
+                payload TEXT NOT NULL,         -- 引数（JSON）
+                status TEXT NOT NULL,          -- queued / running / done / failed
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,                   -- 結果（JSON）
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                run_after REAL NOT NULL,       -- 再試行の待機が終わる時刻
+                lease_until REAL,              -- 実行中ジョブのリース期限
+                worker TEXT
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_dedup ON jobs (dedup_key, status)")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, run_after)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS workers (
+                name TEXT PRIMARY KEY,
+                pid INTEGER NOT NULL,
+                heartbeat REAL NOT NULL
+            )
+        """)
+
+    # ---- 投入・参照（画面側） ----
+    def enqueue(self, kind: str, payload: Dict[str, Any]) -> int:
+        """ジョブを投入してIDを返す（同じジョブが実行待ち・実行中・有効な結果ありなら既存のID）"""
+        key = make_dedup_key(kind, payload)
+        now = time.time()
+        fresh_after = now - ct.JOB_RESULT_TTL_SEC.get(kind, 0)
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE dedup_key = ? AND "
+                "(status IN (?, ?) OR (status = ? AND updated_at >= ?)) ORDER BY id DESC LIMIT 1",
+                (key, QUEUED, RUNNING, DONE, fresh_after)
+            ).fetchone()
+            if row is not None:
+                conn.execute("COMMIT")
+                mt.JOBS_ENQUEUED.inc(kind=kind, result="dedup")
+                return row["id"]
+            cur = conn.execute(
+                "INSERT INTO jobs (kind, dedup_key, payload, status, created_at, updated_at, run_after) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (kind, key, json.dumps(payload, ensure_ascii=False), QUEUED, now, now, now)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        mt.JOBS_ENQUEUED.inc(kind=kind, result="new")
+        return cur.lastrowid
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute(
+            "SELECT id, kind, status, attempts, result, error FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return _row_to_job(row) if row is not None else None
+
+    def get_many(self, job_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        if not job_ids:
+            return {}
+        placeholders = ",".join("?" * len(job_ids))
+        rows = self._connect().execute(
+            f"SELECT id, kind, status, attempts, result, error FROM jobs WHERE id IN ({placeholders})",
+            list(job_ids)
+        ).fetchall()
+        return {row["id"]: _row_to_job(row) for row in rows}
+
+    def wait(self, job_ids: List[int], timeout: Optional[float] = None,
+             on_progress: Optional[Callable[[int, int], None]] = None) -> Dict[int, Dict[str, Any]]:
+        """
+        ジョブの完了（DONE / FAILED）をポーリングで待つ
+
+        Returns:
+            完了したジョブだけの {ID: ジョブ}（timeout までに終わらなかったものは含まない）
+        """
+        expires_at = None if timeout is None else time.monotonic() + timeout
+        pending = list(dict.fromkeys(job_ids))
+        finished: Dict[int, Dict[str, Any]] = {}
+        while pending:
+            for job_id, job in self.get_many(pending).items():
+                if job["status"] in (DONE, FAILED):
+                    finished[job_id] = job
+            pending = [i for i in pending if i not in finished]
+            if on_progress is not None:
+                on_progress(len(finished), len(finished) + len(pending))
+            if not pending or (expires_at is not None and time.monotonic() >= expires_at):
+                break
+            time.sleep(ct.JOB_POLL_INTERVAL_SEC)
+        return finished
+
+    # ---- 取得・完了（ワーカー側） ----
+    def claim(self, worker: str, limit: int, kinds: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """実行できるジョブを最大 limit 件取得してリースする（期限切れのリースも取り直す）"""
+        now = time.time()
+        kind_filter, kind_params = "", []
+        if kinds:
+            kind_filter = f" AND kind IN ({','.join('?' * len(kinds))})"
+            kind_params = list(kinds)
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "SELECT id, kind, payload, attempts FROM jobs WHERE "
+                f"((status = ? AND run_after <= ?) OR (status = ? AND lease_until < ?)){kind_filter} "
+                "ORDER BY id LIMIT ?",
+                [QUEUED, now, RUNNING, now, *kind_params, limit]
+            ).fetchall()
+            for row in rows:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, lease_until = ?, worker = ?, "
+                    "updated_at = ? WHERE id = ?",
+                    (RUNNING, now + ct.JOB_LEASE_SEC, worker, now, row["id"])
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return [
+            {"id": row["id"], "kind": row["kind"], "payload": json.loads(row["payload"]),
+             "attempts": row["attempts"] + 1}
+            for row in rows
+        ]
+
+    def complete(self, job_id: int, result: Any) -> None:
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = NULL, lease_until = NULL, updated_at = ? WHERE id = ?",
+            (DONE, json.dumps(result, ensure_ascii=False), time.time(), job_id)
+        )
+
+    def fail(self, job_id: int, attempts: int, error: str, result: Any = None) -> bool:
+        """
+        失敗を記録する（再試行回数が残っていれば待機後に再実行）
+
+        Returns:
+            再試行する場合は True
+        """
+        now = time.time()
+        encoded = json.dumps(result, ensure_ascii=False) if result is not None else None
+        retry = attempts < ct.JOB_MAX_ATTEMPTS
+        if retry:
+            delay = rs.backoff_delay(attempts, ct.JOB_RETRY_BASE_DELAY, ct.JOB_RETRY_MAX_DELAY)
+            self._connect().execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, lease_until = NULL, run_after = ?, "
+                "updated_at = ? WHERE id = ?",
+                (QUEUED, encoded, error, now + delay, now, job_id)
+            )
+        else:
+            self._connect().execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, lease_until = NULL, updated_at = ? WHERE id = ?",
+                (FAILED, encoded, error, now, job_id)
+            )
+        return retry
+
+    def heartbeat(self, worker: str) -> None:
+        self._connect().execute(
+            "INSERT INTO workers (name, pid, heartbeat) VALUES (?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET pid = excluded.pid, heartbeat = excluded.heartbeat",
+            (worker, os.getpid(), time.time())
+        )
+
+    def unregister(self, worker: str) -> None:
+        self._connect().execute("DELETE FROM workers WHERE name = ?", (worker,))
+
+    def worker_alive(self) -> bool:
+        """JOB_WORKER_TIMEOUT_SEC 以内に応答したワーカーがいるか"""
+        row = self._connect().execute(
+            "SELECT COUNT(*) FROM workers WHERE heartbeat >= ?", (time.time() - ct.JOB_WORKER_TIMEOUT_SEC,)
+        ).fetchone()
+        return row[0] > 0
+
+    def purge(self) -> int:
+        """保持期間を過ぎた完了・失敗ジョブを削除"""
+        cur = self._connect().execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+            (DONE, FAILED, time.time() - ct.JOB_RETENTION_SEC)
+        )
+        return cur.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        rows = self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {row[0]: row[1] for row in rows}
+
+
+def _row_to_job(row: sqlite3.Row) -> Dict[str, Any]:
+    return {
+        "id": row["id"],
+        "kind": row["kind"],
+        "status": row["status"],
+        "attempts": row["attempts"],
+        "result": json.loads(row["result"]) if row["result"] is not None else None,
+        "error": row["error"],
+    }
+
+
+def make_dedup_key(kind: str, payload: Dict[str, Any]) -> str:
+    encoded = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    return f"{kind}:{hashlib.sha1(encoded.encode('utf-8')).hexdigest()}"
+
+
+def worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+_queues: Dict[str, JobQueue] = {}
+_queues_lock = threading.Lock()
+
+
+def get_queue(path: Optional[str] = None) -> JobQueue:
+    """ジョブキューを取得（パスごとにプロセス内で共有）"""
+    path = path or get_settings()["JOB_QUEUE_PATH"]
+    with _queues_lock:
+        queue = _queues.get(path)
+        if queue is None:
+            queue = JobQueue(path)
+            _queues[path] = queue
+        return queue
+
+
+def is_available() -> bool:
+    """ジョブキューを使うか（JOB_QUEUE が有効で、稼働中のワーカーがいる場合）"""
+    if not get_settings()["JOB_QUEUE"]:
+        return False
+    try:
+        return get_queue().worker_alive()
+    except sqlite3.Error as e:
+        logger.warning(f"ジョブキューを参照できないためその場で実行: {str(e)}")
+        return False
+
+
+def run(kind: str, payload: Dict[str, Any], inline: Callable[[], Any], timeout: Optional[float] = None,
+        decode: Optional[Callable[[Any], Any]] = None) -> Any:
+    """
+    ワーカーでジョブとして実行して結果を待つ（キューが使えなければ inline() をその場で実行）
+
+    締め切り（deadline.py）または timeout までに結果が出なければ inline() にフォールバックする。
+    ジョブはそのまま残るため、次の表示や他のユーザーは完了した結果を受け取れる。
+    ジョブの結果は JSON で受け渡すため、decode を渡すと inline() と同じ型に戻して返す。
+    """
+    if not is_available():
+        return inline()
+    queue = get_queue()
+    job_id = queue.enqueue(kind, payload)
+    left = dl.remaining()
+    timeout = timeout if timeout is not None else ct.JOB_WAIT_TIMEOUT_SEC
+    if left is not None:
+        timeout = min(timeout, max(0.0, left - ct.DEADLINE_MIN_CALL_SEC))
+    job = queue.wait([job_id], timeout=timeout).get(job_id)
+    if job is not None and job["result"] is not None:
+        return decode(job["result"]) if decode is not None else job["result"]
+    logger.info(f"ジョブの結果を待てないためその場で実行 - {kind} #{job_id}")
+    return inline()
+
+
+def get_job_queue_stats() -> Optional[Dict[str, Any]]:
+    """ジョブキューの状態（開発者モード表示用、無効なら None）"""
+    if not get_settings()["JOB_QUEUE"]:
+        return None
+    queue = get_queue()
+    return {"worker_alive": queue.worker_alive(), "jobs": queue.stats()}
@@ -0,0 +1,77 @@
+# lazy.py
+import functools
+import importlib
+import threading
+from typing import Any, Callable
+
+
+class LazyModule:
+    """
+    属性に初めてアクセスした時点でモジュールを import するプロキシ
+
+    requests や streamlit など import に時間がかかるモジュールを、
+    実際に使うまで読み込まないために使う。
+    例: requests = lazy_import("requests") → requests.get(...) の時点で import
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str) -> Any:
+        # _name/_module/_lock は __init__ で設定済みのためここには来ない
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule {self._name} ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
+
+
+class _LazyCachedFunction:
+    """初回呼び出し時に st.cache_data で包む関数ラッパー"""
+
+    def __init__(self, fn: Callable, cache_kwargs: dict):
+        self._fn = fn
+        self._cache_kwargs = cache_kwargs
+        self._cached = None
+        self._lock = threading.Lock()
+        functools.update_wrapper(self, fn)
+
+    def _get(self) -> Callable:
+        if self._cached is None:
+            with self._lock:
+                if self._cached is None:
+                    import streamlit as st
+                    self._cached = st.cache_data(**self._cache_kwargs)(self._fn)
+        return self._cached
+
+    def __call__(self, *args, **kwargs):
+        return self._get()(*args, **kwargs)
+
+    def clear(self) -> None:
+        if self._cached is not None:
+            self._cached.clear()
+
+
+def cache_data(**cache_kwargs) -> Callable:
+    """
+    st.cache_data と同じ引数をとり、streamlit の import を初回呼び出しまで遅らせるデコレータ
+
+    モジュールの import 時に streamlit を読み込まずに済むため、CLIスクリプトや
+    ワーカープロセスの起動が速くなる。
+    """
+    def decorator(fn: Callable) -> Callable:
+        return _LazyCachedFunction(fn, cache_kwargs)
+    return decorator
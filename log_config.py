@@ -0,0 +1,175 @@
+# log_config.py
+import os
+import logging
+import logging.handlers
+import queue
+import atexit
+import threading
+from datetime import datetime, timedelta
+from typing import Dict
+
+import constants as ct
+
+# ---- ログ設定 ----
+class DailySizeRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    日付ごとのログファイル（nutribuddy_YYYYMMDD.log）に書き込み、
+    同じ日の中ではサイズ上限でローテーションするハンドラ
+    """
+
+    def __init__(self, log_dir: str, prefix: str, max_bytes: int, backup_count: int, retention_days: int):
+        self.log_dir = log_dir
+        self.prefix = prefix
+        self.retention_days = retention_days
+        self._date = datetime.now().strftime('%Y%m%d')
+        super().__init__(
+            self._path_for(self._date), maxBytes=max_bytes, backupCount=backup_count,
+            encoding='utf-8', delay=True
+        )
+
+    def _path_for(self, day: str) -> str:
+        return os.path.join(self.log_dir, f"{self.prefix}_{day}.log")
+
+    def shouldRollover(self, record) -> bool:
+        if datetime.now().strftime('%Y%m%d') != self._date:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        today = datetime.now().strftime('%Y%m%d')
+        if today == self._date:
+            super().doRollover()
+            return
+        # 日付が変わった場合は新しい日付のファイルへ切り替える
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        self._date = today
+        self.baseFilename = os.path.abspath(self._path_for(today))
+        self._remove_expired_logs()
+
+    def _remove_expired_logs(self):
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).strftime('%Y%m%d')
+        for filename in os.listdir(self.log_dir):
+            if not filename.startswith(f"{self.prefix}_"):
+                continue
+            day = filename[len(self.prefix) + 1:len(self.prefix) + 9]
+            if day.isdigit() and day < cutoff:
+                try:
+                    os.remove(os.path.join(self.log_dir, filename))
+                except OSError:
+                    pass
+
+
+class SamplingFilter(logging.Filter):
+    """
+    大量に出力されるDEBUGログをロガー名ごとに 1/N に間引くフィルタ
+
+    rates は {"NutriBuddy.category_search": 20} のようにロガー名（前方一致）→ N の辞書
+    """
+
+    def __init__(self, rates: Dict[str, int]):
+        super().__init__()
+        self.rates = rates
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _rate_for(self, name: str) -> int:
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition('.')[0]
+        return 1
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        rate = self._rate_for(record.name)
+        if rate <= 1:
+            return True
+        with self._lock:
+            count = self._counts.get(record.name, 0)
+            self._counts[record.name] = count + 1
+        return count % rate == 0
+
+
+_log_listener = None
+_logging_lock = threading.Lock()
+
+def _stop_log_listener():
+    """終了時にキューに残ったログを書き出してリスナーを止める"""
+    global _log_listener
+    with _logging_lock:
+        if _log_listener is not None:
+            _log_listener.stop()
+            _log_listener = None
+
+def setup_logging():
+    """
+    ログ設定を初期化（何度呼んでも1回だけ設定される）
+
+    ルートロガーには QueueHandler のみを付け、ファイル/コンソールへの書き込みは
+    QueueListener のスレッドで行うため、画面描画のスレッドがログI/Oで待たされない
+    """
+    global _log_listener
+    app_logger = logging.getLogger('NutriBuddy')
+    with _logging_lock:
+        if _log_listener is not None:
+            return app_logger
+        
+        # ログディレクトリを作成
+        os.makedirs(ct.LOG_DIR, exist_ok=True)
+        
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+        file_handler = DailySizeRotatingFileHandler(
+            ct.LOG_DIR, "nutribuddy", ct.LOG_MAX_BYTES, ct.LOG_BACKUP_COUNT, ct.LOG_RETENTION_DAYS
+        )
+        file_handler.setFormatter(formatter)
+        console_handler = logging.StreamHandler()  # コンソールにも出力
+        console_handler.setFormatter(formatter)
+        
+        queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+        queue_handler.addFilter(SamplingFilter(ct.LOG_SAMPLING_RATES))
+        
+        root = logging.getLogger()
+        # 以前の basicConfig などで付いたハンドラを外し、二重出力を防ぐ
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel(logging.INFO)
+        
+        _log_listener = logging.handlers.QueueListener(
+            queue_handler.queue, file_handler, console_handler, respect_handler_level=True
+        )
+        _log_listener.start()
+        atexit.register(_stop_log_listener)
+    
+    app_logger.info("="*50)
+    app_logger.info("NutriBuddy アプリケーション開始")
+    app_logger.info("="*50)
+    
+    return app_logger
+
+# アプリケーション共通のロガー（ハンドラの設定は setup_logging で行う）
+logger = logging.getLogger('NutriBuddy')
+
+# ---- 開発用：ログレベル変更機能 ----
+def set_debug_mode(enable: bool = True):
+    """
+    開発用：デバッグモードの有効/無効を切り替え
+    
+    Args:
+        enable: Trueでデバッグモード有効、FalseでINFOレベル
+    """
+    level = logging.DEBUG if enable else logging.INFO
+    if logger.level == level:
+        # Streamlitの再実行ごとに呼ばれるため、変更がなければ何もしない
+        return
+    logger.setLevel(level)
+    
+    # ハンドラーのレベルも変更
+    for handler in logger.handlers:
+        handler.setLevel(level)
+    
+    status = "有効" if enable else "無効"
+    logger.info(f"デバッグモード: {status}")
@@ -3,15 +3,26 @@ import streamlit as st
 from datetime import date
 import logging
 
-from initialize import initialize_once
+from initialize import initialize_once, resolve_user_id
 import components as cp
 import constants as ct
 import utils as ut
+import singleflight as sf
+import resilience as rs
+import deadline as dl
+import hedge as hg
+import tracing as tr
+import metrics as mt
 
 # ログ設定の初期化
 ut.setup_logging()
 logger = logging.getLogger(__name__)
 
+# 今回の実行（レンダリング）のステージ別処理時間の記録を開始
+tr.begin_run()
+# 前回の実行で設定した締め切りを持ち越さない（st.rerun() で途中終了した場合も含む）
+dl.clear()
+
 st.set_page_config(page_title="NutriBuddy", page_icon=ct.MEAL_ICONS, layout="wide")
 
 # 初回のみ初期化
@@ -20,7 +31,10 @@ initialize_once()
 env = ut.load_env()
 OPENAI_API_KEY = env["OPENAI_API_KEY"]
 RAKUTEN_APP_ID = env["RAKUTEN_APPLICATION_ID"]
-DB_PATH = env["SQLITE_PATH"]
+# ユーザーごとに食事記録を分ける（DB_SHARDING=true ならユーザーごとのDBファイル）
+USER_ID = resolve_user_id()
+DB_PATH = ut.user_db_path(env["SQLITE_PATH"], USER_ID, env["DB_SHARDING"])
+ut.init_db(DB_PATH)
 
 logger.info("環境変数読み込み完了")
 
@@ -32,7 +46,7 @@ st.caption("回答は必ずしも正しいとは限りません。重要な情
 
 # 今日の摂取カロリー計算（サイドバー表示前に実行）
 logger.info("今日の摂取カロリー計算開始")
-consumed = ut.sum_today_kcal(DB_PATH)
+consumed = ut.sum_today_kcal(DB_PATH, USER_ID)
 
 # サイドバー入力（摂取済みカロリーを渡す）
 inputs = cp.sidebar_inputs({
@@ -42,6 +56,9 @@ inputs = cp.sidebar_inputs({
     "location": ct.DEFAULT_LOCATION
 }, consumed)
 
+# 履歴ページでも同じ目標カロリーと比較する
+st.session_state["target_kcal"] = inputs["target_kcal"]
+
 # 目標カロリーが設定された後に残りカロリーを計算
 remaining = ut.calc_remaining_kcal(inputs["target_kcal"], consumed)
 
@@ -57,6 +74,7 @@ if "meal_recorded" in st.session_state:
 
 # 開発者モード（デバッグ用）
 with st.sidebar.expander("🔧 開発者モード", expanded=False):
+    st.caption(f"ユーザーID: {USER_ID} / DB: {DB_PATH}")
     st.write("**楽天APIデバッグ機能**")
     
     if st.button("カテゴリ一覧取得", help="楽天レシピAPIのカテゴリ一覧を取得してログに表示"):
@@ -88,6 +106,100 @@ with st.sidebar.expander("🔧 開発者モード", expanded=False):
     else:
         ut.set_debug_mode(False)
     
+    st.write("**上流API リクエスト集約**")
+    sf_stats = sf.get_stats()
+    if sf_stats:
+        st.dataframe(
+            [{"上流": name, "実行": s["calls"], "集約": s["coalesced"], "実行中": s["inflight"]}
+             for name, s in sf_stats.items()],
+            use_container_width=True, hide_index=True
+        )
+    else:
+        st.caption("まだ上流APIへのリクエストはありません")
+
+    st.write("**上流API 回路状態**")
+    circuit_states = rs.get_states()
+    if circuit_states:
+        state_labels = {rs.CLOSED: "正常", rs.OPEN: "遮断中", rs.HALF_OPEN: "試行中"}
+        st.dataframe(
+            [{"上流": name, "状態": state_labels.get(s["state"], s["state"]), "連続失敗": s["failures"],
+              "再開まで(秒)": round(s["retry_after"])}
+             for name, s in circuit_states.items()],
+            use_container_width=True, hide_index=True
+        )
+    else:
+        st.caption("まだ上流APIへのリクエストはありません")
+
+    hedge_stats = hg.get_stats()
+    if hedge_stats:
+        st.write(f"**LLM呼び出しのヘッジ**（{env['HEDGE_MODE']}）")
+        st.dataframe(
+            [{"用途": purpose, "呼び出し": s["calls"], "ヘッジ発行": s["fired"], "ヘッジ勝ち": s["hedge_wins"],
+              "p90(ms)": s["p90_ms"], "計測数": s["samples"]}
+             for purpose, s in hedge_stats.items()],
+            use_container_width=True, hide_index=True
+        )
+
+    job_stats = ut.get_job_queue_stats()
+    if job_stats is not None:
+        st.write("**ジョブキュー**")
+        worker_label = "稼働中" if job_stats["worker_alive"] else "停止中（その場で実行）"
+        st.caption(f"ワーカー: {worker_label} / " + ", ".join(f"{k}: {v}" for k, v in sorted(job_stats["jobs"].items())))
+
+    if env.get("WARMUP_ON_START"):
+        warmup_status = ut.get_warmup_status()
+        st.write("**キャッシュの事前取得**")
+        st.caption(
+            f"{warmup_status['state']} {warmup_status['phase']}: {warmup_status['done']}/{warmup_status['total']}件 "
+            f"(失敗 {warmup_status['errors']}件, {warmup_status['elapsed_sec']:.1f}秒)"
+        )
+
+    if env.get("NUTRITION_ESTIMATOR") == "router":
+        router_stats = ut.get_router_stats()
+        st.write(f"**カロリー推定の振り分け**（しきい値 {env['ROUTER_CONFIDENCE_THRESHOLD']:.2f}）")
+        st.caption(
+            f"食品成分表 {router_stats['local']}件 / LLM {router_stats['llm']}件 "
+            f"(LLM呼び出し削減率 {router_stats['llm_call_reduction']:.0%})"
+        )
+
+    image_stats = ut.get_image_cache_stats()
+    st.write("**画像キャッシュ**")
+    st.caption(
+        f"{image_stats['files']}件 / {image_stats['bytes'] / 1024 / 1024:.1f}MB "
+        f"(上限 {image_stats['max_bytes'] / 1024 / 1024:.0f}MB)"
+    )
+
+    proposal_stats = ut.get_proposal_stats(st.session_state)
+    st.write("**提案の共有ストア**")
+    st.caption(
+        f"レシピ {proposal_stats['recipes']}/{proposal_stats['max_recipes']}件 / "
+        f"推定 {proposal_stats['estimates']}/{proposal_stats['max_estimates']}件 / "
+        f"このセッションの提案 {proposal_stats['session_bundles']}/{proposal_stats['max_session_bundles']}件"
+    )
+
+    st.write("**キャッシュヒット率**")
+    hit_ratios = mt.cache_hit_ratios()
+    if hit_ratios:
+        st.dataframe(
+            [{"キャッシュ": name, "ヒット率": f"{ratio:.0%}"} for name, ratio in hit_ratios.items()],
+            use_container_width=True, hide_index=True
+        )
+    else:
+        st.caption("キャッシュ参照はまだありません")
+
+    st.write("**ステージ別処理時間（直近の実行）**")
+    stage_rows = tr.stage_summary()
+    if stage_rows:
+        st.dataframe(stage_rows, use_container_width=True, hide_index=True)
+        st.download_button(
+            "計測データをエクスポート (JSON)",
+            data=tr.export_runs(),
+            file_name="nutribuddy_traces.json",
+            mime="application/json"
+        )
+    else:
+        st.caption("計測データはまだありません")
+
     st.write("**ログファイル情報**")
     from datetime import datetime
     log_file = f"logs/nutribuddy_{datetime.now().strftime('%Y%m%d')}.log"
@@ -109,26 +221,20 @@ if show_weather or st.session_state.get("weather_visible", False):
                 st.rerun()
             
             logger.info("天気情報取得開始")
-            weather = ut.fetch_weekly_weather(inputs["location"])
+            weather = ut.cached_fetch_weekly_weather(inputs["location"])
             cp.show_weather_calendar(weather)
     else:
         # 非表示の場合は簡易的な天気取得（体感温度のみ）
         logger.info("体感温度計算用の天気情報取得")
-        weather = ut.fetch_weekly_weather(inputs["location"])
+        weather = ut.cached_fetch_weekly_weather(inputs["location"])
 else:
     # 初回または非表示状態では簡易的な天気取得
     logger.info("体感温度計算用の天気情報取得")
-    weather = ut.fetch_weekly_weather(inputs["location"])
+    weather = ut.cached_fetch_weekly_weather(inputs["location"])
 
 # 今日の温度感（今日の最高気温を採用）
-today_feel = "快適"
-try:
-    max_list = weather.get("daily", {}).get("temperature_2m_max", [])
-    if max_list:
-        today_feel = ut.temp_to_feel(float(max_list[0]))
-        logger.info(f"今日の体感温度: {today_feel}")
-except Exception as e:
-    logger.warning(f"体感温度計算エラー: {str(e)}")
+today_feel = ut.feel_from_weather(weather)
+logger.info(f"今日の体感温度: {today_feel}")
 
 # デバッグ情報表示（開発用）
 # with st.expander("🔧 デバッグ情報", expanded=False):
@@ -157,6 +263,8 @@ if st.session_state.get("show_recipes", False):
     budget = st.session_state.get("current_budget", inputs["meal_budget"])
     
     logger.info(f"レシピ提案表示 - ジャンル: {genre}")
+    # レシピ提案全体の締め切り（以降の上流呼び出しはこの残り時間に合わせる）
+    dl.start(ct.PROPOSAL_DEADLINE_SEC, "proposal")
     proposal_mode = inputs.get("proposal_mode", ct.DEFAULT_PROPOSAL_MODE)
     
     if proposal_mode == "主食+副菜提案":
@@ -176,101 +284,136 @@ if st.session_state.get("show_recipes", False):
     # 動的カテゴリ検索を使用
     keyword = inputs.get("search_keyword")
     search_mode = inputs.get("search_mode", "ジャンル優先")
+    meal_kcal_limit = inputs["meal_kcal"]
     
-    # 検索パラメータの決定
-    if search_mode == "キーワード優先" and keyword:
-        # キーワード重視の検索
-        recipes = ut.fetch_top_recipes_by_genre(keyword, RAKUTEN_APP_ID, keyword)
-        logger.info(f"キーワード優先検索: '{keyword}'")
+    # 同じ条件の提案をこのセッションで作っていれば、共有ストアから組み立て直して再利用する
+    # （記録ボタンなどによる再実行で、レシピ取得・カロリー推定をやり直さない）
+    proposal_key = ut.proposal_key(search_mode, genre, keyword, difficulty, budget, season, today_feel,
+                                   proposal_mode, meal_kcal_limit)
+    proposal = ut.recall_proposal(st.session_state, proposal_key)
+    if proposal is not None:
+        logger.info(f"セッションの提案を再利用 - レシピ{len(proposal.recipes)}件")
     else:
-        # ジャンル優先の検索（従来通り）
-        recipes = ut.fetch_top_recipes_by_genre(genre, RAKUTEN_APP_ID, keyword)
-        logger.info(f"ジャンル優先検索: '{genre}'" + (f" + キーワード: '{keyword}'" if keyword else ""))
+        # 検索パラメータの決定
+        if search_mode == "キーワード優先" and keyword:
+            # キーワード重視の検索
+            recipes = ut.cached_fetch_top_recipes_by_genre(keyword, RAKUTEN_APP_ID, keyword)
+            logger.info(f"キーワード優先検索: '{keyword}'")
+        else:
+            # ジャンル優先の検索（従来通り）
+            recipes = ut.cached_fetch_top_recipes_by_genre(genre, RAKUTEN_APP_ID, keyword)
+            logger.info(f"ジャンル優先検索: '{genre}'" + (f" + キーワード: '{keyword}'" if keyword else ""))
 
-    if not recipes:
-        logger.warning("レシピ取得失敗")
-        st.warning("レシピが取得できませんでした。ジャンルやAPI設定を確認してください。")
-    else:
-        logger.info(f"レシピ取得成功 - {len(recipes)}件")
-        # バッチ処理でパフォーマンス向上
-        if len(recipes) > 1:
-            logger.info("複数レシピの並行処理開始")
-            with st.status("複数のレシピを並行処理中...", expanded=False) as status:
-                kcal_infos = ut.batch_estimate_recipes_sync(recipes, 
-                    difficulty=difficulty,
-                    budget_jpy=budget,
-                    season=season,
-                    feel=today_feel
-                )
-                logger.info("並行処理完了")
+        if not recipes:
+            logger.warning("レシピ取得失敗")
+            st.warning("レシピが取得できませんでした。ジャンルやAPI設定を確認してください。")
+        else:
+            logger.info(f"レシピ取得成功 - {len(recipes)}件")
+            notice = None
+            # バッチ処理でパフォーマンス向上
+            if len(recipes) > 1:
+                logger.info("複数レシピの並行処理開始")
+                with st.status("複数のレシピを並行処理中...", expanded=False) as status:
+                    kcal_infos = ut.batch_estimate_recipes_sync(recipes, 
+                        difficulty=difficulty,
+                        budget_jpy=budget,
+                        season=season,
+                        feel=today_feel
+                    )
+                    logger.info("並行処理完了")
+                    
+                    # カロリーフィルタリング処理
+                    filtered_recipes = []
+                    filtered_kcal_infos = []
+                    
+                    for i, (recipe, kcal_info) in enumerate(zip(recipes, kcal_infos)):
+                        estimated_kcal = kcal_info.kcal
+                        if estimated_kcal <= meal_kcal_limit + 100:  # 希望カロリー+100kcal以内
+                            filtered_recipes.append(recipe)
+                            filtered_kcal_infos.append(kcal_info)
+                            logger.debug(f"レシピ承認: {recipe.name} ({estimated_kcal:.0f}kcal <= {meal_kcal_limit + 100}kcal)")
+                        else:
+                            logger.debug(f"レシピ除外: {recipe.name} ({estimated_kcal:.0f}kcal > {meal_kcal_limit + 100}kcal)")
+                    
+                    # フィルタリング後のレシピ数をチェック
+                    if len(filtered_recipes) >= 2:
+                        recipes = filtered_recipes
+                        kcal_infos = filtered_kcal_infos
+                        logger.info(f"カロリーフィルタリング完了 - 表示レシピ: {len(recipes)}件")
+                        status.update(label="カロリー条件に合うメニューを選定しました！", state="complete")
+                    else:
+                        logger.warning(f"フィルタリング後のレシピが少数({len(filtered_recipes)}件) - 元のレシピを表示")
+                        status.update(label="以下がおすすめのメニューです！", state="complete")
+                        if len(filtered_recipes) > 0:
+                            notice = f"💡 希望カロリー({meal_kcal_limit}kcal)に完全に合うレシピは{len(filtered_recipes)}件でした。参考として他のレシピも表示します。"
+            else:
+                notice = "以下がおすすめのメニューです！"
+                kcal_infos = []
+            
+            # 1件だけの場合は個別にカロリー推定
+            if len(kcal_infos) < len(recipes):
+                logger.info(f"個別カロリー推定開始 - {len(recipes) - len(kcal_infos)}件")
+                kcal_infos = kcal_infos + [
+                    ut.cached_estimate_recipe(r, difficulty, budget, season, today_feel) for r in recipes[len(kcal_infos):]
+                ]
+            
+            # 提案モードによる分岐処理
+            if proposal_mode == "主食+副菜提案":
+                # 複数レシピ組み合わせモード
+                logger.info("主食+副菜提案モード開始")
                 
-                # カロリーフィルタリング処理
-                meal_kcal_limit = inputs["meal_kcal"]
-                filtered_recipes = []
-                filtered_kcal_infos = []
+                # より多くのレシピを取得（組み合わせ用）
+                additional_recipes = []
+                for keyword in ct.SIDE_DISH_SEARCH_KEYWORDS:
+                    # 副菜の追加取得は省略可能なため、締め切りが近ければ打ち切る
+                    if not dl.has_time_for(ct.DEADLINE_OPTIONAL_RESERVE_SEC):
+                        logger.info("締め切りが近いため副菜の追加取得を省略")
+                        dl.note_skipped("副菜の追加取得")
+                        break
+                    extra_recipes = ut.cached_fetch_top_recipes_by_genre(keyword, RAKUTEN_APP_ID, keyword)
+                    if extra_recipes:
+                        additional_recipes.extend(extra_recipes[:2])  # 各キーワードから2件
                 
-                for i, (recipe, kcal_info) in enumerate(zip(recipes, kcal_infos)):
-                    estimated_kcal = kcal_info.get('kcal', 0)
-                    if estimated_kcal <= meal_kcal_limit + 100:  # 希望カロリー+100kcal以内
-                        filtered_recipes.append(recipe)
-                        filtered_kcal_infos.append(kcal_info)
-                        logger.debug(f"レシピ承認: {recipe.get('recipeName', '')} ({estimated_kcal:.0f}kcal <= {meal_kcal_limit + 100}kcal)")
-                    else:
-                        logger.debug(f"レシピ除外: {recipe.get('recipeName', '')} ({estimated_kcal:.0f}kcal > {meal_kcal_limit + 100}kcal)")
+                # 既存レシピと追加レシピを結合
+                all_recipes = recipes + additional_recipes
                 
-                # フィルタリング後のレシピ数をチェック
-                if len(filtered_recipes) >= 2:
-                    recipes = filtered_recipes
-                    kcal_infos = filtered_kcal_infos
-                    logger.info(f"カロリーフィルタリング完了 - 表示レシピ: {len(recipes)}件")
-                    status.update(label="カロリー条件に合うメニューを選定しました！", state="complete")
+                # 追加レシピのカロリー推定
+                if additional_recipes:
+                    logger.info(f"追加レシピ{len(additional_recipes)}件のカロリー推定開始")
+                    additional_kcal_infos = ut.batch_estimate_recipes_sync(additional_recipes,
+                        difficulty=difficulty,
+                        budget_jpy=budget,
+                        season=season,
+                        feel=today_feel
+                    )
+                    all_kcal_infos = kcal_infos + additional_kcal_infos
                 else:
-                    logger.warning(f"フィルタリング後のレシピが少数({len(filtered_recipes)}件) - 元のレシピを表示")
-                    status.update(label="以下がおすすめのメニューです！", state="complete")
-                    if len(filtered_recipes) > 0:
-                        st.info(f"💡 希望カロリー({meal_kcal_limit}kcal)に完全に合うレシピは{len(filtered_recipes)}件でした。参考として他のレシピも表示します。")
-        else:
-            st.info("以下がおすすめのメニューです！")
-            kcal_infos = []
+                    all_kcal_infos = kcal_infos
+                
+                # 組み合わせ検索
+                combinations = ut.find_recipe_combinations(all_recipes, all_kcal_infos, meal_kcal_limit)
+                recipes, kcal_infos = all_recipes, all_kcal_infos
+            else:
+                combinations = []
+            
+            proposal = ut.Proposal(recipes, kcal_infos, combinations, notice)
+            ut.remember_proposal(st.session_state, proposal_key, proposal, meal_kcal_limit,
+                                 difficulty, budget, season, today_feel)
+    
+    if proposal is not None:
+        if proposal.notice:
+            st.info(proposal.notice)
         
         # 提案モードによる分岐処理
         if proposal_mode == "主食+副菜提案":
-            # 複数レシピ組み合わせモード
-            logger.info("主食+副菜提案モード開始")
-            
-            # より多くのレシピを取得（組み合わせ用）
-            additional_recipes = []
-            side_keywords = ["サラダ", "野菜", "副菜", "おかず"]
-            
-            for keyword in side_keywords:
-                extra_recipes = ut.fetch_top_recipes_by_genre(keyword, RAKUTEN_APP_ID, keyword)
-                if extra_recipes:
-                    additional_recipes.extend(extra_recipes[:2])  # 各キーワードから2件
-            
-            # 既存レシピと追加レシピを結合
-            all_recipes = recipes + additional_recipes
-            
-            # 追加レシピのカロリー推定
-            if additional_recipes:
-                logger.info(f"追加レシピ{len(additional_recipes)}件のカロリー推定開始")
-                additional_kcal_infos = ut.batch_estimate_recipes_sync(additional_recipes,
-                    difficulty=difficulty,
-                    budget_jpy=budget,
-                    season=season,
-                    feel=today_feel
-                )
-                all_kcal_infos = kcal_infos + additional_kcal_infos
-            else:
-                all_kcal_infos = kcal_infos
-            
-            # 組み合わせ検索
-            combinations = ut.find_recipe_combinations(all_recipes, all_kcal_infos, meal_kcal_limit)
-            
+            combinations = proposal.combinations
             if combinations:
                 logger.info(f"組み合わせ提案: {len(combinations)}件")
+                # カードの画像（サムネイル）を並列で用意しておく
+                ut.prefetch_thumbnails(recipe.image_url for combo in combinations for recipe in combo.recipes)
                 for i, combo in enumerate(combinations, start=1):
                     # 組み合わせの応援メッセージ生成
-                    combo_summary = f"{combo['combination_name']} / 合計{int(combo['total_kcal'])}kcal / {combo['type']} / 目標{meal_kcal_limit}kcal"
+                    combo_summary = f"{combo.name} / 合計{int(combo.total_kcal)}kcal / {combo.kind} / 目標{meal_kcal_limit}kcal"
                     cheer = ut.generate_cheer(combo_summary)
                     
                     # 組み合わせカード表示
@@ -279,19 +422,17 @@ if st.session_state.get("show_recipes", False):
                     # 記録ボタン（組み合わせ用）
                     col1, col2 = st.columns([1, 4])
                     with col1:
-                        button_key = f"log_combo_{i}_{combo['type']}"
+                        button_key = f"log_combo_{i}_{combo.kind}"
                         if st.button(f"この組み合わせを{meal_type}に記録", key=button_key):
-                            logger.info(f"🔥 組み合わせ記録ボタンクリック - {combo['combination_name']}, 合計カロリー: {combo['total_kcal']}")
+                            logger.info(f"🔥 組み合わせ記録ボタンクリック - {combo.name}, 合計カロリー: {combo.total_kcal}")
                             try:
                                 # 各レシピを個別に記録
-                                for recipe_info in combo['recipes']:
-                                    recipe_name = recipe_info['recipe'].get('recipeName', '')
-                                    recipe_kcal = recipe_info['kcal_info'].get('kcal', 0)
-                                    ut.insert_meal_log(DB_PATH, meal_type, recipe_name, float(recipe_kcal))
+                                for recipe, kcal_info in combo.items():
+                                    ut.insert_meal_log(DB_PATH, meal_type, recipe.name, float(kcal_info.kcal), USER_ID)
                                 
                                 # セッション状態で記録完了をマーク
                                 st.session_state.meal_recorded = True
-                                st.session_state.last_added_kcal = float(combo['total_kcal'])
+                                st.session_state.last_added_kcal = float(combo.total_kcal)
                                 
                                 st.rerun()
                                 
@@ -306,33 +447,18 @@ if st.session_state.get("show_recipes", False):
         else:
             # 従来の1品提案モード
             logger.info("1品提案モード")
+            # カードの画像（サムネイル）を並列で用意しておく
+            ut.prefetch_thumbnails(r.image_url for r in proposal.recipes)
             
-            for i, r in enumerate(recipes, start=1):
-                recipe_name = r.get("recipeName", "")
+            for i, (r, kcal_info) in enumerate(zip(proposal.recipes, proposal.estimates), start=1):
+                recipe_name = r.name
                 logger.debug(f"レシピ{i}表示処理: {recipe_name}")
                 
-                if i-1 < len(kcal_infos):
-                    kcal_info = kcal_infos[i-1]
-                else:
-                    # フォールバック: 個別処理
-                    logger.info(f"レシピ{i}の個別カロリー推定開始")
-                    ingredients_str = ",".join(r.get("recipeMaterial", []))
-                    kcal_info = ut.cached_estimate_recipe_kcal_pfc(
-                        recipe_name=recipe_name,
-                        ingredients_str=ingredients_str,
-                        method=r.get("recipeIndication") or "",
-                        difficulty=difficulty,
-                        budget_jpy=budget,
-                        season=season,
-                        feel=today_feel
-                    )
-                
                 # カロリー条件チェック（個別処理時）
-                estimated_kcal = kcal_info.get('kcal', 0)
-                meal_kcal_limit = inputs["meal_kcal"]
+                estimated_kcal = kcal_info.kcal
                 is_over_calorie = estimated_kcal > meal_kcal_limit + 100
                 
-                summary = f"{recipe_name} / 約{int(kcal_info['kcal'])}kcal / {genre} / {difficulty} / 予算{budget}円 / 体感:{today_feel}"
+                summary = f"{recipe_name} / 約{int(kcal_info.kcal)}kcal / {genre} / {difficulty} / 予算{budget}円 / 体感:{today_feel}"
                 cheer = ut.generate_cheer(summary)
                 
                 # カロリーオーバー時の表示調整
@@ -348,22 +474,22 @@ if st.session_state.get("show_recipes", False):
                     logger.debug(f"ボタン表示 - キー: {button_key}")
                     
                     if st.button(f"この料理を{meal_type}に記録", key=button_key):
-                        logger.info(f"🔥 食事記録ボタンクリック - レシピ: {recipe_name}, カロリー: {kcal_info['kcal']}")
+                        logger.info(f"🔥 食事記録ボタンクリック - レシピ: {recipe_name}, カロリー: {kcal_info.kcal}")
                         try:
                             # デバッグ: 挿入前の状態確認
-                            before_consumed = ut.sum_today_kcal(DB_PATH)
+                            before_consumed = ut.sum_today_kcal(DB_PATH, USER_ID)
                             logger.info(f"挿入前摂取カロリー: {before_consumed}kcal")
                             
                             # レコード挿入
-                            ut.insert_meal_log(DB_PATH, meal_type, recipe_name, float(kcal_info["kcal"]))
+                            ut.insert_meal_log(DB_PATH, meal_type, recipe_name, float(kcal_info.kcal), USER_ID)
                             
                             # デバッグ: 挿入後の状態確認
-                            after_consumed = ut.sum_today_kcal(DB_PATH)
+                            after_consumed = ut.sum_today_kcal(DB_PATH, USER_ID)
                             logger.info(f"挿入後摂取カロリー: {after_consumed}kcal")
                             
                             # セッション状態で記録完了をマーク
                             st.session_state.meal_recorded = True
-                            st.session_state.last_added_kcal = float(kcal_info["kcal"])
+                            st.session_state.last_added_kcal = float(kcal_info.kcal)
                             
                             # ページを再実行して残カロリーを更新
                             logger.info("ページ再実行開始")
@@ -375,58 +501,56 @@ if st.session_state.get("show_recipes", False):
                             logger.error(f"エラー詳細: {traceback.format_exc()}")
                             st.error("食事記録に失敗しました。")
                 st.divider()
+        
+        cp.deadline_notice(dl.current())
 
 # 1週間の献立
 if inputs["weekly"]:
     logger.info("週間献立作成開始")
+    dl.start(ct.WEEKLY_DEADLINE_SEC, "weekly")
     
     # 週間献立でも動的検索を使用
     keyword = inputs.get("search_keyword")
     search_mode = inputs.get("search_mode", "ジャンル優先")
     
     if search_mode == "キーワード優先" and keyword:
-        recipes = ut.fetch_top_recipes_by_genre(keyword, RAKUTEN_APP_ID, keyword)
+        recipes = ut.cached_fetch_top_recipes_by_genre(keyword, RAKUTEN_APP_ID, keyword)
     else:
-        recipes = ut.fetch_top_recipes_by_genre(inputs["genre"], RAKUTEN_APP_ID, keyword)
+        recipes = ut.cached_fetch_top_recipes_by_genre(inputs["genre"], RAKUTEN_APP_ID, keyword)
     
     if recipes:
         logger.info(f"週間献立用レシピ取得: {len(recipes)}件")
         
         with st.status("1週間の献立を作成中...", expanded=False) as status:
-            rows = []
             season = ut.get_season()
+            daily_recipes = ut.pick_weekly_recipes(recipes)
+            kcal_infos, cheers = [], []
             
-            # シンプルに同じ上位候補から日替わりで1品ずつ（本実装では重複回避や多様性ロジックを向上）
-            for d in range(7):
-                day_num = d + 1
-                r = recipes[d % len(recipes)]
-                recipe_name = r.get("recipeName", "")
+            for day_num, r in enumerate(daily_recipes, start=1):
+                recipe_name = r.name
                 logger.debug(f"Day{day_num}の献立処理: {recipe_name}")
                 
-                ingredients_str = ",".join(r.get("recipeMaterial", []))
-                kcal_info = ut.cached_estimate_recipe_kcal_pfc(
-                    recipe_name=recipe_name,
-                    ingredients_str=ingredients_str,
-                    method=r.get("recipeIndication") or "",
-                    difficulty=inputs["difficulty"],
-                    budget_jpy=inputs["meal_budget"],
-                    season=season,
-                    feel=today_feel
-                )
-                summary = f"{recipe_name} / 約{int(kcal_info['kcal'])}kcal / 日{day_num}"
-                cheer = ut.generate_cheer(summary)
-                rows.append({
-                    "日": f"Day {day_num}",
-                    "料理名": recipe_name,
-                    "推定kcal": int(kcal_info["kcal"]),
-                    "レシピリンク": r.get("recipeUrl", ""),
-                    "応援": cheer
-                })
+                kcal_info = ut.cached_estimate_recipe(r, inputs["difficulty"], inputs["meal_budget"], season, today_feel)
+                kcal_infos.append(kcal_info)
+                cheers.append(ut.generate_cheer(ut.weekly_day_summary(day_num, recipe_name, kcal_info.kcal)))
+            
+            plan = ut.build_weekly_plan(daily_recipes, kcal_infos, cheers)
+            rows = [
+                {
+                    "日": f"Day {day['day']}",
+                    "料理名": day["recipe_name"],
+                    "推定kcal": int(day["kcal"]),
+                    "レシピリンク": day["recipe_url"],
+                    "応援": day["cheer"]
+                }
+                for day in plan["days"]
+            ]
             
             logger.info("週間献立作成完了")
             status.update(label="1週間の献立を作成しました！", state="complete")
         
         cp.weekly_table(rows)
+        cp.deadline_notice(dl.current())
     else:
         logger.warning("週間献立作成失敗 - レシピ取得エラー")
         st.warning("献立を作成できませんでした（レシピ取得失敗）。")
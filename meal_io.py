@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# meal_io.py
+#
+# 食事記録（SQLite）の書き出し・取り込みCLI（Parquet / CSV、Streamlit不要）
+#
+# どちらも MEAL_IO_CHUNK_ROWS 行ずつ読み書きし、行数が多くてもメモリ使用量は一定。
+# 取り込みはファイル全体をSQLiteの一時テーブル（ファイル上）に置き、MEAL_IO_CHUNK_ROWS 行ごとに1トランザクションで
+# 追加する。取り込み済みの記録は追加しない（記録の同一性は内容と seq 列＝同じ内容の記録のうち何件目か、で
+# 判定するため、同じ内容の記録が複数あってもそのまま取り込む）。
+# 集計テーブル（meal_daily_rollup / meal_weekly_rollup）は書き出せるが、取り込みは meal_logs だけ
+# （集計は取り込んだ記録から更新される）。
+#
+#   python meal_io.py export meal_logs.parquet
+#   python meal_io.py export daily.csv --table meal_daily_rollup --user abc123
+#   python meal_io.py import meal_logs.parquet --db ./other.db
+import argparse
+import csv
+import logging
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+import constants as ct
+import db
+
+logger = logging.getLogger('NutriBuddy')
+
+# Parquet の列の型（EXPORT_COLUMNS の列名 → pyarrow の型名）
+_PARQUET_TYPES = {"kcal": "float64", "meals": "int64", "seq": "int64"}
+
+
+def _is_parquet(path: str) -> bool:
+    return path.lower().endswith((".parquet", ".pq"))
+
+
+# ---- 書き出し ----
+def export_table(db_path: str, path: str, table: str = "meal_logs", user_id: Optional[str] = None,
+                 chunk_rows: int = ct.MEAL_IO_CHUNK_ROWS) -> int:
+    """テーブルを Parquet（拡張子 .parquet/.pq）または CSV に書き出し、行数を返す"""
+    columns = db.EXPORT_COLUMNS[table]
+    chunks = db.iter_table_chunks(db_path, table, user_id, chunk_rows)
+    if _is_parquet(path):
+        return _write_parquet(path, columns, chunks)
+    return _write_csv(path, columns, chunks)
+
+
+def _write_csv(path: str, columns, chunks: Iterator[List[tuple]]) -> int:
+    total = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for rows in chunks:
+            writer.writerows(rows)
+            total += len(rows)
+    return total
+
+
+def _write_parquet(path: str, columns, chunks: Iterator[List[tuple]]) -> int:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(c, getattr(pa, _PARQUET_TYPES.get(c, "string"))()) for c in columns])
+    total = 0
+    # チャンクごとに row group を書き足す（ファイル全体をメモリに持たない）
+    with pq.ParquetWriter(path, schema) as writer:
+        for rows in chunks:
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+            writer.write_batch(pa.record_batch(arrays, schema=schema))
+            total += len(rows)
+    return total
+
+
+# ---- 取り込み ----
+def _read_csv(path: str, chunk_rows: int) -> Iterator[List[Dict[str, Any]]]:
+    with open(path, encoding="utf-8", newline="") as f:
+        chunk = []
+        for record in csv.DictReader(f):
+            chunk.append(record)
+            if len(chunk) >= chunk_rows:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def _read_parquet(path: str, chunk_rows: int) -> Iterator[List[Dict[str, Any]]]:
+    import pyarrow.parquet as pq
+
+    parquet = pq.ParquetFile(path)
+    columns = [c for c in db.EXPORT_COLUMNS["meal_logs"] if c in parquet.schema_arrow.names]
+    for batch in parquet.iter_batches(batch_size=chunk_rows, columns=columns):
+        yield batch.to_pylist()
+
+
+def _to_row(record: Dict[str, Any], user_id: Optional[str]) -> tuple:
+    """
+    取り込む1行を import_meal_logs_bulk の列順にする（ts・meal_type・name・kcal は必須、date は ts から補う）
+
+    seq はファイルの seq 列を使う。seq 列がない場合と user_id を指定した場合（複数ユーザーの記録が
+    1人にまとまる）は None にし、取り込み時にファイル内の並び順で番号を付ける。
+    """
+    ts = str(record["ts"])
+    seq = record.get("seq")
+    return (
+        user_id or record.get("user_id") or ct.DEFAULT_USER_ID,
+        ts,
+        record.get("date") or ts[:10],
+        str(record["meal_type"]),
+        str(record["name"]),
+        float(record["kcal"]),
+        None if user_id or seq is None or seq == "" else int(seq),
+    )
+
+
+def import_meal_logs(db_path: str, path: str, user_id: Optional[str] = None,
+                     chunk_rows: int = ct.MEAL_IO_CHUNK_ROWS) -> Dict[str, int]:
+    """
+    Parquet / CSV の食事記録を取り込む
+
+    user_id を指定すると、ファイルの user_id 列の代わりにそのユーザーの記録として取り込む。
+    取り込み済みの記録は追加しないため、同じファイルを何度取り込んでも結果は変わらない。
+    不正な行は最初の MEAL_IO_LOGGED_BAD_ROWS 件だけ内容をログに出し、以降は件数だけ数える。
+    Returns: {"read": 読んだ行数, "inserted": 追加した行数, "skipped": 不正な行数}
+    """
+    db.init_db(db_path)
+    reader = _read_parquet if _is_parquet(path) else _read_csv
+    counts = {"read": 0, "inserted": 0, "skipped": 0}
+
+    def row_chunks() -> Iterator[List[tuple]]:
+        for records in reader(path, chunk_rows):
+            rows = []
+            for record in records:
+                try:
+                    rows.append(_to_row(record, user_id))
+                except (KeyError, TypeError, ValueError) as e:
+                    counts["skipped"] += 1
+                    if counts["skipped"] <= ct.MEAL_IO_LOGGED_BAD_ROWS:
+                        logger.warning(f"不正な行をスキップ: {record} ({type(e).__name__}: {e})")
+                    if counts["skipped"] == ct.MEAL_IO_LOGGED_BAD_ROWS:
+                        logger.warning("以降の不正な行は件数だけ数えます")
+            counts["read"] += len(records)
+            yield rows
+        logger.info(f"読み込み完了 - 読込 {counts['read']}件 / 不正 {counts['skipped']}件")
+
+    for inserted in db.import_meal_logs_bulk(db_path, row_chunks(), chunk_rows):
+        counts["inserted"] += inserted
+        logger.info(f"取り込み中 - 追加 {counts['inserted']}件")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NutriBuddy 食事記録の書き出し・取り込み（Parquet / CSV）")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("path", help="ファイル（拡張子 .parquet/.pq は Parquet、それ以外は CSV）")
+    parser.add_argument("--db", default="", help="SQLiteのパス（省略時は SQLITE_PATH、DB_SHARDING=true なら --user のDB）")
+    parser.add_argument("--user", default=None, help="対象のユーザーID（書き出し: 絞り込み / 取り込み: 全行をこのユーザーとして追加）")
+    parser.add_argument("--table", default="meal_logs", choices=list(db.EXPORT_COLUMNS), help="書き出すテーブル")
+    parser.add_argument("--chunk-rows", type=int, default=ct.MEAL_IO_CHUNK_ROWS, help="1回に読み書きする行数")
+    args = parser.parse_args()
+
+    from log_config import setup_logging
+    from settings import load_env
+
+    setup_logging()
+    db_path = args.db
+    if not db_path:
+        env = load_env()
+        if env["DB_SHARDING"] and not args.user:
+            parser.error("DB_SHARDING=true のときは --user か --db を指定してください")
+        db_path = db.user_db_path(env["SQLITE_PATH"], args.user or ct.DEFAULT_USER_ID, env["DB_SHARDING"])
+
+    started = time.monotonic()
+    if args.command == "export":
+        db.init_db(db_path)
+        total = export_table(db_path, args.path, args.table, args.user, args.chunk_rows)
+        print(f"[meal_io] {args.table} → {args.path}: {total}行, {time.monotonic() - started:.1f}s", file=sys.stderr)
+    else:
+        counts = import_meal_logs(db_path, args.path, args.user, args.chunk_rows)
+        print(f"[meal_io] {args.path} → {db_path}: 読込 {counts['read']}行 / 追加 {counts['inserted']}行 / "
+              f"重複 {counts['read'] - counts['inserted'] - counts['skipped']}行 / 不正 {counts['skipped']}行, "
+              f"{time.monotonic() - started:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+# metrics.py
+import bisect
+import functools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(v)}"' for name, v in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """単調増加カウンタ"""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, value in sorted(self.samples().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram(_Metric):
+    """累積バケット付きヒストグラム（単位は秒）"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [バケットごとの件数..., +Inf件数, 合計, 件数]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = [0.0] * (len(self.buckets) + 3)
+                self._values[key] = state
+            state[idx] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        for key, state in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                le = _format_labels(self.labelnames, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            cumulative += state[len(self.buckets)]
+            inf = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{inf} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {state[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # Streamlit の再実行でモジュールが再評価されても同じ系列を使い続ける
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+# ---- アプリケーションのメトリクス定義 ----
+RAKUTEN_REQUESTS = counter(
+    "nutribuddy_rakuten_requests_total", "楽天APIリクエスト数", ("endpoint", "status"))
+RAKUTEN_RETRIES = counter(
+    "nutribuddy_rakuten_retries_total", "楽天APIリトライ数", ("endpoint",))
+RAKUTEN_SLEEP_SECONDS = counter(
+    "nutribuddy_rakuten_sleep_seconds_total", "楽天APIの待機時間の合計（秒）", ("reason",))
+RAKUTEN_LATENCY = histogram(
+    "nutribuddy_rakuten_request_seconds", "楽天APIの応答時間（秒）", ("endpoint",))
+OPENAI_REQUESTS = counter(
+    "nutribuddy_openai_requests_total", "OpenAI API呼び出し数", ("purpose", "status"))
+OPENAI_TOKENS = counter(
+    "nutribuddy_openai_tokens_total", "OpenAI APIのトークン使用量", ("purpose", "kind"))
+OPENAI_LATENCY = histogram(
+    "nutribuddy_openai_request_seconds", "OpenAI APIの応答時間（秒）", ("purpose",))
+CACHE_LOOKUPS = counter(
+    "nutribuddy_cache_lookups_total", "キャッシュ参照数", ("cache",))
+CACHE_MISSES = counter(
+    "nutribuddy_cache_misses_total", "キャッシュミス数", ("cache",))
+DB_QUERY_SECONDS = histogram(
+    "nutribuddy_db_query_seconds", "SQLiteクエリの処理時間（秒）", ("op",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0))
+SINGLEFLIGHT_CALLS = counter(
+    "nutribuddy_singleflight_calls_total", "上流呼び出しの実行/集約数", ("group", "result"))
+UPSTREAM_RETRIES = counter(
+    "nutribuddy_upstream_retries_total", "上流APIのリトライ数", ("upstream",))
+UPSTREAM_REJECTED = counter(
+    "nutribuddy_upstream_rejected_total", "回路遮断・リトライ予算超過で打ち切った呼び出し数", ("upstream", "reason"))
+CIRCUIT_TRANSITIONS = counter(
+    "nutribuddy_circuit_transitions_total", "回路遮断器の状態遷移数", ("upstream", "state"))
+JOBS_ENQUEUED = counter(
+    "nutribuddy_jobs_enqueued_total", "ジョブの投入数（new: 新規 / dedup: 既存ジョブを再利用）", ("kind", "result"))
+JOBS_FINISHED = counter(
+    "nutribuddy_jobs_finished_total", "ジョブの実行結果数（done / retry / failed）", ("kind", "status"))
+JOB_SECONDS = histogram(
+    "nutribuddy_job_seconds", "ジョブ1回の実行時間（秒）", ("kind",))
+WEATHER_BATCH_CELLS = histogram(
+    "nutribuddy_weather_batch_cells", "天気の一括取得1回あたりの格子点数", (),
+    buckets=(1, 2, 5, 10, 20, 50))
+HEDGE_REQUESTS = counter(
+    "nutribuddy_hedge_requests_total", "ヘッジ（2本目のリクエスト）の発行・勝敗・予算超過数", ("purpose", "result"))
+ESTIMATE_ROUTES = counter(
+    "nutribuddy_estimate_routes_total", "カロリー推定の振り分け先（local: 食品成分表 / llm: OpenAI）", ("route",))
+
+
+def rakuten_endpoint(url: str) -> str:
+    """楽天APIのURLからエンドポイント名を取り出す（例: CategoryRanking）"""
+    parts = [p for p in url.split("/") if p]
+    return parts[-2] if len(parts) >= 2 else url
+
+
+def record_openai_usage(purpose: str, resp) -> None:
+    """LangChainのレスポンスからトークン使用量を記録"""
+    usage = getattr(resp, "usage_metadata", None) or {}
+    for kind, key in (("prompt", "input_tokens"), ("completion", "output_tokens")):
+        if usage.get(key):
+            OPENAI_TOKENS.inc(usage[key], purpose=purpose, kind=kind)
+
+
+def count_cache(cache: str) -> Callable:
+    """
+    キャッシュ関数の参照数を数えるデコレータ
+
+    st.cache_data の外側に付け、ミスは関数本体で CACHE_MISSES を加算する。
+    """
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            CACHE_LOOKUPS.inc(cache=cache)
+            return fn(*args, **kwargs)
+        if hasattr(fn, "clear"):
+            wrapper.clear = fn.clear
+        return wrapper
+    return decorator
+
+
+def cache_hit_ratios() -> Dict[str, float]:
+    """キャッシュごとのヒット率（開発者モード表示用）"""
+    misses = CACHE_MISSES.samples()
+    ratios = {}
+    for (cache,), lookups in CACHE_LOOKUPS.samples().items():
+        if lookups > 0:
+            ratios[cache] = max(0.0, 1.0 - misses.get((cache,), 0.0) / lookups)
+    return ratios
+
+
+# ---- エクスポート ----
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # スクレイプごとのアクセスログは出さない
+        pass
+
+
+_server = None
+_textfile_thread = None
+_exporter_lock = threading.Lock()
+
+
+def start_http_server(port: int, addr: str = "0.0.0.0") -> bool:
+    """/metrics を返すHTTPサーバーをデーモンスレッドで起動（プロセス内で1回のみ）"""
+    global _server
+    with _exporter_lock:
+        if _server is not None:
+            return False
+        try:
+            _server = ThreadingHTTPServer((addr, port), _MetricsHandler)
+        except OSError as e:
+            # 別のStreamlitプロセスが既にポートを使っている場合など
+            logger.warning(f"メトリクスサーバー起動失敗 - ポート: {port}, エラー: {str(e)}")
+            return False
+        threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"メトリクスサーバー起動 - http://{addr}:{port}/metrics")
+    return True
+
+
+def write_textfile(path: str) -> None:
+    """メトリクスをファイルへ書き出す（一時ファイル経由で置き換え）"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(REGISTRY.render())
+    os.replace(tmp_path, path)
+
+
+def start_textfile_writer(path: str, interval_sec: float = 15.0) -> bool:
+    """一定間隔でメトリクスファイルを書き出すスレッドを起動（プロセス内で1回のみ）"""
+    global _textfile_thread
+    with _exporter_lock:
+        if _textfile_thread is not None:
+            return False
+
+        def loop():
+            while True:
+                try:
+                    write_textfile(path)
+                except Exception as e:
+                    logger.warning(f"メトリクスファイル書き出しエラー: {str(e)}")
+                time.sleep(interval_sec)
+
+        _textfile_thread = threading.Thread(target=loop, name="metrics-textfile", daemon=True)
+        _textfile_thread.start()
+    logger.info(f"メトリクスファイル出力開始 - {path}（{interval_sec}秒間隔）")
+    return True
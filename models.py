@@ -0,0 +1,184 @@
+# models.py
+import re
+import sys
+from dataclasses import dataclass, fields, replace
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+# ジョブキューで受け渡すレシピの形式の版（形式を変えたら上げる。古い形式の結果を使い回さないため）
+RECIPE_SCHEMA_VERSION = 2
+
+_NUMBER_RE = re.compile(r"\d+")
+_HOURS_RE = re.compile(r"(\d+)\s*時間")
+_MINUTES_RE = re.compile(r"(\d+)\s*分")
+
+
+def _intern(value: Any) -> str:
+    # 楽天のカテゴリIDや費用・調理時間の表記は種類が少ないため、同じ文字列を1つに共有する
+    return sys.intern(str(value)) if value else ""
+
+
+def parse_cost_yen(cost: str) -> Optional[int]:
+    """楽天レシピの費用目安（"300円前後" "100円以下" など）を円に（"指定なし" は None）"""
+    match = _NUMBER_RE.search(cost or "")
+    return int(match.group(0)) if match else None
+
+
+def parse_minutes(indication: str) -> Optional[int]:
+    """楽天レシピの調理時間目安（"約15分" "約1時間" "1時間以上" など）を分に（"指定なし" は None）"""
+    hours = _HOURS_RE.search(indication or "")
+    minutes = _MINUTES_RE.search(indication or "")
+    if hours is None and minutes is None:
+        return None
+    return (int(hours.group(1)) * 60 if hours else 0) + (int(minutes.group(1)) if minutes else 0)
+
+
+def _parse_recipe_id(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# ---- レシピ ----
+@dataclass(frozen=True, slots=True)
+class Recipe:
+    """
+    楽天レシピ（カテゴリ別ランキング）の1件
+
+    from_rakuten() で一度だけ作り、取得からキャッシュ・組み合わせ検索・画面表示まで同じ
+    インスタンスを使う（段階ごとに辞書へ詰め直さない）。数値は作成時に解釈し、
+    カテゴリIDなどの繰り返し現れる文字列は intern する。
+    """
+    recipe_id: Optional[int]
+    name: str
+    url: str
+    image_url: str
+    materials: Tuple[str, ...]
+    cost: str                  # 費用目安の表記（"300円前後"）
+    indication: str            # 調理時間目安の表記（"約15分"）
+    cost_yen: Optional[int]
+    minutes: Optional[int]
+    category_id: str
+    genre: str
+    keyword: Optional[str]
+    dish_type: str             # "main" / "side" / "soup"（classify_recipe_type）
+
+    @classmethod
+    def from_rakuten(cls, payload: Dict[str, Any], category_id: str, genre: str = "",
+                     keyword: Optional[str] = None, default_name: str = "") -> "Recipe":
+        """楽天レシピAPIの result の1件から作る"""
+        from recipes import classify_recipe_type
+
+        name = payload.get("recipeTitle") or default_name
+        materials = tuple(sys.intern(m) for m in payload.get("recipeMaterial") or [])
+        cost = _intern(payload.get("recipeCost"))
+        indication = _intern(payload.get("recipeIndication"))
+        return cls(
+            recipe_id=_parse_recipe_id(payload.get("recipeId")),
+            name=name,
+            url=payload.get("recipeUrl") or "",
+            image_url=payload.get("foodImageUrl") or "",
+            materials=materials,
+            cost=cost,
+            indication=indication,
+            cost_yen=parse_cost_yen(cost),
+            minutes=parse_minutes(indication),
+            category_id=_intern(category_id),
+            genre=_intern(genre),
+            keyword=_intern(keyword) or None,
+            dish_type=classify_recipe_type(name, materials),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """ジョブキュー（JSON）で受け渡すための辞書"""
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Recipe":
+        """to_dict() の辞書から復元する"""
+        return cls(**{
+            **data,
+            "materials": tuple(sys.intern(m) for m in data["materials"]),
+            "cost": _intern(data["cost"]),
+            "indication": _intern(data["indication"]),
+            "category_id": _intern(data["category_id"]),
+            "genre": _intern(data["genre"]),
+            "keyword": _intern(data["keyword"]) or None,
+            "dish_type": sys.intern(data["dish_type"]),
+        })
+
+
+# ---- 推定カロリー/PFC ----
+@dataclass(frozen=True, slots=True)
+class NutritionEstimate:
+    """
+    レシピ1人前の推定カロリー/PFC
+
+    source: "llm" / "local"（食品成分表） / "default"（安全値）
+    status: "ok"（検証済み） / "invalid" / "error" / "deadline"（"ok" 以外はキャッシュしない）
+    coverage: 食品成分表で照合できた材料の割合（source が "local" のときだけ）
+    route: NUTRITION_ESTIMATOR=router で振り分けた先（"local" / "llm"、振り分けていなければ ""）
+    confidence: 振り分けに使った食品成分表の推定の信頼度（0〜1）
+    """
+    kcal: float
+    protein_g: float
+    fat_g: float
+    carb_g: float
+    source: str
+    status: str
+    coverage: Optional[float] = None
+    route: str = ""
+    confidence: Optional[float] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status == "ok"
+
+    def with_status(self, status: str) -> "NutritionEstimate":
+        return replace(self, status=status)
+
+    def with_route(self, route: str, confidence: float) -> "NutritionEstimate":
+        return replace(self, route=route, confidence=confidence)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """ジョブキュー（JSON）で受け渡すための辞書"""
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "NutritionEstimate":
+        """to_dict() の辞書から復元する"""
+        return cls(
+            kcal=float(data["kcal"]),
+            protein_g=float(data["protein_g"]),
+            fat_g=float(data["fat_g"]),
+            carb_g=float(data["carb_g"]),
+            source=sys.intern(data.get("source") or ""),
+            status=sys.intern(data.get("status") or ""),
+            coverage=data.get("coverage"),
+            route=sys.intern(data.get("route") or ""),
+            confidence=data.get("confidence"),
+        )
+
+
+# ---- 主食+副菜などの組み合わせ ----
+@dataclass(frozen=True, slots=True)
+class RecipeCombination:
+    """組み合わせ（recipes と estimates は同じ順序）"""
+    kind: str                  # "main+side" / "main+side+soup" / "single"
+    recipes: Tuple[Recipe, ...]
+    estimates: Tuple[NutritionEstimate, ...]
+    total_kcal: float
+    kcal_balance: float        # 目標カロリーとの差（少ない方が良い）
+
+    @classmethod
+    def of(cls, kind: str, items: Iterable[Tuple[Recipe, NutritionEstimate]], target_kcal: int) -> "RecipeCombination":
+        recipes, estimates = zip(*items)
+        total_kcal = sum(e.kcal for e in estimates)
+        return cls(kind, recipes, estimates, total_kcal, abs(target_kcal - total_kcal))
+
+    @property
+    def name(self) -> str:
+        return " + ".join(r.name for r in self.recipes)
+
+    def items(self) -> Iterable[Tuple[Recipe, NutritionEstimate]]:
+        return zip(self.recipes, self.estimates)
@@ -0,0 +1,514 @@
+# nutrition.py
+import os
+import re
+import json
+import math
+import asyncio
+import hashlib
+import logging
+import functools
+import contextvars
+from datetime import timedelta
+from typing import List, Dict, Any, Optional, Tuple
+
+import constants as ct
+import deadline as dl
+import estimate_router as er
+import hedge as hg
+import jobs as jq
+import singleflight as sf
+import tracing as tr
+import metrics as mt
+import resilience as rs
+from food_table import estimate_recipe_kcal_pfc_local
+from ingredients import canonicalize_ingredients, ingredient_display_names, ingredients_cache_key
+from lazy import cache_data as lazy_cache_data
+from models import NutritionEstimate, Recipe
+from settings import get_settings
+
+logger = logging.getLogger('NutriBuddy')
+
+# 応答から JSON オブジェクト部分を取り出す（コードブロックで囲まれた応答にも対応）
+_JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+# ---- カロリー/PFC推定（推定方式の切替） ----
+def estimate_recipe_kcal_pfc(
+    recipe_name: str,
+    ingredients: List[str],
+    method: str,
+    difficulty: str,
+    budget_jpy: int,
+    season: str,
+    feel: str
+) -> NutritionEstimate:
+    """
+    設定された推定方式（NUTRITION_ESTIMATOR）でレシピの推定カロリー/PFCを取得
+
+    "local" の場合は食品成分表で推定し、材料を1つも照合できないときだけOpenAIを使う。
+    "router" の場合は食品成分表の推定の信頼度が ROUTER_CONFIDENCE_THRESHOLD 以上ならそれを使い、
+    未満のときだけOpenAIを使う（どちらも結果の route と confidence に記録する）。
+    "llm" の場合はOpenAIで推定し、失敗時は食品成分表の推定にフォールバックする。
+    """
+    env = get_settings()
+    if env["NUTRITION_ESTIMATOR"] == "router":
+        local, confidence = er.route_local(recipe_name, ingredients, env["ROUTER_CONFIDENCE_THRESHOLD"])
+        if local is not None:
+            return local
+        result = estimate_recipe_kcal_pfc_openai(
+            recipe_name, ingredients, method, difficulty, budget_jpy, season, feel
+        )
+        return result.with_route("llm", confidence)
+    if env["NUTRITION_ESTIMATOR"] == "local":
+        result = estimate_recipe_kcal_pfc_local(recipe_name, ingredients)
+        if result is not None:
+            return result
+        logger.info(f"食品成分表で推定できないためOpenAIを使用 - レシピ: {recipe_name}")
+    return estimate_recipe_kcal_pfc_openai(
+        recipe_name, ingredients, method, difficulty, budget_jpy, season, feel
+    )
+
+def _fallback_estimate(status: str = "error") -> NutritionEstimate:
+    """どの推定方式も使えないときの安全値"""
+    kcal = ct.FALLBACK_KCAL
+    return NutritionEstimate(
+        kcal=kcal,
+        protein_g=kcal*ct.DEFAULT_PFC_RATIO["P"]/4,
+        fat_g=kcal*ct.DEFAULT_PFC_RATIO["F"]/9,
+        carb_g=kcal*ct.DEFAULT_PFC_RATIO["C"]/4,
+        source="default",
+        status=status,
+    )
+
+# ---- OpenAI でレシピの推定カロリー/PFC ----
+@tr.traced("estimation")
+def estimate_recipe_kcal_pfc_openai(
+    recipe_name: str,
+    ingredients: List[str],
+    method: str,
+    difficulty: str,
+    budget_jpy: int,
+    season: str,
+    feel: str
+) -> NutritionEstimate:
+    """OpenAIを使ってレシピの推定カロリー/PFCを取得（同一条件の同時リクエストは集約）"""
+    # 材料は canonical ID で比較する（表記ゆれや並び順の違いでも集約されるように）
+    key = sf.make_key(recipe_name, canonicalize_ingredients(ingredients), method, difficulty, budget_jpy, season, feel)
+    return sf.get_group("openai").do(
+        key, _hedged_estimate_recipe_kcal_pfc_openai,
+        recipe_name, ingredients, method, difficulty, budget_jpy, season, feel
+    )
+
+def _hedged_estimate_recipe_kcal_pfc_openai(
+    recipe_name: str,
+    ingredients: List[str],
+    method: str,
+    difficulty: str,
+    budget_jpy: int,
+    season: str,
+    feel: str
+) -> NutritionEstimate:
+    """
+    HEDGE_MODE に応じてヘッジ付きで推定する（single-flight のリーダーだけが呼ぶ）
+
+    応答が直近の p90 より遅ければ、"duplicate" では同じ推定をもう1本、"local" では
+    食品成分表の推定を並行して始め、先に検証済み（status "ok"）になった結果を使う。
+    """
+    estimate = functools.partial(
+        _estimate_recipe_kcal_pfc_openai,
+        recipe_name, ingredients, method, difficulty, budget_jpy, season, feel
+    )
+    mode = get_settings()["HEDGE_MODE"]
+    if mode == "off":
+        return estimate()
+    if mode == "local":
+        hedge = functools.partial(estimate_recipe_kcal_pfc_local, recipe_name, ingredients)
+    else:
+        hedge = estimate
+    return hg.run("estimate", estimate, hedge, accept=_is_verified_estimate)
+
+def _is_verified_estimate(result: Optional[NutritionEstimate]) -> bool:
+    return result is not None and result.ok
+
+def _estimate_recipe_kcal_pfc_openai(
+    recipe_name: str,
+    ingredients: List[str],
+    method: str,
+    difficulty: str,
+    budget_jpy: int,
+    season: str,
+    feel: str
+) -> NutritionEstimate:
+    """
+    OpenAIによるカロリー/PFC推定の本体
+
+    構造化出力（JSON Schema）で応答を受け取り、検証に通らなかった場合はこのレシピだけを
+    ESTIMATE_MAX_RETRIES 回まで再リクエストする。結果の "status" は
+    "ok"（検証済み）/ "invalid"（検証に通らずフォールバック）/ "error"（API呼び出し失敗でフォールバック）/
+    "deadline"（締め切りに間に合わずフォールバック）。
+    """
+    logger.info(f"カロリー推定開始 - レシピ: {recipe_name}")
+    logger.debug(f"材料数: {len(ingredients)}, 難易度: {difficulty}, 予算: {budget_jpy}円, 季節: {season}, 気温: {feel}")
+    
+    status = "error"
+    try:
+        # LangChain は import に時間がかかるため初回利用時に読み込む
+        from langchain_openai import ChatOpenAI
+        from langchain.schema import SystemMessage, HumanMessage
+        
+        # 環境変数からOpenAI APIキーを取得
+        env_data = get_settings()
+        os.environ["OPENAI_API_KEY"] = env_data["OPENAI_API_KEY"]
+        
+        llm = ChatOpenAI(
+            model=ct.OPENAI_MODEL,
+            temperature=0.3,
+            timeout=ct.OPENAI_TIMEOUT,
+            max_retries=0,  # リトライは resilience の共通ポリシーで行う
+        ).bind(response_format=ct.RECIPE_KCAL_RESPONSE_FORMAT)
+        sys = SystemMessage(content=ct.SYSTEM_PROMPT)
+        prompt = ct.RECIPE_KCAL_PROMPT.format(
+            recipe_name=recipe_name,
+            ingredients=", ".join(ingredient_display_names(ingredients)[:10]),
+            method=method or "不明",
+            difficulty=difficulty,
+            budget_jpy=budget_jpy,
+            season=season,
+            feel=feel
+        )
+        
+        for attempt in range(ct.ESTIMATE_MAX_RETRIES + 1):
+            if attempt > 0:
+                logger.info(f"カロリー推定を再リクエスト {attempt}/{ct.ESTIMATE_MAX_RETRIES} - レシピ: {recipe_name}")
+                user = HumanMessage(content=prompt + "\n" + ct.RECIPE_KCAL_RETRY_NOTE)
+            else:
+                user = HumanMessage(content=prompt)
+            
+            logger.info("OpenAI APIへリクエスト送信")
+            status = "error"
+            resp = _invoke_llm(llm, [sys, user], "estimate")
+            mt.record_openai_usage("estimate", resp)
+            logger.info("OpenAI APIからレスポンス受信")
+            logger.debug(f"レスポンス内容: {resp.content}")
+            
+            values, reason = parse_nutrition_estimate(resp.content)
+            if values is not None:
+                mt.OPENAI_REQUESTS.inc(purpose="estimate", status="ok")
+                result = NutritionEstimate(**values, source="llm", status="ok")
+                logger.info(
+                    f"カロリー推定完了 - カロリー: {result.kcal:.1f}kcal, P: {result.protein_g:.1f}g, "
+                    f"F: {result.fat_g:.1f}g, C: {result.carb_g:.1f}g"
+                )
+                return result
+            
+            status = "invalid"
+            mt.OPENAI_REQUESTS.inc(purpose="estimate", status="invalid")
+            logger.warning(f"AIレスポンスの検証失敗 - レシピ: {recipe_name}, 理由: {reason}")
+            
+    except dl.DeadlineExceeded as e:
+        status = "deadline"
+        logger.warning(f"カロリー推定を省略: {str(e)}")
+    except Exception as e:
+        logger.error(f"カロリー推定エラー: {str(e)}")
+        logger.debug("エラー詳細", exc_info=True)
+    
+    # フォールバック（食品成分表で推定、材料を照合できなければ安全値）
+    result = estimate_recipe_kcal_pfc_local(recipe_name, ingredients)
+    if result is None:
+        result = _fallback_estimate(status)
+    else:
+        result = result.with_status(status)
+    logger.info(f"フォールバック値を使用 - カロリー: {result.kcal:.1f}kcal ({result.source}, {status})")
+    return result
+
+def _invoke_llm(llm, messages: List[Any], purpose: str):
+    """OpenAI呼び出し（リトライ・回路遮断は resilience の共通ポリシー）"""
+    def invoke():
+        # 締め切りまでの残り時間に収まるようにタイムアウトを縮める
+        timeout = dl.timeout_for(ct.OPENAI_TIMEOUT, "OpenAI")
+        try:
+            with mt.OPENAI_LATENCY.time(purpose=purpose):
+                return llm.invoke(messages, timeout=timeout)
+        except Exception:
+            mt.OPENAI_REQUESTS.inc(purpose=purpose, status="error")
+            raise
+    return rs.call("openai", invoke, retryable=_is_retryable_openai_error)
+
+def _is_retryable_openai_error(e: BaseException) -> bool:
+    import openai
+    # APITimeoutError は APIConnectionError のサブクラス
+    return isinstance(e, openai.APIConnectionError) or rs.is_transient_error(e)
+
+def parse_nutrition_estimate(content: str) -> Tuple[Optional[Dict[str, float]], str]:
+    """
+    LLMの応答（JSON）をパースしてスキーマ検証する
+
+    Returns:
+        (推定値, "") または検証に通らなかった場合は (None, 理由)
+    """
+    # 構造化出力では応答全体がJSON。コードブロックで囲まれていても同じ正規表現で取り出す
+    match = _JSON_OBJECT_RE.search(content or "")
+    if match is None:
+        return None, "JSONが見つからない"
+    try:
+        obj = json.loads(match.group(0))
+    except json.JSONDecodeError as e:
+        return None, f"JSON解析失敗: {e}"
+    if not isinstance(obj, dict):
+        return None, "JSONがオブジェクトではない"
+    
+    result: Dict[str, float] = {}
+    for field in ct.RECIPE_KCAL_FIELDS:
+        value = obj.get(field)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value) or value < 0:
+            return None, f"{field} が不正: {value!r}"
+        result[field] = float(value)
+    
+    kcal = result["kcal"]
+    low, high = ct.ESTIMATE_KCAL_RANGE
+    if not low <= kcal <= high:
+        return None, f"kcal が範囲外: {kcal}"
+    # エネルギー換算係数（Atwater: P・C 4kcal/g, F 9kcal/g）との整合性
+    pfc_kcal = 4 * result["protein_g"] + 9 * result["fat_g"] + 4 * result["carb_g"]
+    if abs(kcal - pfc_kcal) > kcal * ct.ESTIMATE_PFC_KCAL_TOLERANCE:
+        return None, f"kcal とPFCが不整合: {kcal} vs 4P+9F+4C={pfc_kcal:.0f}"
+    return result, ""
+
+# ---- 応援メッセージ ----
+@tr.traced("cheer")
+def generate_cheer(summary: str) -> str:
+    """応援メッセージを生成（同一サマリーの同時リクエストは集約）"""
+    # 省略可能な処理のため、締め切りが近ければ生成せずに定型文を返す
+    if not dl.has_time_for(ct.DEADLINE_OPTIONAL_RESERVE_SEC):
+        logger.info("締め切りが近いため応援メッセージ生成を省略")
+        dl.note_skipped("応援メッセージ")
+        return ct.CHEER_FALLBACK_MESSAGE
+    # ジョブキューが有効ならワーカーで生成する（同じサマリーの結果は他のユーザーとも共有）
+    return jq.run("cheer", {"summary": summary}, inline=lambda: generate_shared_cheer(summary))
+
+def generate_shared_cheer(summary: str) -> str:
+    """応援メッセージを生成（同一サマリーの同時リクエストは集約、ワーカーからも呼ばれる）"""
+    return sf.get_group("openai").do(sf.make_key("cheer", summary), _hedged_generate_cheer, summary)
+
+def _hedged_generate_cheer(summary: str) -> str:
+    """HEDGE_MODE が有効なら、応答が遅いときに同じリクエストをもう1本送る"""
+    generate = functools.partial(_generate_cheer, summary)
+    if get_settings()["HEDGE_MODE"] == "off":
+        return generate()
+    return hg.run("cheer", generate, accept=lambda message: message != ct.CHEER_FALLBACK_MESSAGE)
+
+def _generate_cheer(summary: str) -> str:
+    logger.info("応援メッセージ生成開始")
+    logger.debug(f"サマリー内容: {summary[:100]}..." if len(summary) > 100 else f"サマリー内容: {summary}")
+    
+    try:
+        from langchain_openai import ChatOpenAI
+        from langchain.schema import SystemMessage, HumanMessage
+        
+        # 環境変数からOpenAI APIキーを取得
+        env_data = get_settings()
+        os.environ["OPENAI_API_KEY"] = env_data["OPENAI_API_KEY"]
+        
+        llm = ChatOpenAI(
+            model=ct.OPENAI_MODEL, temperature=0.7, timeout=ct.OPENAI_TIMEOUT, max_retries=0
+        )
+        sys = SystemMessage(content=ct.SYSTEM_PROMPT)
+        user = HumanMessage(content=ct.CHEER_PROMPT.format(summary=summary))
+        
+        logger.info("OpenAI APIへ応援メッセージリクエスト送信")
+        resp = _invoke_llm(llm, [sys, user], "cheer")
+        mt.OPENAI_REQUESTS.inc(purpose="cheer", status="ok")
+        mt.record_openai_usage("cheer", resp)
+        logger.info("応援メッセージ生成完了")
+        
+        message = resp.content.strip()
+        logger.debug(f"生成メッセージ: {message[:50]}..." if len(message) > 50 else f"生成メッセージ: {message}")
+        
+        return message
+        
+    except Exception as e:
+        logger.error(f"応援メッセージ生成エラー: {str(e)}")
+        fallback_message = ct.CHEER_FALLBACK_MESSAGE
+        logger.info(f"フォールバックメッセージを使用: {fallback_message}")
+        return fallback_message
+
+# ---- 非同期版のカロリー推定関数 ----
+async def estimate_recipe_kcal_pfc_openai_async(
+    openai_api_key: str,
+    recipe_name: str,
+    ingredients: List[str],
+    method: str,
+    difficulty: str,
+    budget_jpy: int,
+    season: str,
+    feel: str
+) -> NutritionEstimate:
+    """非同期版のカロリー推定関数"""
+    # 基本的には同期版と同じロジックだが、非同期対応
+    # APIキーは同期版が環境変数から読み込むため、ここでは転送しない
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        None, 
+        contextvars.copy_context().run,
+        estimate_recipe_kcal_pfc_openai,
+        recipe_name, ingredients, method, 
+        difficulty, budget_jpy, season, feel
+    )
+
+# ---- Streamlit対応のバッチ処理機能 ----
+def batch_estimate_recipes_sync(recipes: List[Recipe], **kwargs) -> List[NutritionEstimate]:
+    """Streamlit環境でのバッチ処理（ThreadPoolExecutorを使用）"""
+    import concurrent.futures
+    import streamlit as st
+    
+    # 結果は recipes と同じ順序で返す（完了順ではなく）
+    results: List[Optional[NutritionEstimate]] = [None] * len(recipes)
+    total = len(recipes)
+    
+    # プログレスバーを表示
+    progress_bar = st.progress(0)
+    status_text = st.empty()
+    
+    if jq.is_available():
+        # 先に全件をジョブとして投入し、ワーカーの同時実行数で並行して推定させる
+        # （各タスクの投入は重複排除で同じジョブになり、その結果を待つ）
+        queue = jq.get_queue()
+        for recipe in recipes:
+            queue.enqueue("estimate", _estimate_cache_args(
+                recipe, kwargs['difficulty'], kwargs['budget_jpy'], kwargs['season'], kwargs['feel']
+            ))
+    
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=3)
+    try:
+        # 全てのタスクを投入（計測用・締め切りのコンテキストをワーカースレッドへ引き継ぐ）
+        future_to_recipe = {
+            executor.submit(
+                contextvars.copy_context().run,
+                cached_estimate_recipe,
+                recipe,
+                kwargs['difficulty'],
+                kwargs['budget_jpy'],
+                kwargs['season'],
+                kwargs['feel']
+            ): index for index, recipe in enumerate(recipes)
+        }
+        
+        # 完了したタスクから順次処理（検証に通らなかったレシピの再リクエストは各タスク内で行う）
+        try:
+            completed = concurrent.futures.as_completed(future_to_recipe, timeout=dl.remaining())
+            for i, future in enumerate(completed):
+                index = future_to_recipe[future]
+                try:
+                    results[index] = future.result()
+                    
+                    # プログレス更新
+                    progress = (i + 1) / total
+                    progress_bar.progress(progress)
+                    status_text.text(f'処理中... {i + 1}/{total}')
+                    
+                except Exception as e:
+                    st.error(f"レシピ処理中にエラー: {str(e)}")
+                    # エラー時はデフォルト値を使用
+                    results[index] = _fallback_estimate()
+        except concurrent.futures.TimeoutError:
+            logger.warning("締め切りのため未完了のカロリー推定を食品成分表の値で補完")
+            dl.note_skipped("カロリー推定")
+    finally:
+        # 締め切りで打ち切った場合は未完了のタスクを待たない
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    # 未完了分は食品成分表（なければ安全値）で補完して、揃った分だけで返す
+    for index, recipe in enumerate(recipes):
+        if results[index] is None:
+            result = estimate_recipe_kcal_pfc_local(recipe.name, recipe.materials)
+            results[index] = _fallback_estimate("deadline") if result is None else result.with_status("deadline")
+    
+    # プログレスバーとステータステキストをクリア
+    progress_bar.empty()
+    status_text.empty()
+    
+    return results
+
+class _UncachedEstimate(Exception):
+    """検証済みでない推定結果をキャッシュに残さずに返すための例外"""
+
+    def __init__(self, result: NutritionEstimate):
+        super().__init__(result.status)
+        self.result = result
+
+def cached_estimate_recipe_kcal_pfc(
+    recipe_name: str, 
+    ingredients_str: str,  # ingredients_cache_key() で作った canonical ID のカンマ区切り
+    method: str,
+    difficulty: str,
+    budget_jpy: int,
+    season: str,
+    feel: str
+) -> NutritionEstimate:
+    """キャッシュ対応のカロリー推定（status が "ok" の結果だけをキャッシュする）"""
+    try:
+        return _cached_estimate_recipe_kcal_pfc(
+            recipe_name, ingredients_str, method, difficulty, budget_jpy, season, feel
+        )
+    except _UncachedEstimate as e:
+        # フォールバック値は次回の呼び出しで推定し直す
+        return e.result
+
+@mt.count_cache("estimates")
+@lazy_cache_data(ttl=timedelta(hours=6))
+def _cached_estimate_recipe_kcal_pfc(
+    recipe_name: str, 
+    ingredients_str: str,  # ingredients_cache_key() で作った canonical ID のカンマ区切り
+    method: str,
+    difficulty: str,
+    budget_jpy: int,
+    season: str,
+    feel: str
+) -> NutritionEstimate:
+    """キャッシュ対応のカロリー推定"""
+    mt.CACHE_MISSES.inc(cache="estimates")
+    ingredients = ingredients_str.split(",") if ingredients_str else []
+    # ジョブキューが有効ならワーカーで推定する（引数は worker.py の estimate ジョブと同じ、結果は辞書で返る）
+    payload = {
+        "recipe_name": recipe_name,
+        "ingredients_str": ingredients_str,
+        "method": method,
+        "difficulty": difficulty,
+        "budget_jpy": budget_jpy,
+        "season": season,
+        "feel": feel,
+    }
+    result = jq.run("estimate", payload, inline=lambda: estimate_recipe_kcal_pfc(
+        recipe_name=recipe_name,
+        ingredients=ingredients,
+        method=method,
+        difficulty=difficulty,
+        budget_jpy=budget_jpy,
+        season=season,
+        feel=feel
+    ), decode=NutritionEstimate.from_dict)
+    if not result.ok:
+        raise _UncachedEstimate(result)
+    return result
+
+cached_estimate_recipe_kcal_pfc.clear = _cached_estimate_recipe_kcal_pfc.clear
+
+def cached_estimate_recipe(recipe: Recipe, difficulty: str, budget_jpy: int, season: str, feel: str) -> NutritionEstimate:
+    """楽天レシピの1件からキャッシュ対応のカロリー推定（画面表示とキャッシュの事前取得で同じキーにする）"""
+    return cached_estimate_recipe_kcal_pfc(**_estimate_cache_args(recipe, difficulty, budget_jpy, season, feel))
+
+def estimate_cache_key(recipe: Recipe, difficulty: str, budget_jpy: int, season: str, feel: str) -> str:
+    """cached_estimate_recipe と同じ条件を表す短いキー（提案の共有ストア用）"""
+    args = _estimate_cache_args(recipe, difficulty, budget_jpy, season, feel)
+    return hashlib.blake2b("\x1f".join(map(str, args.values())).encode("utf-8"), digest_size=8).hexdigest()
+
+def _estimate_cache_args(recipe: Recipe, difficulty: str, budget_jpy: int, season: str, feel: str) -> Dict[str, Any]:
+    """cached_estimate_recipe_kcal_pfc の引数（estimate ジョブの引数も同じ）"""
+    return {
+        "recipe_name": recipe.name,
+        "ingredients_str": ingredients_cache_key(recipe.materials),
+        "method": recipe.indication,
+        "difficulty": difficulty,
+        "budget_jpy": budget_jpy,
+        "season": season,
+        "feel": feel,
+    }
@@ -0,0 +1,36 @@
+# pages/1_履歴.py
+import streamlit as st
+import logging
+
+from initialize import initialize_once, resolve_user_id
+import components as cp
+import constants as ct
+import utils as ut
+import tracing as tr
+
+ut.setup_logging()
+logger = logging.getLogger(__name__)
+
+tr.begin_run()
+st.set_page_config(page_title="NutriBuddy - 摂取履歴", page_icon=ct.MEAL_ICONS, layout="wide")
+
+initialize_once()
+env = ut.load_env()
+USER_ID = resolve_user_id()
+DB_PATH = ut.user_db_path(env["SQLITE_PATH"], USER_ID, env["DB_SHARDING"])
+ut.init_db(DB_PATH)
+
+st.title("📈 摂取履歴")
+st.caption("記録した食事の摂取カロリーを、目標カロリーや食事の区分ごとに振り返れます。")
+
+days = st.radio("表示期間", ct.HISTORY_WINDOWS_DAYS, format_func=lambda d: f"{d}日", horizontal=True)
+target_kcal = st.number_input(
+    "1日の目標カロリー (kcal)", min_value=800, max_value=4000,
+    value=int(st.session_state.get("target_kcal", ct.DEFAULT_TARGET_KCAL)), step=50
+)
+logger.info(f"摂取履歴表示 - ユーザー: {USER_ID}, {days}日")
+
+# 集計テーブルから読み、食事を記録するまでは同じ結果をキャッシュから返す
+daily = ut.load_daily_history(DB_PATH, USER_ID, days)
+weekly = ut.load_weekly_history(DB_PATH, USER_ID, -(-days // 7))
+cp.history_charts(daily, weekly, ut.summarize_history(daily, target_kcal), target_kcal)
@@ -0,0 +1,108 @@
+# planner.py
+import logging
+from typing import Any, Dict, List, Optional
+
+import constants as ct
+from gazetteer import resolve_location
+from models import NutritionEstimate, Recipe
+
+logger = logging.getLogger('NutriBuddy')
+
+WEEK_DAYS = 7
+
+
+# ---- 週間献立（Streamlit・上流APIに依存しない部分） ----
+def pick_weekly_recipes(recipes: List[Recipe], days: int = WEEK_DAYS) -> List[Recipe]:
+    """
+    日ごとのレシピを選ぶ
+
+    シンプルに同じ上位候補から日替わりで1品ずつ（本実装では重複回避や多様性ロジックを向上）
+    """
+    if not recipes:
+        return []
+    return [recipes[d % len(recipes)] for d in range(days)]
+
+
+def weekly_day_summary(day_num: int, recipe_name: str, kcal: float) -> str:
+    """応援メッセージ生成用の1日分の要約"""
+    return f"{recipe_name} / 約{int(kcal)}kcal / 日{day_num}"
+
+
+def build_weekly_plan(recipes: List[Recipe], kcal_infos: List[NutritionEstimate],
+                      cheers: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    日ごとのレシピと推定結果から週間献立を組み立てる
+
+    Args:
+        recipes: pick_weekly_recipes() で選んだ日ごとのレシピ
+        kcal_infos: recipes と同じ順序の推定カロリー/PFC
+        cheers: 日ごとの応援メッセージ（省略可）
+
+    Returns:
+        {"days": [...], "total_kcal", "avg_kcal", "pfc_kcal_ratio"}
+    """
+    days = []
+    for i, (recipe, kcal_info) in enumerate(zip(recipes, kcal_infos)):
+        days.append({
+            "day": i + 1,
+            "recipe_id": recipe.recipe_id,
+            "recipe_name": recipe.name,
+            "recipe_url": recipe.url,
+            "kcal": kcal_info.kcal,
+            "protein_g": kcal_info.protein_g,
+            "fat_g": kcal_info.fat_g,
+            "carb_g": kcal_info.carb_g,
+            "source": kcal_info.source,
+            "status": kcal_info.status,
+            "cheer": cheers[i] if cheers else None,
+        })
+
+    total_kcal = sum(d["kcal"] for d in days)
+    # PFCのエネルギー比（Atwater: P・C 4kcal/g, F 9kcal/g）
+    p_kcal = 4 * sum(d["protein_g"] for d in days)
+    f_kcal = 9 * sum(d["fat_g"] for d in days)
+    c_kcal = 4 * sum(d["carb_g"] for d in days)
+    pfc_total = p_kcal + f_kcal + c_kcal
+    pfc_ratio = (
+        {"P": p_kcal / pfc_total, "F": f_kcal / pfc_total, "C": c_kcal / pfc_total}
+        if pfc_total > 0 else None
+    )
+    return {
+        "days": days,
+        "total_kcal": total_kcal,
+        "avg_kcal": total_kcal / len(days) if days else 0.0,
+        "pfc_kcal_ratio": pfc_ratio,
+    }
+
+
+# ---- ユーザープロファイル（一括作成の入力） ----
+PROFILE_FIELDS = ("user_id", "target_kcal", "meal_budget", "genre", "difficulty", "city")
+
+
+def normalize_profile(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    CSV/JSONL の1行をプロファイルに変換する（不正な値は ValueError）
+
+    必須: user_id, target_kcal, meal_budget, genre, difficulty, city / 任意: keyword
+    """
+    missing = [f for f in PROFILE_FIELDS if raw.get(f) in (None, "")]
+    if missing:
+        raise ValueError(f"必須項目がありません: {', '.join(missing)}")
+    profile = {
+        "user_id": str(raw["user_id"]),
+        "target_kcal": int(float(raw["target_kcal"])),
+        "meal_budget": int(float(raw["meal_budget"])),
+        "genre": str(raw["genre"]),
+        "difficulty": str(raw["difficulty"]),
+        "city": str(raw["city"]),
+        "keyword": (str(raw.get("keyword") or "").strip() or None),
+    }
+    if profile["genre"] not in ct.GENRE_OPTIONS:
+        raise ValueError(f"genre が不正です: {profile['genre']}（{' / '.join(ct.GENRE_OPTIONS)}）")
+    if profile["difficulty"] not in ct.DIFFICULTY_OPTIONS:
+        raise ValueError(f"difficulty が不正です: {profile['difficulty']}（{' / '.join(ct.DIFFICULTY_OPTIONS)}）")
+    try:
+        profile["city"] = resolve_location(profile["city"]).key
+    except ValueError as e:
+        raise ValueError(f"city が不正です: {str(e)}") from None
+    return profile
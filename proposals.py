@@ -0,0 +1,190 @@
+# proposals.py
+import collections
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Generic, Iterable, List, MutableMapping, NamedTuple, Optional, Sequence, Tuple, TypeVar
+
+import constants as ct
+import deadline as dl
+import metrics as mt
+from models import NutritionEstimate, Recipe, RecipeCombination
+from nutrition import estimate_cache_key
+
+logger = logging.getLogger('NutriBuddy')
+
+# セッション状態（st.session_state）に置く提案履歴のキー
+SESSION_KEY = "_proposals"
+
+T = TypeVar("T")
+
+
+# ---- セッションをまたいで共有するストア ----
+class _LRU(Generic[T]):
+    """件数上限つきの辞書（上限を超えたら最後に使ったのが古い順に削除）"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "collections.OrderedDict[str, T]" = collections.OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[T]:
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: T) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class ProposalStore:
+    """
+    提案に使ったレシピ・推定結果（キー → Recipe / NutritionEstimate）
+
+    同じレシピ・同じ条件の推定はどのセッションからも同じインスタンスを参照する。
+    各セッションはキーだけを持ち、ここから引けなくなった（削除された）提案は作り直す。
+    """
+
+    def __init__(self, max_recipes: int, max_estimates: int):
+        self._lock = threading.Lock()
+        self._recipes: _LRU[Recipe] = _LRU(max_recipes)
+        self._estimates: _LRU[NutritionEstimate] = _LRU(max_estimates)
+
+    def put(self, recipes: Iterable[Tuple[str, Recipe]], estimates: Iterable[Tuple[str, NutritionEstimate]]) -> None:
+        with self._lock:
+            for key, recipe in recipes:
+                # 既にあれば既存のインスタンスを使い続ける（同じレシピを重複して持たない）
+                if self._recipes.get(key) is None:
+                    self._recipes.put(key, recipe)
+            for key, estimate in estimates:
+                self._estimates.put(key, estimate)
+
+    def resolve(self, recipe_keys: Sequence[str],
+                estimate_keys: Sequence[str]) -> Optional[Tuple[List[Recipe], List[NutritionEstimate]]]:
+        """キーからレシピ・推定結果を引く（1件でも削除済みなら None）"""
+        with self._lock:
+            recipes = [self._recipes.get(k) for k in recipe_keys]
+            estimates = [self._estimates.get(k) for k in estimate_keys]
+        if any(r is None for r in recipes) or any(e is None for e in estimates):
+            return None
+        return recipes, estimates
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "recipes": len(self._recipes), "max_recipes": self._recipes.max_entries,
+                "estimates": len(self._estimates), "max_estimates": self._estimates.max_entries,
+            }
+
+
+_store: Optional[ProposalStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> ProposalStore:
+    """プロセスで共有する提案ストア"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ProposalStore(ct.PROPOSAL_STORE_MAX_RECIPES, ct.PROPOSAL_STORE_MAX_ESTIMATES)
+        return _store
+
+
+# ---- セッションごとの提案履歴（キーだけを持つ） ----
+class Proposal(NamedTuple):
+    """画面に表示する提案（recipes と estimates は同じ順序）"""
+    recipes: List[Recipe]
+    estimates: List[NutritionEstimate]
+    combinations: List[RecipeCombination]
+    notice: Optional[str] = None
+
+
+@dataclass(frozen=True, slots=True)
+class _Bundle:
+    recipe_keys: Tuple[str, ...]
+    estimate_keys: Tuple[str, ...]
+    combinations: Tuple[Tuple[str, Tuple[int, ...]], ...]  # (組み合わせのタイプ, recipe_keys の位置)
+    target_kcal: int
+    notice: Optional[str]
+
+
+def _digest(*parts: Any) -> str:
+    return hashlib.blake2b("\x1f".join(map(str, parts)).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def proposal_key(*conditions: Any) -> str:
+    """提案の条件（検索条件・難易度・予算・季節・体感など）から作るキー"""
+    return _digest(*conditions)
+
+
+def recipe_key(recipe: Recipe) -> str:
+    return str(recipe.recipe_id) if recipe.recipe_id is not None else _digest(recipe.url, recipe.name)
+
+
+def recall_proposal(session: MutableMapping[str, Any], key: str) -> Optional[Proposal]:
+    """このセッションで同じ条件の提案を作っていれば、共有ストアから組み立て直して返す"""
+    mt.CACHE_LOOKUPS.inc(cache="proposals")
+    bundles = session.get(SESSION_KEY)
+    bundle = bundles.get(key) if bundles is not None else None
+    resolved = get_store().resolve(bundle.recipe_keys, bundle.estimate_keys) if bundle is not None else None
+    if resolved is None:
+        mt.CACHE_MISSES.inc(cache="proposals")
+        return None
+    bundles.move_to_end(key)
+    recipes, estimates = resolved
+    combinations = [
+        RecipeCombination.of(kind, [(recipes[i], estimates[i]) for i in positions], bundle.target_kcal)
+        for kind, positions in bundle.combinations
+    ]
+    return Proposal(recipes, estimates, combinations, bundle.notice)
+
+
+def remember_proposal(session: MutableMapping[str, Any], key: str, proposal: Proposal, target_kcal: int,
+                      difficulty: str, budget_jpy: int, season: str, feel: str) -> bool:
+    """
+    提案をキーだけにしてセッションに残す（レシピ・推定結果は共有ストアへ）
+
+    検証済みでない推定を含む提案や締め切りで処理を省略した提案は残さない（次の表示で作り直す）。
+    セッションごとに PROPOSAL_SESSION_MAX_BUNDLES 件までで、超えたら最後に表示したのが古い順に捨てる。
+    """
+    deadline = dl.current()
+    if not all(e.ok for e in proposal.estimates) or (deadline is not None and deadline.skipped):
+        return False
+    recipe_keys = tuple(recipe_key(r) for r in proposal.recipes)
+    estimate_keys = tuple(estimate_cache_key(r, difficulty, budget_jpy, season, feel) for r in proposal.recipes)
+    # 組み合わせのレシピは proposal.recipes と同じインスタンスなので位置で参照する
+    positions = {id(r): i for i, r in enumerate(proposal.recipes)}
+    bundle = _Bundle(
+        recipe_keys=recipe_keys,
+        estimate_keys=estimate_keys,
+        combinations=tuple((c.kind, tuple(positions[id(r)] for r in c.recipes)) for c in proposal.combinations),
+        target_kcal=target_kcal,
+        notice=proposal.notice,
+    )
+    get_store().put(zip(recipe_keys, proposal.recipes), zip(estimate_keys, proposal.estimates))
+
+    bundles = session.get(SESSION_KEY)
+    if bundles is None:
+        bundles = session[SESSION_KEY] = collections.OrderedDict()
+    bundles[key] = bundle
+    bundles.move_to_end(key)
+    while len(bundles) > ct.PROPOSAL_SESSION_MAX_BUNDLES:
+        bundles.popitem(last=False)
+    logger.debug(f"提案を保存 - レシピ {len(recipe_keys)}件, 組み合わせ {len(bundle.combinations)}件, 履歴 {len(bundles)}件")
+    return True
+
+
+def get_proposal_stats(session: Optional[MutableMapping[str, Any]] = None) -> Dict[str, int]:
+    """共有ストアの件数とこのセッションの提案履歴の件数（開発者モード表示用）"""
+    stats = get_store().stats()
+    bundles = session.get(SESSION_KEY) if session is not None else None
+    stats["session_bundles"] = len(bundles) if bundles is not None else 0
+    stats["max_session_bundles"] = ct.PROPOSAL_SESSION_MAX_BUNDLES
+    return stats
@@ -0,0 +1,636 @@
+# rakuten_api.py
+import os
+import time
+import logging
+import threading
+from datetime import timedelta
+from typing import List, Dict, Any, Optional
+
+import constants as ct
+import singleflight as sf
+import tracing as tr
+import deadline as dl
+import metrics as mt
+import resilience as rs
+import jobs as jq
+import category_snapshot as cs
+from categories import CategoryTree
+from lazy import lazy_import, cache_data as lazy_cache_data
+from models import RECIPE_SCHEMA_VERSION, Recipe
+
+requests = lazy_import("requests")
+st = lazy_import("streamlit")
+
+logger = logging.getLogger('NutriBuddy')
+# カテゴリ検索のスコア計算など大量のDEBUGログ用（サンプリング対象）
+search_logger = logging.getLogger('NutriBuddy.category_search')
+
+# ---- 楽天API設定 ----
+def safe_rakuten_api_request(url: str, params: Dict[str, Any], timeout: int = None) -> Dict[str, Any]:
+    """
+    楽天APIに対する安全なリクエスト（遅延・リトライ・同時リクエスト集約機能付き）
+    
+    同じURL・パラメータのリクエストが実行中の場合は新たに送信せず、その結果を共有する
+    
+    Args:
+        url: リクエストURL
+        params: リクエストパラメータ
+        timeout: タイムアウト時間（秒、Noneの場合はデフォルト値使用）
+    
+    Returns:
+        APIレスポンス（JSONデータ）
+    """
+    if timeout is None:
+        timeout = ct.RAKUTEN_API_TIMEOUT
+    
+    return sf.get_group("rakuten").do(
+        sf.make_key(url, params), _rakuten_api_request_with_retry, url, params, timeout
+    )
+
+def _rakuten_api_request_with_retry(url: str, params: Dict[str, Any], timeout: int) -> Dict[str, Any]:
+    """楽天APIへのリクエスト本体（遅延・リトライ・回路遮断は resilience の共通ポリシー）"""
+    endpoint = mt.rakuten_endpoint(url)
+    
+    def on_retry(attempt: int, delay: float, e: BaseException) -> None:
+        logger.info(f"楽天API リトライ {attempt}/{ct.RAKUTEN_API_MAX_RETRIES} - {delay:.1f}秒待機 ({e})")
+        mt.RAKUTEN_RETRIES.inc(endpoint=endpoint)
+        mt.RAKUTEN_SLEEP_SECONDS.inc(delay, reason="retry")
+    
+    try:
+        result = rs.call("rakuten", _rakuten_get, url, params, timeout, endpoint, on_retry=on_retry)
+    except rs.CircuitOpenError as e:
+        logger.warning(f"楽天API 呼び出しを省略: {e}")
+        raise
+    except requests.exceptions.HTTPError as e:
+        if e.response.status_code == 429:
+            logger.error("楽天API レート制限により最大リトライ回数に到達")
+        else:
+            logger.error(f"楽天API HTTPエラー: {e.response.status_code}")
+        raise
+    except requests.exceptions.RequestException as e:
+        logger.error(f"楽天API リクエストエラー: {str(e)}")
+        raise
+    
+    logger.info("楽天APIリクエスト成功")
+    return result
+
+def _rakuten_get(url: str, params: Dict[str, Any], timeout: int, endpoint: str) -> Dict[str, Any]:
+    """楽天APIへの1回分のリクエスト"""
+    # 通常の遅延
+    logger.debug(f"楽天API リクエスト前遅延: {ct.RAKUTEN_API_DELAY}秒")
+    mt.RAKUTEN_SLEEP_SECONDS.inc(ct.RAKUTEN_API_DELAY, reason="throttle")
+    time.sleep(ct.RAKUTEN_API_DELAY)
+    
+    # 締め切りまでの残り時間に収まるようにタイムアウトを縮める
+    timeout = dl.timeout_for(timeout, "楽天API")
+    logger.debug(f"楽天APIリクエスト - URL: {url}, タイムアウト: {timeout:.1f}秒")
+    try:
+        with mt.RAKUTEN_LATENCY.time(endpoint=endpoint):
+            r = requests.get(url, params=params, timeout=timeout)
+    except requests.exceptions.Timeout:
+        mt.RAKUTEN_REQUESTS.inc(endpoint=endpoint, status="timeout")
+        raise
+    except requests.exceptions.RequestException:
+        mt.RAKUTEN_REQUESTS.inc(endpoint=endpoint, status="error")
+        raise
+    mt.RAKUTEN_REQUESTS.inc(endpoint=endpoint, status=str(r.status_code))
+    if r.status_code == 429:
+        logger.warning("楽天API レート制限 (429)")
+    r.raise_for_status()
+    return r.json()
+
+# ---- カテゴリデータのキャッシュ機能 ----
+# アプリケーションID → カテゴリツリー（プロセスで共有。更新時は参照ごと差し替える）
+_category_trees: Dict[str, CategoryTree] = {}
+_category_refresh_lock = threading.Lock()
+
+def get_category_tree(app_id: str) -> Optional[CategoryTree]:
+    """
+    楽天レシピのカテゴリツリーを取得（プロセスで共有・CATEGORY_TREE_TTL_SEC ごとに更新）
+
+    st.cache_data と違い呼び出しごとに複製しないため、返したツリーは変更しないこと。
+    プロセスにツリーがなければ、まず CATEGORY_SNAPSHOT_PATH のスナップショット（ほかのプロセスが
+    取得・保存したもの）を使い、期限切れかなければ取得してスナップショットを書き出す。
+    期限切れのときは1スレッドだけが取得し、その間ほかのスレッドは古いツリーを使う。
+    取得に失敗した場合は古いツリー（なければ None）を返し、次回に再取得する。
+    """
+    mt.CACHE_LOOKUPS.inc(cache="categories")
+    tree = _category_trees.get(app_id)
+    if tree is not None and time.time() - tree.loaded_at < ct.CATEGORY_TREE_TTL_SEC:
+        return tree
+    # 古いツリーがあれば待たずにそれを返す（取得中のスレッドが差し替える）
+    if not _category_refresh_lock.acquire(blocking=tree is None):
+        return tree
+    try:
+        current = _category_trees.get(app_id)
+        if current is not None and current is not tree:
+            return current  # 待っている間にほかのスレッドが更新した
+        # ほかのプロセスが更新したスナップショットがあればそれを使う（取得しない）
+        snapshot_tree = _load_category_snapshot(tree.loaded_at if tree is not None else 0.0)
+        if snapshot_tree is not None:
+            _category_trees[app_id] = snapshot_tree
+            return snapshot_tree
+        mt.CACHE_MISSES.inc(cache="categories")
+        logger.info("楽天レシピカテゴリ一覧取得開始（共有ツリーの更新）")
+        try:
+            result = safe_rakuten_api_request(ct.RAKUTEN_CATEGORY_LIST_URL, {"applicationId": app_id})
+        except Exception as e:
+            logger.error(f"カテゴリ取得エラー: {str(e)}")
+            return tree
+        new_tree = CategoryTree.from_api((result or {}).get("result"))
+        if not new_tree:
+            logger.error("カテゴリ取得エラー: カテゴリ一覧が空です")
+            return tree
+        _category_trees[app_id] = new_tree
+        logger.info(f"楽天カテゴリ一覧取得成功（共有ツリーを更新） - {len(new_tree)}件")
+        _save_category_snapshot(new_tree)
+        return new_tree
+    finally:
+        _category_refresh_lock.release()
+
+def _load_category_snapshot(newer_than: float) -> Optional[CategoryTree]:
+    """期限内で newer_than より新しいスナップショットがあればツリーにして返す"""
+    snapshot = cs.open_snapshot(ct.CATEGORY_SNAPSHOT_PATH)
+    if snapshot is None:
+        return None
+    with snapshot:
+        if snapshot.loaded_at <= newer_than or time.time() - snapshot.loaded_at >= ct.CATEGORY_TREE_TTL_SEC:
+            return None
+        tree = snapshot.to_tree()
+    logger.info(f"カテゴリのスナップショットを読み込み - {len(tree)}件")
+    return tree
+
+def _save_category_snapshot(tree: CategoryTree) -> None:
+    if not ct.CATEGORY_SNAPSHOT_PATH:
+        return
+    try:
+        size = cs.write_snapshot(tree, ct.CATEGORY_SNAPSHOT_PATH)
+        logger.debug(f"カテゴリのスナップショットを保存: {size} bytes")
+    except OSError as e:
+        logger.warning(f"カテゴリのスナップショットを保存できません: {str(e)}")
+
+def _clear_category_trees() -> None:
+    # スナップショットも同じカテゴリ一覧のキャッシュなので一緒に消す
+    with _category_refresh_lock:
+        _category_trees.clear()
+        if ct.CATEGORY_SNAPSHOT_PATH and os.path.exists(ct.CATEGORY_SNAPSHOT_PATH):
+            os.remove(ct.CATEGORY_SNAPSHOT_PATH)
+
+get_category_tree.clear = _clear_category_trees
+
+def fetch_rakuten_categories(app_id: str) -> Dict[str, Any]:
+    """
+    楽天レシピAPIからカテゴリ一覧を取得（遅延対応）
+    デバッグや設定確認用の関数
+    """
+    logger.info("楽天レシピカテゴリ一覧取得開始（遅延対応）")
+    params = {"applicationId": app_id}
+    
+    try:
+        result = safe_rakuten_api_request(ct.RAKUTEN_CATEGORY_LIST_URL, params)
+        if result:
+            logger.info("楽天カテゴリ一覧取得成功")
+        return result
+    except Exception as e:
+        logger.error(f"カテゴリ取得エラー: {str(e)}")
+        return {}
+
+def find_category_by_id(categories_result: Dict[str, Any], target_id: str) -> Dict[str, Any]:
+    """
+    カテゴリIDから対応するカテゴリ情報を検索
+    
+    Args:
+        categories_result: 楽天APIのresult部分
+        target_id: 検索対象のカテゴリID
+    
+    Returns:
+        マッチしたカテゴリ情報（見つからない場合は空の辞書）
+    """
+    if isinstance(categories_result, dict):
+        # 新形式：large/medium/small構造
+        for level_name in ['large', 'medium', 'small']:
+            if level_name in categories_result:
+                categories = categories_result[level_name]
+                for category in categories:
+                    if str(category.get('categoryId', '')) == str(target_id):
+                        return category
+    elif isinstance(categories_result, list):
+        # 旧形式：フラットなリスト
+        for category in categories_result:
+            if str(category.get('categoryId', '')) == str(target_id):
+                return category
+    
+    return {}
+
+def build_hierarchical_category_id(category_id: str, categories_data: dict) -> str:
+    """
+    カテゴリIDから階層形式のIDを構築する
+    
+    Args:
+        category_id: 単体カテゴリID
+        categories_data: カテゴリ一覧データ
+    
+    Returns:
+        階層形式のカテゴリID（例: "30-300" または "30-300-1132"）
+    """
+    if not categories_data or 'result' not in categories_data:
+        return category_id
+    
+    result = categories_data['result']
+    
+    # 各レベルでカテゴリIDを検索
+    for level_name in ['large', 'medium', 'small']:
+        if level_name in result:
+            categories = result[level_name]
+            
+            for category in categories:
+                if str(category.get('categoryId', '')) == str(category_id):
+                    parent_id = category.get('parentCategoryId', '')
+                    
+                    if level_name == 'large':
+                        # 大カテゴリの場合はそのまま
+                        return category_id
+                    elif level_name == 'medium':
+                        # 中カテゴリの場合: 大-中
+                        if parent_id:
+                            return f"{parent_id}-{category_id}"
+                        return category_id
+                    elif level_name == 'small':
+                        # 小カテゴリの場合: 大-中-小
+                        if parent_id:
+                            # 親（中カテゴリ）の階層IDを構築
+                            parent_hierarchical = build_hierarchical_category_id(parent_id, categories_data)
+                            return f"{parent_hierarchical}-{category_id}"
+                        return category_id
+    
+    # 見つからない場合は元のIDをそのまま返す
+    return category_id
+
+
+# ---- 動的カテゴリ検索機能 ----
+@tr.traced("category_search")
+def search_category_by_keyword(app_id: str, keyword: str, genre_hint: str = None) -> List[str]:
+    """
+    キーワードまたはジャンルから適切なカテゴリIDを検索
+    
+    Args:
+        app_id: 楽天アプリケーションID
+        keyword: 検索キーワード（例: "鶏肉", "パスタ", "カレー"）
+        genre_hint: ジャンルヒント（例: "和風", "洋風", "中華"）
+    
+    Returns:
+        マッチしたカテゴリIDのリスト（優先度順）
+    """
+    logger.info(f"カテゴリ検索開始 - キーワード: '{keyword}', ジャンル: '{genre_hint}'")
+    
+    # カテゴリツリーを取得（プロセスで共有、階層形式のIDは計算済み）
+    tree = get_category_tree(app_id)
+    if tree is None:
+        logger.warning("カテゴリデータの取得に失敗")
+        return []
+    
+    matched_categories = []
+    
+    def calculate_relevance_score(category_name: str, category_id: str) -> float:
+        """カテゴリの関連度スコアを計算（楽天APIのcategoryNameと直接照合）"""
+        score = 0.0
+        category_name_lower = category_name.lower()
+        keyword_lower = keyword.lower() if keyword else ""
+        genre_hint_lower = genre_hint.lower() if genre_hint else ""
+        
+        # 1. キーワードとの完全一致（最高優先度）
+        if keyword_lower and keyword_lower == category_name_lower:
+            score += 100.0
+            search_logger.debug(f"完全一致: '{keyword}' == '{category_name}' (+100.0)")
+        
+        # 2. キーワードの部分一致（高優先度）
+        elif keyword_lower and keyword_lower in category_name_lower:
+            # 一致した部分の長さに応じてスコア調整
+            match_ratio = len(keyword_lower) / len(category_name_lower)
+            partial_score = 50.0 + (match_ratio * 30.0)  # 50-80点
+            score += partial_score
+            search_logger.debug(f"部分一致: '{keyword}' in '{category_name}' (+{partial_score:.1f})")
+        
+        # 3. カテゴリ名がキーワードに含まれる（逆方向の一致）
+        elif keyword_lower and category_name_lower in keyword_lower:
+            score += 40.0
+            search_logger.debug(f"逆方向一致: '{category_name}' in '{keyword}' (+40.0)")
+        
+        # 4. ジャンルヒントとの一致
+        if genre_hint_lower:
+            # ジャンル名の直接一致
+            if genre_hint_lower in category_name_lower:
+                score += 25.0
+                search_logger.debug(f"ジャンル一致: '{genre_hint}' in '{category_name}' (+25.0)")
+            
+            # ジャンル関連キーワード（楽天APIの実際のカテゴリ名から判定）
+            japanese_indicators = ["和", "日本", "醤油", "味噌", "だし", "煮物", "焼き", "天ぷら", "寿司", "そば", "うどん", "丼"]
+            western_indicators = ["洋", "イタリア", "フランス", "パスタ", "ピザ", "パン", "チーズ", "グラタン", "ステーキ", "ハンバーグ"]
+            chinese_indicators = ["中華", "中国", "炒め", "餃子", "ラーメン", "チャーハン", "麻婆", "酢豚", "春巻き"]
+            
+            if genre_hint_lower in ["和風", "和食", "日本"]:
+                for indicator in japanese_indicators:
+                    if indicator in category_name_lower:
+                        score += 15.0
+                        search_logger.debug(f"和風指標一致: '{indicator}' in '{category_name}' (+15.0)")
+                        break
+            elif genre_hint_lower in ["洋風", "洋食", "西洋"]:
+                for indicator in western_indicators:
+                    if indicator in category_name_lower:
+                        score += 15.0
+                        search_logger.debug(f"洋風指標一致: '{indicator}' in '{category_name}' (+15.0)")
+                        break
+            elif genre_hint_lower in ["中華", "中国"]:
+                for indicator in chinese_indicators:
+                    if indicator in category_name_lower:
+                        score += 15.0
+                        search_logger.debug(f"中華指標一致: '{indicator}' in '{category_name}' (+15.0)")
+                        break
+        
+        # 5. 食材・料理関連キーワードの文字レベル類似度
+        if keyword_lower:
+            # 共通文字の割合を計算
+            common_chars = set(keyword_lower) & set(category_name_lower)
+            if common_chars:
+                char_similarity = len(common_chars) / max(len(keyword_lower), len(category_name_lower))
+                char_score = char_similarity * 10.0  # 最大10点
+                if char_score >= 3.0:  # 閾値設定
+                    score += char_score
+                    search_logger.debug(f"文字類似度: {char_similarity:.2f} (+{char_score:.1f})")
+        
+        # 6. カテゴリレベルによる重み付け（LARGEを優先）
+        if isinstance(category_id, str):
+            if len(category_id) == 1:  # LARGEカテゴリ
+                score += 15.0
+            elif len(category_id) == 2:  # MEDIUMカテゴリ
+                score += 8.0
+            elif len(category_id) == 3:  # SMALLカテゴリ
+                score += 5.0
+        
+        return score
+    
+    # 各カテゴリレベルを検索（LARGEを最優先、旧形式のフラットなリストは level が "unknown"）
+    for level_name, categories in tree.by_level.items():
+        search_logger.debug(f"{level_name.upper()}カテゴリから検索: {len(categories)}件")
+        
+        for category in categories:
+            if not category.name:
+                continue
+            
+            # 関連度スコアを計算
+            score = calculate_relevance_score(category.name, category.category_id)
+            
+            if score > 0:
+                matched_categories.append({
+                    'categoryId': category.hierarchical_id,
+                    'originalId': category.category_id,
+                    'categoryName': category.name,
+                    'level': level_name,
+                    'score': score
+                })
+                search_logger.debug(f"マッチ: {category.name} (元ID: {category.category_id} → 階層ID: {category.hierarchical_id}, レベル: {level_name}, スコア: {score:.1f})")
+    
+    # スコア順でソート
+    matched_categories.sort(key=lambda x: x['score'], reverse=True)
+    
+    # 上位のカテゴリIDを返す
+    top_category_ids = [cat['categoryId'] for cat in matched_categories[:5]]
+    
+    if top_category_ids:
+        logger.info(f"カテゴリ検索完了 - マッチ数: {len(matched_categories)}, 上位ID: {top_category_ids[:3]}")
+        # マッチした上位カテゴリの詳細をログ出力
+        for i, cat in enumerate(matched_categories[:3]):
+            original_info = f" (元ID: {cat.get('originalId', cat['categoryId'])})" if cat.get('originalId') and cat.get('originalId') != cat['categoryId'] else ""
+            logger.info(f"  {i+1}. {cat['categoryName']} (階層ID: {cat['categoryId']}{original_info}, スコア: {cat['score']:.1f})")
+    else:
+        logger.warning(f"マッチするカテゴリが見つかりませんでした - キーワード: '{keyword}', ジャンル: '{genre_hint}'")
+    
+    return top_category_ids
+
+def get_fallback_category_id(genre: str) -> str:
+    """
+    ジャンルに基づくフォールバックカテゴリID
+    動的検索に失敗した場合の安全な選択肢
+    """
+    fallback_mapping = {
+        "和風": "275",   # 牛肉（和風料理でよく使用）
+        "洋風": "15",    # パスタ（洋風の代表）
+        "中華": "277",   # 鶏肉（中華料理でよく使用）
+    }
+    
+    category_id = fallback_mapping.get(genre, "30")  # デフォルトは人気メニュー
+    logger.info(f"フォールバックカテゴリ使用 - ジャンル: {genre}, ID: {category_id}")
+    return category_id
+
+# ---- 楽天レシピAPI から上位レシピ取得 ----
+def fetch_top_recipes_by_genre(genre: str, app_id: str, keyword: str = None) -> List[Recipe]:
+    """
+    楽天レシピAPIの動的カテゴリ検索に基づいてレシピを取得
+    
+    Args:
+        genre: ジャンル（"和風", "洋風", "中華" など）
+        app_id: 楽天アプリケーションID
+        keyword: 検索キーワード（オプション）
+    
+    Returns:
+        レシピ情報のリスト
+    """
+    logger.info(f"楽天レシピ取得開始 - ジャンル: {genre}, キーワード: {keyword}")
+    
+    # 動的カテゴリ検索
+    category_ids = search_category_by_keyword(app_id, keyword or genre, genre)
+    
+    # フォールバック: 固定マッピングまたはデフォルト
+    if not category_ids:
+        # まず従来の固定マッピングを試行
+        legacy_cat_id = ct.RAKUTEN_GENRE_TO_CATEGORY.get(genre)
+        if legacy_cat_id:
+            category_ids = [legacy_cat_id.split("-")[-1]]  # "10-277" -> "277"
+            logger.info(f"従来マッピング使用 - ジャンル: {genre}, ID: {category_ids[0]}")
+        else:
+            category_ids = [get_fallback_category_id(genre)]
+    
+    # 最初のカテゴリIDでレシピを取得
+    target_category_id = category_ids[0]
+    logger.info(f"使用カテゴリID: {target_category_id}")
+    
+    # APIリクエストパラメータ
+    params = {
+        "applicationId": app_id,
+        "categoryId": target_category_id
+    }
+    
+    try:
+        # 楽天レシピランキングAPIを呼び出し（遅延対応）
+        logger.debug("楽天レシピAPIへリクエスト送信（遅延対応）")
+        with tr.span("ranking_fetch"):
+            json_data = safe_rakuten_api_request(ct.RAKUTEN_RANKING_URL, params)
+        
+        if not json_data:
+            logger.warning("楽天APIからの応答が空です")
+            # 他のカテゴリIDで再試行
+            if len(category_ids) > 1:
+                logger.info(f"空応答のため別のカテゴリIDで再試行: {category_ids[1]}")
+                return fetch_top_recipes_by_genre_with_category_id(category_ids[1], app_id, genre)
+            return []
+        
+        logger.info("楽天レシピAPIからレスポンス受信（遅延対応）")
+        
+        # 開発用：取得したJSONデータの詳細表示（ログレベルがDEBUGの場合のみ）
+        if logger.isEnabledFor(logging.DEBUG):
+            from debug_tools import debug_display_json_data
+            debug_display_json_data(json_data, f"楽天レシピAPI レスポンス ({genre})")
+        
+        # レスポンス構造の確認とエラーハンドリング
+        if 'result' not in json_data:
+            logger.warning("APIレスポンスにresultキーが存在しません")
+            logger.warning(f"レスポンス構造: {list(json_data.keys())}")
+            
+            # 他のカテゴリIDで再試行
+            if len(category_ids) > 1:
+                logger.info(f"別のカテゴリIDで再試行: {category_ids[1]}")
+                return fetch_top_recipes_by_genre_with_category_id(category_ids[1], app_id, genre)
+            return []
+            
+        # レシピデータを取得（上位N件）
+        recipes_data = json_data['result'][:ct.RAKUTEN_TOP_N]
+        logger.info(f"レシピデータ取得: {len(recipes_data)}件")
+        
+        recipes = [Recipe.from_rakuten(recipe, target_category_id, genre, keyword) for recipe in recipes_data]
+        for i, recipe in enumerate(recipes):
+            logger.debug(f"レシピ{i+1}: {recipe.name}")
+            
+        logger.info(f"楽天レシピ取得完了 - 取得件数: {len(recipes)}件")
+        return recipes
+        
+    except (rs.CircuitOpenError, dl.DeadlineExceeded) as e:
+        # 楽天APIが停止中・締め切り間近のため、別カテゴリでの再試行はせずにすぐフォールバックする
+        logger.warning(f"楽天レシピAPI 呼び出しをスキップ: {e}")
+        return []
+        
+    except requests.exceptions.HTTPError as e:
+        logger.error(f"HTTP エラー: {e.response.status_code}")
+        
+        # 他のカテゴリIDで再試行
+        if len(category_ids) > 1:
+            logger.info(f"HTTPエラーのため別のカテゴリIDで再試行: {category_ids[1]}")
+            return fetch_top_recipes_by_genre_with_category_id(category_ids[1], app_id, genre)
+        return []
+        
+    except Exception as e:
+        logger.error(f"楽天レシピAPI エラー: {str(e)}")
+        logger.debug("エラー詳細", exc_info=True)
+        return []
+
+def fetch_top_recipes_by_genre_with_category_id(category_id: str, app_id: str, genre: str) -> List[Recipe]:
+    """
+    指定されたカテゴリIDでレシピを取得（再試行用・遅延対応）
+    """
+    logger.info(f"カテゴリID指定レシピ取得 - ID: {category_id}, ジャンル: {genre}（遅延対応）")
+    
+    params = {
+        "applicationId": app_id,
+        "categoryId": category_id
+    }
+    
+    try:
+        with tr.span("ranking_fetch"):
+            json_data = safe_rakuten_api_request(ct.RAKUTEN_RANKING_URL, params)
+        
+        if not json_data or 'result' not in json_data:
+            logger.warning(f"カテゴリID {category_id} でもresultキーなし")
+            return []
+        
+        recipes_data = json_data['result'][:ct.RAKUTEN_TOP_N]
+        recipes = [Recipe.from_rakuten(recipe, category_id, genre) for recipe in recipes_data]
+        
+        logger.info(f"再試行成功 - 取得件数: {len(recipes)}件")
+        return recipes
+        
+    except Exception as e:
+        logger.error(f"再試行でもエラー: {str(e)}")
+        return []
+
+# ---- ランキング取得のキャッシュ ----
+class _EmptyRanking(Exception):
+    """取得できなかったランキングをキャッシュに残さないための例外"""
+
+def cached_fetch_top_recipes_by_genre(genre: str, app_id: str, keyword: str = None) -> List[Recipe]:
+    """
+    fetch_top_recipes_by_genre のキャッシュ付き版（1時間キャッシュ）
+
+    0件の結果（API障害や締め切りによる省略を含む）はキャッシュに残さず、次回に再取得する。
+    """
+    try:
+        return _cached_fetch_top_recipes_by_genre(genre, app_id, keyword)
+    except _EmptyRanking:
+        return []
+
+@mt.count_cache("rankings")
+@lazy_cache_data(ttl=timedelta(hours=1))
+def _cached_fetch_top_recipes_by_genre(genre: str, app_id: str, keyword: str = None) -> List[Recipe]:
+    mt.CACHE_MISSES.inc(cache="rankings")
+    # ジョブキューが有効ならワーカーで取得する（ワーカーは自身の RAKUTEN_APPLICATION_ID を使う）
+    # （ワーカーの結果は辞書のリストで返るため Recipe に戻す。schema は古い形式の結果を使い回さないため）
+    recipes = jq.run(
+        "ranking", {"genre": genre, "keyword": keyword, "schema": RECIPE_SCHEMA_VERSION},
+        inline=lambda: fetch_top_recipes_by_genre(genre, app_id, keyword),
+        decode=lambda rows: [Recipe.from_dict(row) for row in rows]
+    )
+    if not recipes:
+        raise _EmptyRanking(genre)
+    return recipes
+
+cached_fetch_top_recipes_by_genre.clear = _cached_fetch_top_recipes_by_genre.clear
+
+# ---- 改善されたエラーハンドリング付きレシピ取得 ----
+def fetch_top_recipes_by_genre_improved(genre: str, app_id: str) -> List[Recipe]:
+    """エラーハンドリングを改善したレシピ取得（正式版・遅延対応）"""
+    cat_id = ct.RAKUTEN_GENRE_TO_CATEGORY.get(genre)
+    if not cat_id:
+        st.warning(f"ジャンル '{genre}' に対応するカテゴリが見つかりません。")
+        return []
+    
+    params = {
+        "applicationId": app_id,
+        "categoryId": cat_id
+    }
+    
+    try:
+        with tr.span("ranking_fetch"):
+            json_data = safe_rakuten_api_request(ct.RAKUTEN_RANKING_URL, params)
+        
+        if not json_data:
+            st.info("該当するレシピが見つかりませんでした。別のジャンルをお試しください。")
+            return []
+        
+        # APIレスポンスの構造確認
+        if 'result' not in json_data:
+            st.info("該当するレシピが見つかりませんでした。別のジャンルをお試しください。")
+            return []
+            
+        recipes_data = json_data['result'][:ct.RAKUTEN_TOP_N]
+        return [Recipe.from_rakuten(recipe, cat_id, genre, default_name="不明なレシピ") for recipe in recipes_data]
+        
+    except requests.exceptions.HTTPError as e:
+        if e.response.status_code == 400:
+            st.error("楽天レシピAPIの設定に問題があります。カテゴリIDを確認してください。")
+        elif e.response.status_code == 401:
+            st.error("APIキーが無効です。設定を確認してください。")
+        elif e.response.status_code == 429:
+            st.error("APIの利用制限に達しました。しばらく待ってから再試行してください。")
+        else:
+            st.error(f"APIエラーが発生しました (ステータス: {e.response.status_code})")
+        return []
+        
+    except requests.exceptions.ConnectionError:
+        st.error("インターネット接続を確認してください。")
+        return []
+        
+    except requests.exceptions.Timeout:
+        st.error("APIの応答時間が長すぎます。しばらく待ってから再試行してください。")
+        return []
+        
+    except Exception as e:
+        st.error(f"予期しないエラーが発生しました: {str(e)}")
+        return []
@@ -0,0 +1,106 @@
+# recipes.py
+import logging
+from typing import List, Optional
+
+from models import NutritionEstimate, Recipe, RecipeCombination
+
+logger = logging.getLogger('NutriBuddy')
+
+# ---- レシピ分類とコンビネーション機能 ----
+def classify_recipe_type(recipe_name: str, ingredients: List[str]) -> str:
+    """
+    レシピ名と材料からレシピタイプを分類する
+    
+    Args:
+        recipe_name: レシピ名
+        ingredients: 材料リスト
+    
+    Returns:
+        "main": 主食, "side": 副菜, "soup": 汁物（どれにも当てはまらない場合は主食として扱う）
+    """
+    # デフォルトは主食として扱う
+    return match_recipe_type(recipe_name, ingredients) or "main"
+
+def match_recipe_type(recipe_name: str, ingredients: List[str]) -> Optional[str]:
+    """レシピ名・材料がキーワードに当てはまればレシピタイプ（"main" / "soup" / "side"）、当てはまらなければ None"""
+    import constants as ct
+    
+    recipe_text = recipe_name.lower() + " " + " ".join(ingredients).lower()
+    
+    # 主食判定
+    for keyword in ct.MAIN_DISH_KEYWORDS:
+        if keyword in recipe_text:
+            return "main"
+    
+    # 汁物判定
+    for keyword in ct.SOUP_KEYWORDS:
+        if keyword in recipe_text:
+            return "soup"
+    
+    # 副菜判定
+    for keyword in ct.SIDE_DISH_KEYWORDS:
+        if keyword in recipe_text:
+            return "side"
+    
+    return None
+
+def find_recipe_combinations(recipes: List[Recipe], kcal_infos: List[NutritionEstimate], target_kcal: int, max_combinations: int = 3) -> List[RecipeCombination]:
+    """
+    主食+副菜の組み合わせを見つける
+    
+    Args:
+        recipes: レシピリスト
+        kcal_infos: カロリー情報リスト（recipes と同じ順序）
+        target_kcal: 目標カロリー
+        max_combinations: 最大組み合わせ数
+    
+    Returns:
+        組み合わせのリスト
+    """
+    logger.info(f"レシピ組み合わせ検索開始 - 目標カロリー: {target_kcal}kcal")
+    
+    # タイプ別に分類（タイプはレシピの作成時に判定済み）
+    pairs = list(zip(recipes, kcal_infos))
+    main_dishes = [p for p in pairs if p[0].dish_type == 'main']
+    side_dishes = [p for p in pairs if p[0].dish_type == 'side']
+    soups = [p for p in pairs if p[0].dish_type == 'soup']
+    others = [p for p in pairs if p[0].dish_type == 'other']
+    
+    logger.info(f"分類結果 - 主食:{len(main_dishes)}件, 副菜:{len(side_dishes)}件, 汁物:{len(soups)}件, その他:{len(others)}件")
+    
+    # 候補は (目標からの差, タイプ, (レシピ, 推定) の組) で集め、選んだものだけを RecipeCombination にする
+    candidates = []
+    target_range = target_kcal + 100  # 許容上限
+    
+    # 主食+副菜の組み合わせ
+    for main in main_dishes:
+        for side in side_dishes:
+            total_kcal = main[1].kcal + side[1].kcal
+            if total_kcal <= target_range:
+                candidates.append((abs(target_kcal - total_kcal), 'main+side', (main, side)))
+                logger.debug(f"組み合わせ候補: {main[0].name} + {side[0].name} ({total_kcal}kcal)")
+    
+    # 主食+副菜+汁物の組み合わせ
+    for main in main_dishes:
+        for side in side_dishes:
+            for soup in soups:
+                total_kcal = main[1].kcal + side[1].kcal + soup[1].kcal
+                if total_kcal <= target_range:
+                    candidates.append((abs(target_kcal - total_kcal), 'main+side+soup', (main, side, soup)))
+                    logger.debug(f"3品組み合わせ候補: {main[0].name} + {side[0].name} + {soup[0].name} ({total_kcal}kcal)")
+    
+    # フォールバック: 主食のみ（既存レシピから最適なもの）
+    if not candidates:
+        logger.warning("適切な組み合わせが見つかりません。主食のみで提案します。")
+        for pair in pairs:
+            if pair[1].kcal <= target_range:
+                candidates.append((abs(target_kcal - pair[1].kcal), 'single', (pair,)))
+    
+    # カロリーバランスでソート（目標カロリーに近い順）
+    candidates.sort(key=lambda x: x[0])
+    
+    # 最大件数でフィルタリング
+    result = [RecipeCombination.of(kind, items, target_kcal) for _, kind, items in candidates[:max_combinations]]
+    logger.info(f"組み合わせ検索完了 - {len(result)}件の組み合わせを選定")
+    
+    return result
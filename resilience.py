@@ -0,0 +1,247 @@
+# resilience.py
+import logging
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Optional
+
+import constants as ct
+import deadline as dl
+import metrics as mt
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """回路遮断中のため上流を呼ばずに失敗させたことを示す例外"""
+
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(f"{upstream} は一時停止中です（あと{retry_after:.0f}秒）")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    上流ごとの回路遮断器（closed → open → half_open → closed）
+
+    連続 failure_threshold 回失敗すると open になり、reset_timeout 秒間は呼び出しを即座に拒否する。
+    その後 half_open で1件だけ試行を通し、成功すれば closed に戻り、失敗すれば再び open になる。
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def _transition(self, state: str) -> None:
+        # ロック保持中に呼ぶ
+        if state != self._state:
+            logger.warning(f"[{self.name}] 回路状態: {self._state} → {state}")
+            mt.CIRCUIT_TRANSITIONS.inc(upstream=self.name, state=state)
+            self._state = state
+
+    def before_call(self) -> None:
+        """呼び出し前の確認（遮断中なら CircuitOpenError）"""
+        with self._lock:
+            if self._state == OPEN:
+                elapsed = time.monotonic() - self._opened_at
+                if elapsed < self.reset_timeout:
+                    raise CircuitOpenError(self.name, self.reset_timeout - elapsed)
+                self._transition(HALF_OPEN)
+            if self._state == HALF_OPEN:
+                # 試行は1件ずつ
+                if self._probing:
+                    raise CircuitOpenError(self.name, 0.0)
+                self._probing = True
+
+    def release(self) -> None:
+        """成功・失敗のどちらにも数えずに試行枠だけ解放する"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._transition(OPEN)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            retry_after = 0.0
+            if self._state == OPEN:
+                retry_after = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+            return {"state": self._state, "failures": self._failures, "retry_after": retry_after}
+
+
+class RetryBudget:
+    """
+    リトライ予算（直近 window 秒のリクエスト数に対するリトライ数の上限）
+
+    上流が全面的に落ちているときにリトライで負荷を何倍にも増やさないため、
+    リトライは「min_retries + ratio × リクエスト数」までに抑える。
+    """
+
+    def __init__(self, ratio: float, min_retries: int, window: float):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        self._lock = threading.Lock()
+        self._requests: deque = deque()
+        self._retries: deque = deque()
+
+    def _trim(self, now: float) -> None:
+        for events in (self._requests, self._retries):
+            while events and now - events[0] > self.window:
+                events.popleft()
+
+    def record_request(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            self._requests.append(now)
+
+    def try_spend(self) -> bool:
+        """リトライしてよければ予算を1つ使って True"""
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            if len(self._retries) >= self.min_retries + self.ratio * len(self._requests):
+                return False
+            self._retries.append(now)
+            return True
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """指数バックオフ + full jitter（attempt は1始まりのリトライ回数）"""
+    return random.uniform(0.0, min(max_delay, base_delay * (2 ** (attempt - 1))))
+
+
+def is_transient_error(e: BaseException) -> bool:
+    """
+    一時的な障害（リトライ・回路遮断の対象）かどうか
+
+    HTTPステータスを持つ例外は 429 と 5xx、それ以外はタイムアウトと接続エラー（OSError）を対象とする。
+    requests の例外は OSError のサブクラスで、HTTPError は response.status_code を持つ。
+    """
+    response = getattr(e, "response", None)
+    status = getattr(response, "status_code", None) or getattr(e, "status_code", None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return isinstance(e, (TimeoutError, OSError))
+
+
+class Upstream:
+    """上流サービスごとの回路遮断器・リトライポリシー・リトライ予算"""
+
+    def __init__(self, name: str, max_retries: int, base_delay: float, max_delay: float,
+                 failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_timeout)
+        self.budget = RetryBudget(ct.RETRY_BUDGET_RATIO, ct.RETRY_BUDGET_MIN_RETRIES, ct.RETRY_BUDGET_WINDOW_SEC)
+
+    def call(self, fn: Callable[..., Any], *args,
+             retryable: Callable[[BaseException], bool] = is_transient_error,
+             on_retry: Optional[Callable[[int, float, BaseException], None]] = None,
+             **kwargs) -> Any:
+        """
+        fn(*args, **kwargs) を共通ポリシーで実行する
+
+        - 回路が open なら即座に CircuitOpenError（呼び出し元のフォールバックへ）
+        - retryable な例外は回路遮断器に失敗として記録し、予算の範囲で待機してリトライ
+        - retryable でない例外（4xxなど）は上流は応答しているとみなし、そのまま送出
+        - 締め切り（deadline.py）に間に合わない試行・リトライは行わない
+        """
+        self.budget.record_request()
+        attempt = 0
+        while True:
+            dl.check(self.name)
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                mt.UPSTREAM_REJECTED.inc(upstream=self.name, reason="circuit_open")
+                raise
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if not retryable(e):
+                    self.breaker.record_success()
+                    raise
+                if not dl.has_time_for(ct.DEADLINE_MIN_CALL_SEC):
+                    # 締め切りに合わせて縮めたタイムアウトによる失敗は上流の障害として数えない
+                    self.breaker.release()
+                    dl.note_skipped(self.name)
+                    raise dl.DeadlineExceeded(f"{self.name}: 締め切りまでに応答なし") from e
+                self.breaker.record_failure()
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                if not self.budget.try_spend():
+                    logger.warning(f"[{self.name}] リトライ予算超過のためリトライせずに失敗: {e}")
+                    mt.UPSTREAM_REJECTED.inc(upstream=self.name, reason="retry_budget")
+                    raise
+                delay = backoff_delay(attempt, self.base_delay, self.max_delay)
+                if not dl.has_time_for(delay + ct.DEADLINE_MIN_CALL_SEC):
+                    logger.info(f"[{self.name}] 締め切りに間に合わないためリトライせずに失敗: {e}")
+                    raise
+                mt.UPSTREAM_RETRIES.inc(upstream=self.name)
+                if on_retry is not None:
+                    on_retry(attempt, delay, e)
+                else:
+                    logger.info(f"[{self.name}] リトライ {attempt}/{self.max_retries} - {delay:.1f}秒待機 ({e})")
+                time.sleep(delay)
+            else:
+                self.breaker.record_success()
+                return result
+
+
+_upstreams: Dict[str, Upstream] = {}
+_upstreams_lock = threading.Lock()
+
+
+def get_upstream(name: str) -> Upstream:
+    """名前付きの上流設定を取得（constants.RESILIENCE_SETTINGS から作成、プロセス内で共有）"""
+    with _upstreams_lock:
+        upstream = _upstreams.get(name)
+        if upstream is None:
+            upstream = Upstream(name, **ct.RESILIENCE_SETTINGS[name])
+            _upstreams[name] = upstream
+        return upstream
+
+
+def call(name: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """get_upstream(name).call(...) の省略形"""
+    return get_upstream(name).call(fn, *args, **kwargs)
+
+
+def get_states() -> Dict[str, Dict[str, Any]]:
+    """全上流の回路状態（開発者モード表示用）"""
+    with _upstreams_lock:
+        upstreams = list(_upstreams.values())
+    return {u.name: u.breaker.snapshot() for u in upstreams}
@@ -0,0 +1,72 @@
+# settings.py
+import functools
+import os
+import logging
+from types import MappingProxyType
+from typing import Any, Mapping
+
+import constants as ct
+
+logger = logging.getLogger('NutriBuddy')
+
+# ---- env 読み込み ----
+def load_env():
+    from dotenv import load_dotenv
+
+    logger.info("環境変数の読み込み開始")
+    load_dotenv()
+    env_data = {
+        "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", ""),
+        "RAKUTEN_APPLICATION_ID": os.getenv("RAKUTEN_APPLICATION_ID", ""),
+        "SQLITE_PATH": os.getenv("SQLITE_PATH", ct.DEFAULT_SQLITE_PATH),
+        "DB_SHARDING": os.getenv("DB_SHARDING", "").lower() in ("1", "true", "yes"),
+        "METRICS_PORT": os.getenv("METRICS_PORT", ""),
+        "METRICS_TEXTFILE": os.getenv("METRICS_TEXTFILE", ""),
+        "NUTRITION_ESTIMATOR": os.getenv("NUTRITION_ESTIMATOR", ct.DEFAULT_NUTRITION_ESTIMATOR),
+        "ROUTER_CONFIDENCE_THRESHOLD": os.getenv("ROUTER_CONFIDENCE_THRESHOLD", ""),
+        "HEDGE_MODE": os.getenv("HEDGE_MODE", ct.DEFAULT_HEDGE_MODE),
+        "WARMUP_ON_START": os.getenv("WARMUP_ON_START", "").lower() in ("1", "true", "yes"),
+        "JOB_QUEUE": os.getenv("JOB_QUEUE", "").lower() in ("1", "true", "yes"),
+        "JOB_QUEUE_PATH": os.getenv("JOB_QUEUE_PATH", ct.DEFAULT_JOB_QUEUE_PATH)
+    }
+    
+    # APIキーの存在確認（セキュリティのため部分的にログ出力）
+    openai_status = "設定済み" if env_data["OPENAI_API_KEY"].startswith("sk-") else "未設定"
+    rakuten_status = "設定済み" if env_data["RAKUTEN_APPLICATION_ID"] else "未設定"
+    
+    logger.info(f"OPENAI_API_KEY: {openai_status}")
+    logger.info(f"RAKUTEN_APPLICATION_ID: {rakuten_status}")
+    logger.info(f"SQLITE_PATH: {env_data['SQLITE_PATH']}")
+    logger.info(f"DB_SHARDING: {env_data['DB_SHARDING']}")
+    if env_data["NUTRITION_ESTIMATOR"] not in ct.NUTRITION_ESTIMATORS:
+        logger.warning(f"NUTRITION_ESTIMATOR が不正です: {env_data['NUTRITION_ESTIMATOR']}（{ct.DEFAULT_NUTRITION_ESTIMATOR} を使用）")
+        env_data["NUTRITION_ESTIMATOR"] = ct.DEFAULT_NUTRITION_ESTIMATOR
+    logger.info(f"NUTRITION_ESTIMATOR: {env_data['NUTRITION_ESTIMATOR']}")
+    try:
+        threshold = float(env_data["ROUTER_CONFIDENCE_THRESHOLD"] or ct.DEFAULT_ROUTER_CONFIDENCE_THRESHOLD)
+        if not 0.0 <= threshold <= 1.0:
+            raise ValueError(threshold)
+    except ValueError:
+        logger.warning(f"ROUTER_CONFIDENCE_THRESHOLD が不正です: {env_data['ROUTER_CONFIDENCE_THRESHOLD']}（{ct.DEFAULT_ROUTER_CONFIDENCE_THRESHOLD} を使用）")
+        threshold = ct.DEFAULT_ROUTER_CONFIDENCE_THRESHOLD
+    env_data["ROUTER_CONFIDENCE_THRESHOLD"] = threshold
+    if env_data["NUTRITION_ESTIMATOR"] == "router":
+        logger.info(f"ROUTER_CONFIDENCE_THRESHOLD: {threshold}")
+    if env_data["HEDGE_MODE"] not in ct.HEDGE_MODES:
+        logger.warning(f"HEDGE_MODE が不正です: {env_data['HEDGE_MODE']}（{ct.DEFAULT_HEDGE_MODE} を使用）")
+        env_data["HEDGE_MODE"] = ct.DEFAULT_HEDGE_MODE
+    logger.info(f"HEDGE_MODE: {env_data['HEDGE_MODE']}")
+    logger.info("環境変数の読み込み完了")
+    
+    return env_data
+
+
+@functools.lru_cache(maxsize=1)
+def get_settings() -> Mapping[str, Any]:
+    """
+    プロセスで1回だけ読み込んだ設定（読み取り専用）
+
+    load_env() は .env の読み込みとログ出力を毎回行うため、リクエストごとに設定を参照する
+    処理（推定・応援メッセージ・ジョブキューなど）はこちらを使う。
+    """
+    return MappingProxyType(load_env())
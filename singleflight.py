@@ -0,0 +1,102 @@
+# singleflight.py
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Hashable
+
+import deadline as dl
+import metrics as mt
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    同一キーの同時呼び出しを1回の実行にまとめる（single-flight）
+
+    最初の呼び出しだけが実際に関数を実行し、実行中に届いた同じキーの呼び出しは
+    その Future の完了を待って同じ結果（または例外）を受け取る。
+    完了後はキーを解放するため、結果のキャッシュは行わない。
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, Future] = {}
+        self.calls = 0       # 実際に実行した回数
+        self.coalesced = 0   # 実行中の呼び出しに相乗りした回数
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                future = Future()
+                self._inflight[key] = future
+                self.calls += 1
+                leader = True
+
+        mt.SINGLEFLIGHT_CALLS.inc(group=self.name, result="leader" if leader else "coalesced")
+        if not leader:
+            logger.debug(f"[{self.name}] 同一リクエストに相乗り - key: {key}")
+            # 相乗りした側の締め切りを超えては待たない
+            try:
+                return future.result(timeout=dl.remaining())
+            except FutureTimeoutError:
+                dl.note_skipped(self.name)
+                raise dl.DeadlineExceeded(f"[{self.name}] 締め切りまでに相乗り先の結果が得られない") from None
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "inflight": len(self._inflight),
+            }
+
+
+# 上流サービスごとのグループ（プロセス内の全セッションで共有）
+_groups: Dict[str, SingleFlight] = {}
+_groups_lock = threading.Lock()
+
+
+def get_group(name: str) -> SingleFlight:
+    """名前付きの SingleFlight グループを取得（なければ作成）"""
+    with _groups_lock:
+        group = _groups.get(name)
+        if group is None:
+            group = SingleFlight(name)
+            _groups[name] = group
+        return group
+
+
+def make_key(*parts: Any) -> Hashable:
+    """dict/list を含む引数からハッシュ可能なキーを作る"""
+    def freeze(value: Any) -> Hashable:
+        if isinstance(value, dict):
+            return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+        if isinstance(value, (list, tuple)):
+            return tuple(freeze(v) for v in value)
+        return value
+    return tuple(freeze(p) for p in parts)
+
+
+def get_stats() -> Dict[str, Dict[str, int]]:
+    """全グループの統計（開発者モード表示用）"""
+    with _groups_lock:
+        groups = list(_groups.values())
+    return {g.name: g.stats() for g in groups}
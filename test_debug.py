@@ -3,6 +3,7 @@
 
 import os
 import sys
+from dataclasses import asdict
 sys.path.append('/app')
 
 # 環境変数設定
@@ -11,6 +12,9 @@ load_dotenv()
 
 import utils as ut
 
+# utils の import ではログ設定は行われないため明示的に初期化
+ut.setup_logging()
+
 def main():
     """開発用テストの実行"""
     print("=" * 60)
@@ -35,10 +39,11 @@ def main():
         print("1. カテゴリ一覧取得テスト")
         print("=" * 40)
         
-        categories = ut.fetch_rakuten_categories(rakuten_app_id)
-        if categories:
-            print("✅ カテゴリ一覧取得成功")
-            ut.debug_display_json_data(categories, "楽天レシピカテゴリ一覧")
+        # スナップショットがあれば mmap で読み込み、APIへは問い合わせない
+        tree = ut.get_category_tree(rakuten_app_id)
+        if tree is not None:
+            print(f"✅ カテゴリ一覧取得成功: {len(tree)}件")
+            ut.debug_display_json_data([asdict(c) for c in tree.categories[:10]], "楽天レシピカテゴリ（最初の10件）")
         else:
             print("❌ カテゴリ一覧取得失敗")
         
@@ -51,7 +56,7 @@ def main():
         if recipes:
             print(f"✅ 和食レシピ取得成功: {len(recipes)}件")
             if recipes:
-                ut.debug_display_json_data(recipes[:2], "和食レシピサンプル（最初の2件）")
+                ut.debug_display_json_data([r.to_dict() for r in recipes[:2]], "和食レシピサンプル（最初の2件）")
         else:
             print("❌ 和食レシピ取得失敗")
         
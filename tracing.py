@@ -0,0 +1,141 @@
+# tracing.py
+import contextvars
+import functools
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+# 直近何回分の実行（レンダリング）を保持するか
+RING_BUFFER_SIZE = 200
+
+# ステージ名（開発者モードの表示順）
+STAGES = ["category_search", "ranking_fetch", "estimation", "estimation_local", "cheer", "weather", "db", "render"]
+
+
+class TraceRun:
+    """1回のスクリプト実行（レンダリング）分のスパン記録"""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.started_at = time.time()
+        self.spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, elapsed_ms: float, error: bool) -> None:
+        with self._lock:
+            self.spans.append({"stage": stage, "ms": elapsed_ms, "error": error})
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"label": self.label, "started_at": self.started_at, "spans": list(self.spans)}
+
+
+_runs: deque = deque(maxlen=RING_BUFFER_SIZE)
+_runs_lock = threading.Lock()
+_current_run: contextvars.ContextVar[Optional[TraceRun]] = contextvars.ContextVar("trace_run", default=None)
+
+
+def begin_run(label: str = "render") -> TraceRun:
+    """
+    新しい実行の記録を開始する
+
+    実行はこの時点でリングバッファに登録されるため、st.rerun() などで
+    スクリプトが途中で終了しても、それまでのスパンは失われない。
+    """
+    run = TraceRun(label)
+    with _runs_lock:
+        _runs.append(run)
+    _current_run.set(run)
+    return run
+
+
+@contextmanager
+def span(stage: str):
+    """処理時間を計測して現在の実行に記録するコンテキストマネージャ"""
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        run = _current_run.get()
+        if run is not None:
+            run.add(stage, (time.perf_counter() - start) * 1000.0, error)
+
+
+def traced(stage: str) -> Callable:
+    """関数全体を span で計測するデコレータ"""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    # 線形補間によるパーセンタイル
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q
+    lower = int(pos)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (pos - lower)
+
+
+def stage_summary(last_n: int = None) -> List[Dict[str, Any]]:
+    """
+    ステージごとの p50/p95 を集計
+
+    1回の実行内で同じステージが複数回呼ばれた場合は合計時間を1サンプルとする
+    （例: 4件のレシピ推定 → その実行の estimation 合計）。
+    """
+    with _runs_lock:
+        runs = list(_runs)
+    if last_n:
+        runs = runs[-last_n:]
+
+    per_stage: Dict[str, List[float]] = {}
+    calls: Dict[str, int] = {}
+    errors: Dict[str, int] = {}
+    for run in runs:
+        totals: Dict[str, float] = {}
+        for s in run.to_dict()["spans"]:
+            totals[s["stage"]] = totals.get(s["stage"], 0.0) + s["ms"]
+            calls[s["stage"]] = calls.get(s["stage"], 0) + 1
+            if s["error"]:
+                errors[s["stage"]] = errors.get(s["stage"], 0) + 1
+        for stage, total in totals.items():
+            per_stage.setdefault(stage, []).append(total)
+
+    order = {name: i for i, name in enumerate(STAGES)}
+    summary = []
+    for stage in sorted(per_stage, key=lambda s: (order.get(s, len(order)), s)):
+        values = sorted(per_stage[stage])
+        summary.append({
+            "stage": stage,
+            "runs": len(values),
+            "calls": calls.get(stage, 0),
+            "errors": errors.get(stage, 0),
+            "p50_ms": round(_percentile(values, 0.50), 1),
+            "p95_ms": round(_percentile(values, 0.95), 1),
+        })
+    return summary
+
+
+def export_runs() -> str:
+    """リングバッファの内容をJSON文字列で出力"""
+    with _runs_lock:
+        runs = [run.to_dict() for run in _runs]
+    return json.dumps(runs, ensure_ascii=False)
+
+
+def clear() -> None:
+    with _runs_lock:
+        _runs.clear()
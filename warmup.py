@@ -0,0 +1,219 @@
+# warmup.py
+#
+# デプロイ直後のキャッシュ事前取得（カテゴリ一覧・ランキング・カロリー推定・天気）
+#
+# 初回のユーザーが24時間キャッシュのカテゴリ一覧や各ジャンルのランキング、カロリー推定、
+# 天気の取得をまとめて待たないよう、起動時に画面表示と同じキーでキャッシュを埋めておく。
+# st.cache_data はプロセス内のキャッシュのため、アプリのキャッシュを温めるには
+# initialize_once() からバックグラウンドで起動する（環境変数 WARMUP_ON_START）。
+# CLIとして実行した場合は同じ手順を実行し、上流の疎通と所要時間を確認できる:
+#
+#   python warmup.py
+#   python warmup.py --no-estimates
+import argparse
+import concurrent.futures
+import contextvars
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import constants as ct
+from nutrition import cached_estimate_recipe
+from rakuten_api import cached_fetch_top_recipes_by_genre, get_category_tree
+from gazetteer import location_options
+from models import Recipe
+from weather import feel_from_weather, get_season, prefetch_weather
+
+logger = logging.getLogger('NutriBuddy')
+
+
+class WarmupStatus:
+    """事前取得の進捗（開発者モード表示・CLIの進捗表示用）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.state = "idle"  # idle / running / done / failed
+        self.phase = ""
+        self.done = 0
+        self.total = 0
+        self.errors = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def begin(self) -> None:
+        with self._lock:
+            self.state = "running"
+            self.started_at = time.monotonic()
+
+    def begin_phase(self, phase: str, total: int) -> None:
+        with self._lock:
+            self.phase = phase
+            self.total += total
+
+    def step(self, ok: bool = True) -> None:
+        with self._lock:
+            self.done += 1
+            if not ok:
+                self.errors += 1
+
+    def finish(self, state: str) -> None:
+        with self._lock:
+            self.state = state
+            self.finished_at = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = 0.0
+            if self.started_at is not None:
+                elapsed = (self.finished_at or time.monotonic()) - self.started_at
+            return {
+                "state": self.state, "phase": self.phase, "done": self.done,
+                "total": self.total, "errors": self.errors, "elapsed_sec": round(elapsed, 1),
+            }
+
+
+def warm_caches(app_id: str, estimates: bool = True, status: Optional[WarmupStatus] = None,
+                on_progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    画面表示と同じキーでキャッシュを埋める
+
+    1. カテゴリ一覧（24時間キャッシュ）
+    2. 全ジャンル（GENRE_OPTIONS）と副菜キーワードのランキング
+    3. 全地域（data/municipalities.csv）の天気
+    4. 取得したレシピのカロリー推定（難易度・予算は既定値、体感は各地域の天気から）
+
+    楽天APIは1件ずつ順に呼ぶため、通常のリクエストと同じ待機（RAKUTEN_API_DELAY）と
+    リトライ予算・回路遮断の範囲で取得する。取得に失敗したものはキャッシュに残らず、
+    画面表示の時点で改めて取得される。
+
+    Returns:
+        進捗の最終状態（WarmupStatus.snapshot()）
+    """
+    status = status or WarmupStatus()
+    status.begin()
+
+    def step(ok: bool) -> None:
+        status.step(ok)
+        if on_progress is not None:
+            on_progress(status.snapshot())
+
+    try:
+        status.begin_phase("categories", 1)
+        step(get_category_tree(app_id) is not None)
+
+        # main.py と同じ引数で呼ぶ（ジャンル優先はキーワードなし、副菜はキーワード自体で検索）
+        searches = [(genre, None) for genre in ct.GENRE_OPTIONS]
+        searches += [(keyword, keyword) for keyword in ct.SIDE_DISH_SEARCH_KEYWORDS]
+        status.begin_phase("rankings", len(searches))
+        recipes: List[Recipe] = []
+        for genre, keyword in searches:
+            found = cached_fetch_top_recipes_by_genre(genre, app_id, keyword)
+            recipes.extend(found)
+            step(bool(found))
+
+        # 全地域の格子点をまとめて取得（格子点の数だけ、WEATHER_BATCH_MAX_CELLS 件ずつ1リクエスト）
+        locations = location_options()
+        status.begin_phase("weather", len(locations))
+        feels = set()
+        for weather in prefetch_weather(locations).values():
+            feels.add(feel_from_weather(weather))
+            step(bool(weather))
+
+        if estimates and recipes:
+            _warm_estimates(recipes, sorted(feels), status, step)
+
+        status.finish("done")
+    except Exception as e:
+        logger.error(f"キャッシュの事前取得エラー: {str(e)}")
+        logger.debug("エラー詳細", exc_info=True)
+        status.finish("failed")
+
+    summary = status.snapshot()
+    logger.info(
+        f"キャッシュの事前取得完了 - {summary['done']}/{summary['total']}件 "
+        f"(失敗 {summary['errors']}件), {summary['elapsed_sec']:.1f}秒"
+    )
+    return summary
+
+
+def _warm_estimates(recipes: List[Recipe], feels: List[str], status: WarmupStatus,
+                    step: Callable[[bool], None]) -> None:
+    # 同じレシピが複数の検索に出てくる場合は1回だけ推定する
+    unique = list({r.recipe_id or r.name: r for r in recipes}.values())
+    season = get_season()
+    jobs = [(recipe, feel) for feel in feels for recipe in unique]
+    status.begin_phase("estimates", len(jobs))
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=ct.WARMUP_ESTIMATE_WORKERS, thread_name_prefix="warmup"
+    ) as executor:
+        futures = [
+            executor.submit(
+                contextvars.copy_context().run, cached_estimate_recipe,
+                recipe, ct.DEFAULT_DIFFICULTY, ct.DEFAULT_MEAL_BUDGET_JPY, season, feel
+            )
+            for recipe, feel in jobs
+        ]
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                step(future.result().ok)
+            except Exception as e:
+                logger.warning(f"カロリー推定の事前取得エラー: {str(e)}")
+                step(False)
+
+
+_status = WarmupStatus()
+_started = False
+_start_lock = threading.Lock()
+
+
+def start_warmup(app_id: str, estimates: bool = True) -> bool:
+    """
+    バックグラウンドスレッドで事前取得を開始する（プロセス内で1回だけ）
+
+    Returns:
+        今回開始した場合は True（開始済み、またはアプリIDがない場合は False）
+    """
+    global _started
+    if not app_id:
+        logger.info("RAKUTEN_APPLICATION_ID が未設定のためキャッシュの事前取得を省略")
+        return False
+    with _start_lock:
+        if _started:
+            return False
+        _started = True
+    logger.info("キャッシュの事前取得を開始（バックグラウンド）")
+    threading.Thread(
+        target=warm_caches, args=(app_id, estimates, _status), name="warmup", daemon=True
+    ).start()
+    return True
+
+
+def get_warmup_status() -> Dict[str, Any]:
+    """バックグラウンドの事前取得の進捗"""
+    return _status.snapshot()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NutriBuddy キャッシュの事前取得")
+    parser.add_argument("--no-estimates", action="store_true", help="カロリー推定（OpenAI）を省略する")
+    args = parser.parse_args()
+
+    from log_config import setup_logging
+    from settings import load_env
+
+    setup_logging()
+    env = load_env()
+    if not env["RAKUTEN_APPLICATION_ID"]:
+        parser.error("RAKUTEN_APPLICATION_ID が未設定です")
+
+    def on_progress(s: Dict[str, Any]) -> None:
+        print(f"[warmup] {s['phase']}: {s['done']}/{s['total']} (失敗 {s['errors']}) {s['elapsed_sec']:.1f}s", flush=True)
+
+    summary = warm_caches(env["RAKUTEN_APPLICATION_ID"], estimates=not args.no_estimates, on_progress=on_progress)
+    raise SystemExit(0 if summary["state"] == "done" else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+# weather.py
+import concurrent.futures
+import contextvars
+import logging
+import threading
+import time
+from datetime import date
+from typing import Dict, Any, List, Tuple
+
+import constants as ct
+import deadline as dl
+import metrics as mt
+import resilience as rs
+import tracing as tr
+from gazetteer import grid_cell, resolve_location
+from lazy import lazy_import
+
+requests = lazy_import("requests")
+
+logger = logging.getLogger('NutriBuddy')
+
+# ---- 天気取得（Open-Meteo） ----
+Cell = Tuple[float, float]
+
+def _open_meteo_request(params: Dict[str, Any]) -> Any:
+    # リトライ・回路遮断は resilience の共通ポリシー
+    return rs.call("open_meteo", _open_meteo_get, params)
+
+def _open_meteo_get(params: Dict[str, Any]) -> Any:
+    r = requests.get(ct.OPEN_METEO_BASE, params=params, timeout=dl.timeout_for(ct.OPEN_METEO_TIMEOUT, "天気取得"))
+    r.raise_for_status()
+    return r.json()
+
+def _request_cells(cells: List[Cell]) -> Dict[Cell, Dict[str, Any]]:
+    """複数の格子点の予報を1回のリクエストで取得（Open-Meteo は緯度・経度のカンマ区切りで複数地点を受け付ける）"""
+    params = {
+        "latitude": ",".join(str(lat) for lat, _ in cells),
+        "longitude": ",".join(str(lon) for _, lon in cells),
+        "daily": "temperature_2m_max,temperature_2m_min",
+        "timezone": "Asia/Tokyo"
+    }
+    data = _open_meteo_request(params)
+    # 1地点ならオブジェクト、複数地点なら同じ順序のリストで返る
+    results = data if isinstance(data, list) else [data]
+    if len(results) != len(cells):
+        raise ValueError(f"天気の地点数が一致しません（要求 {len(cells)} / 応答 {len(results)}）")
+    return dict(zip(cells, results))
+
+class _CellBatcher:
+    """
+    同時期に要求された格子点を1回の Open-Meteo リクエストにまとめる
+
+    最初の要求から WEATHER_BATCH_WINDOW_SEC だけ待って他の要求を集め、WEATHER_BATCH_MAX_CELLS 件ずつ取得する。
+    取得は専用のスレッドで、要求したスレッドのコンテキスト（締め切り）を引き継がずに
+    WEATHER_BATCH_TIMEOUT_SEC の締め切りで行う（1人の締め切りで他のユーザーの格子点まで失敗させない）。
+    要求したスレッドは自分の締め切りまで結果を待ち、間に合わなかった格子点は結果に含めない。
+    """
+
+    def __init__(self, window: float, max_cells: int, timeout: float):
+        self.window = window
+        self.max_cells = max_cells
+        self.timeout = timeout
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="weather")
+        self._lock = threading.Lock()
+        self._inflight: Dict[Cell, concurrent.futures.Future] = {}
+        self._pending: List[Cell] = []
+        self._collecting = False
+
+    def fetch(self, cells: List[Cell]) -> Dict[Cell, Dict[str, Any]]:
+        """格子点ごとの予報（取得できなかった格子点は含まない）"""
+        futures = {}
+        start = False
+        with self._lock:
+            for cell in dict.fromkeys(cells):
+                future = self._inflight.get(cell)
+                if future is None:
+                    future = concurrent.futures.Future()
+                    self._inflight[cell] = future
+                    self._pending.append(cell)
+                futures[cell] = future
+            if self._pending and not self._collecting:
+                self._collecting = start = True
+        if start:
+            # 空のコンテキストで実行する（要求したスレッドの締め切り・計測を持ち込まない）
+            self._executor.submit(contextvars.Context().run, self._flush)
+
+        left = dl.remaining()
+        wait = self.window + self.timeout if left is None else max(0.0, left)
+        done, _ = concurrent.futures.wait(futures.values(), timeout=wait)
+        return {
+            cell: future.result() for cell, future in futures.items()
+            if future in done and future.exception() is None
+        }
+
+    def _flush(self) -> None:
+        time.sleep(self.window)
+        while True:
+            with self._lock:
+                batch = self._pending[:self.max_cells]
+                del self._pending[:self.max_cells]
+                if not batch:
+                    self._collecting = False
+                    return
+            mt.WEATHER_BATCH_CELLS.observe(len(batch))
+            logger.debug(f"天気の一括取得 - {len(batch)}地点")
+            dl.start(self.timeout, "天気の一括取得")
+            try:
+                results = _request_cells(batch)
+            except Exception as e:
+                for cell in batch:
+                    self._inflight[cell].set_exception(e)
+                logger.warning(f"天気の一括取得エラー（{len(batch)}地点）: {type(e).__name__}: {str(e)}")
+            else:
+                for cell in batch:
+                    self._inflight[cell].set_result(results[cell])
+            finally:
+                with self._lock:
+                    for cell in batch:
+                        self._inflight.pop(cell, None)
+
+_batcher = _CellBatcher(ct.WEATHER_BATCH_WINDOW_SEC, ct.WEATHER_BATCH_MAX_CELLS, ct.WEATHER_BATCH_TIMEOUT_SEC)
+
+def weather_cell(location: str) -> Cell:
+    """地域の指定が属する格子点（解決できなければ ValueError）"""
+    loc = resolve_location(location)
+    return grid_cell(loc.lat, loc.lon)
+
+@tr.traced("weather")
+def fetch_weekly_weather(city: str) -> Dict[str, Any]:
+    logger.info(f"天気情報取得開始 - 地域: {city}")
+    try:
+        cell = weather_cell(city)
+        logger.info(f"格子点 - 緯度: {cell[0]}, 経度: {cell[1]}")
+        
+        # 同時期の他の地点の要求とまとめて取得する
+        weather_data = _batcher.fetch([cell]).get(cell, {})
+        if weather_data:
+            logger.info(f"天気情報取得成功 - データサイズ: {len(str(weather_data))} bytes")
+        
+        return weather_data
+        
+    except ValueError as e:
+        logger.warning(f"天気情報取得をスキップ: {str(e)}")
+        return {}
+    except Exception as e:
+        logger.error(f"天気情報取得エラー (その他): {str(e)}")
+        return {}
+
+# ---- 格子点ごとの予報キャッシュ ----
+# 格子点 → (有効期限, 予報)。全セッションで共有し、取得失敗はキャッシュしない
+_cell_cache: Dict[Cell, Tuple[float, Dict[str, Any]]] = {}
+_cell_cache_lock = threading.Lock()
+
+@tr.traced("weather")
+def _cached_cells(cells: List[Cell]) -> Dict[Cell, Dict[str, Any]]:
+    now = time.monotonic()
+    found, missing = {}, []
+    with _cell_cache_lock:
+        for cell in dict.fromkeys(cells):
+            mt.CACHE_LOOKUPS.inc(cache="weather")
+            entry = _cell_cache.get(cell)
+            if entry is not None and entry[0] > now:
+                found[cell] = entry[1]
+            else:
+                missing.append(cell)
+    if missing:
+        mt.CACHE_MISSES.inc(len(missing), cache="weather")
+        fetched = _batcher.fetch(missing)
+        expires = time.monotonic() + ct.WEATHER_CACHE_TTL_SEC
+        with _cell_cache_lock:
+            for cell, weather in fetched.items():
+                _cell_cache[cell] = (expires, weather)
+        found.update(fetched)
+    return found
+
+def cached_fetch_weekly_weather(city: str) -> Dict[str, Any]:
+    """
+    fetch_weekly_weather のキャッシュ付き版
+
+    格子点単位で1時間キャッシュし、近くの地域のユーザーとも同じ予報を共有する（取得失敗はキャッシュしない）。
+    """
+    try:
+        cell = weather_cell(city)
+    except ValueError as e:
+        logger.warning(f"天気情報取得をスキップ: {str(e)}")
+        return {}
+    return _cached_cells([cell]).get(cell, {})
+
+def prefetch_weather(locations: List[str]) -> Dict[str, Dict[str, Any]]:
+    """複数の地域の予報をまとめてキャッシュに用意する（格子点の数だけ、最大 WEATHER_BATCH_MAX_CELLS 件ずつ取得）"""
+    cells = {}
+    for location in locations:
+        try:
+            cells[location] = weather_cell(location)
+        except ValueError as e:
+            logger.warning(f"天気情報取得をスキップ: {str(e)}")
+    by_cell = _cached_cells(list(cells.values()))
+    return {location: by_cell.get(cell, {}) for location, cell in cells.items()}
+
+def _clear_weather_cache() -> None:
+    with _cell_cache_lock:
+        _cell_cache.clear()
+
+cached_fetch_weekly_weather.clear = _clear_weather_cache
+
+def temp_to_feel(temp_c: float) -> str:
+    # 閾値に基づきラベル化
+    if temp_c < ct.TEMP_FEEL_THRESHOLDS["寒い"]:
+        return "寒い"
+    elif temp_c < ct.TEMP_FEEL_THRESHOLDS["涼しい"]:
+        return "涼しい"
+    elif temp_c < ct.TEMP_FEEL_THRESHOLDS["快適"]:
+        return "快適"
+    elif temp_c < ct.TEMP_FEEL_THRESHOLDS["暑い"]:
+        return "やや暑い"
+    else:
+        return "暑い"
+
+def feel_from_weather(weather: Dict[str, Any]) -> str:
+    """今日の温度感（今日の最高気温を採用、取得できなければ "快適"）"""
+    try:
+        max_list = weather.get("daily", {}).get("temperature_2m_max", [])
+        if max_list:
+            return temp_to_feel(float(max_list[0]))
+    except Exception as e:
+        logger.warning(f"体感温度計算エラー: {str(e)}")
+    return "快適"
+
+# ---- 季節の算出（簡易） ----
+def get_season(today: date = date.today()) -> str:
+    m = today.month
+    if m in (12,1,2): return "冬"
+    if m in (3,4,5):  return "春"
+    if m in (6,7,8):  return "夏"
+    return "秋"
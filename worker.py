@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# worker.py
+#
+# ジョブキュー（jobs.py）のワーカープロセス
+#
+# 画面（Streamlit）が投入したランキング取得・カロリー推定・応援メッセージ生成のジョブを
+# 画面とは別のプロセスで実行する。ブラウザの切断や再実行があってもジョブは残り、
+# 結果は同じ条件の他のユーザーとも共有される。
+#
+#   python worker.py
+#   python worker.py --concurrency 8 --kinds estimate,cheer
+import argparse
+import concurrent.futures
+import logging
+import signal
+import threading
+import time
+from typing import Any, Callable, Dict
+
+import constants as ct
+import jobs as jq
+import metrics as mt
+from settings import get_settings
+
+logger = logging.getLogger('NutriBuddy')
+
+
+# ---- ジョブの種類ごとの処理 ----
+def _run_estimate(payload: Dict[str, Any]) -> Dict[str, Any]:
+    from nutrition import estimate_recipe_kcal_pfc
+    ingredients = payload["ingredients_str"].split(",") if payload["ingredients_str"] else []
+    result = estimate_recipe_kcal_pfc(
+        recipe_name=payload["recipe_name"],
+        ingredients=ingredients,
+        method=payload["method"],
+        difficulty=payload["difficulty"],
+        budget_jpy=payload["budget_jpy"],
+        season=payload["season"],
+        feel=payload["feel"]
+    )
+    if not result.ok:
+        raise jq.RetryJob(f"推定が検証に通らない ({result.status})", result.to_dict())
+    return result.to_dict()
+
+
+def _run_cheer(payload: Dict[str, Any]) -> str:
+    from nutrition import generate_shared_cheer
+    message = generate_shared_cheer(payload["summary"])
+    if message == ct.CHEER_FALLBACK_MESSAGE:
+        raise jq.RetryJob("応援メッセージ生成失敗", message)
+    return message
+
+
+def _run_ranking(payload: Dict[str, Any]) -> Any:
+    from rakuten_api import fetch_top_recipes_by_genre
+    recipes = fetch_top_recipes_by_genre(payload["genre"], get_settings()["RAKUTEN_APPLICATION_ID"], payload["keyword"])
+    if not recipes:
+        raise jq.RetryJob("ランキングを取得できない", [])
+    return [recipe.to_dict() for recipe in recipes]
+
+
+HANDLERS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    "estimate": _run_estimate,
+    "cheer": _run_cheer,
+    "ranking": _run_ranking,
+}
+
+
+class Worker:
+    """ジョブを取得して並列実行するループ（同時実行数は concurrency）"""
+
+    def __init__(self, queue: jq.JobQueue, concurrency: int, kinds):
+        self.queue = queue
+        self.concurrency = concurrency
+        self.kinds = kinds
+        self.name = jq.worker_name()
+        self._stop = threading.Event()
+        self._running = 0
+        self._lock = threading.Lock()
+
+    def stop(self, *_args) -> None:
+        logger.info("ワーカー停止要求を受信（実行中のジョブの完了を待って終了）")
+        self._stop.set()
+
+    def _execute(self, job: Dict[str, Any]) -> None:
+        kind, job_id = job["kind"], job["id"]
+        start = time.perf_counter()
+        try:
+            result = HANDLERS[kind](job["payload"])
+        except jq.RetryJob as e:
+            self._record_failure(job, str(e), e.result)
+        except Exception as e:
+            logger.debug("エラー詳細", exc_info=True)
+            self._record_failure(job, f"{type(e).__name__}: {e}", None)
+        else:
+            self.queue.complete(job_id, result)
+            mt.JOBS_FINISHED.inc(kind=kind, status=jq.DONE)
+            logger.info(f"ジョブ完了 - {kind} #{job_id} ({job['attempts']}回目)")
+        finally:
+            mt.JOB_SECONDS.observe(time.perf_counter() - start, kind=kind)
+            with self._lock:
+                self._running -= 1
+
+    def _record_failure(self, job: Dict[str, Any], error: str, result: Any) -> None:
+        retry = self.queue.fail(job["id"], job["attempts"], error, result)
+        status = "retry" if retry else jq.FAILED
+        mt.JOBS_FINISHED.inc(kind=job["kind"], status=status)
+        logger.warning(f"ジョブ失敗 - {job['kind']} #{job['id']} ({job['attempts']}回目, {status}): {error}")
+
+    def run(self) -> None:
+        logger.info(f"ワーカー開始 - {self.name}, 同時実行数: {self.concurrency}, 種類: {', '.join(self.kinds)}")
+        last_heartbeat = last_purge = 0.0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="job") as executor:
+            while not self._stop.is_set():
+                now = time.monotonic()
+                if now - last_heartbeat >= ct.JOB_HEARTBEAT_INTERVAL_SEC:
+                    self.queue.heartbeat(self.name)
+                    last_heartbeat = now
+                if now - last_purge >= ct.JOB_PURGE_INTERVAL_SEC:
+                    purged = self.queue.purge()
+                    if purged:
+                        logger.info(f"保持期間を過ぎたジョブを削除: {purged}件")
+                    last_purge = now
+
+                with self._lock:
+                    free = self.concurrency - self._running
+                claimed = self.queue.claim(self.name, free, self.kinds) if free > 0 else []
+                for job in claimed:
+                    with self._lock:
+                        self._running += 1
+                    executor.submit(self._execute, job)
+                if not claimed:
+                    self._stop.wait(ct.JOB_POLL_INTERVAL_SEC)
+        self.queue.unregister(self.name)
+        logger.info("ワーカー終了")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NutriBuddy ジョブワーカー")
+    parser.add_argument("--concurrency", type=int, default=ct.JOB_WORKER_CONCURRENCY, help="ジョブの同時実行数")
+    parser.add_argument("--kinds", default=",".join(HANDLERS), help="実行するジョブの種類（カンマ区切り）")
+    parser.add_argument("--queue", default="", help="ジョブキューのパス（省略時は JOB_QUEUE_PATH）")
+    parser.add_argument("--metrics-port", type=int, default=0, help="メトリクスを公開するポート（省略時は公開しない）")
+    args = parser.parse_args()
+
+    kinds = [k for k in args.kinds.split(",") if k]
+    unknown = [k for k in kinds if k not in HANDLERS]
+    if unknown:
+        parser.error(f"不明なジョブの種類: {', '.join(unknown)}")
+
+    from log_config import setup_logging
+    setup_logging()
+    if args.metrics_port:
+        mt.start_http_server(args.metrics_port)
+
+    worker = Worker(jq.get_queue(args.queue or None), args.concurrency, kinds)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+
+if __name__ == "__main__":
+    main()